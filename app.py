@@ -5,12 +5,24 @@ import numpy as np
 from datetime import datetime, timedelta
 import time
 import re
-import yfinance as yf
 
 import json
 import os
 
+from market_data import (
+    _yf_cache, yf_rate_limiter, sector_index, sector_relative_returns, sector_return_service,
+)
+from scan_pipeline import GistSink, JournalSink, Sink, build_pipeline, outcome
+from backtest import KNOWN_SETUPS, run_single_backtest, forward_returns
+from walk_forward import walk_forward_scan
+from price_matrix import rebuild_after_scan
+from param_sweep import SWEEP_KEYS, load_cases, param_grid, param_sample, run_sweep
+from scan_journal import ScanJournal, JOURNAL_PATH, replay_journal, clear_journal
+from gist_checkpoint import GistCheckpointWriter, load_checkpoint, gist_url
+
 # ── Persistence — survives websocket drops on Streamlit Cloud ─────────────────
+# Scan progress lives in an append-only journal (scan_journal.py). SAVE_PATH
+# is the old whole-file snapshot — only read, so a pre-journal save restores.
 SAVE_PATH = "/tmp/scanner_state.json"
 # ── GitHub Gist Persistence ──────────────────────────────────────────────────
 # Watchlist is stored as JSON in a private GitHub Gist.
@@ -53,8 +65,7 @@ def gist_load_watchlist():
         if not gist_id:
             return None   # no gist yet — will be created on first save
         headers = _gist_headers()
-        r = requests.get(f"https://api.github.com/gists/{gist_id}",
-                         headers=headers, timeout=10)
+        r = requests.get(gist_url(gist_id), headers=headers, timeout=10)
         if r.status_code == 200:
             files = r.json().get("files", {})
             if GIST_FILENAME in files:
@@ -82,8 +93,7 @@ def gist_save_watchlist(watchlist_dict):
         if gist_id:
             # Update existing gist
             payload = {"files": {GIST_FILENAME: {"content": content_str}}}
-            r = requests.patch(f"https://api.github.com/gists/{gist_id}",
-                               json=payload, headers=headers, timeout=10)
+            r = requests.patch(gist_url(gist_id), json=payload, headers=headers, timeout=10)
             return r.status_code == 200
         else:
             # Create new private gist
@@ -92,8 +102,7 @@ def gist_save_watchlist(watchlist_dict):
                 "public": False,
                 "files": {GIST_FILENAME: {"content": content_str}},
             }
-            r = requests.post("https://api.github.com/gists",
-                              json=payload, headers=headers, timeout=10)
+            r = requests.post(gist_url(), json=payload, headers=headers, timeout=10)
             if r.status_code == 201:
                 new_id = r.json().get("id", "")
                 # Cache for rest of session so repeated saves go to same gist
@@ -106,140 +115,45 @@ def gist_save_watchlist(watchlist_dict):
 
 
 
-def gist_checkpoint_hits(hits, scan_ts, mode):
-    """Save scan hits to Gist as a checkpoint — survives container restarts.
-    Called every 10 new hits during scan so mobile users don't lose progress."""
-    if not _gist_enabled():
-        return
+def _gist_id():
+    """Gist id — session cache (set on creation) first, then secrets."""
+    gist_id = st.session_state.get("_gist_id_cache") or ""
     try:
-        serialisable = []
-        for h in hits:
-            serialisable.append({
-                "ticker":      h["ticker"],
-                "score":       h["score"],
-                "norm_score":  h.get("norm_score", 0),
-                "sector":      h.get("sector", ""),
-                "sector_rel":  h.get("sector_rel"),
-                "structure":   h.get("rr", {}).get("structure_label", ""),
-                "close":       h["wr"].get("current_close"),
-                "slope":       h["wr"].get("sma200_slope_grade", ""),
-                "wr": {k: v for k, v in h["wr"].items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-                "dr": {k: v for k, v in h["dr"].items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-                "rr": {k: v for k, v in h.get("rr", {}).items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-                "w_pass":      h.get("w_pass", False),
-                "d_pass":      h.get("d_pass", False),
-                "base_score":  h.get("base_score", 0),
-                "bonus_score": h.get("bonus_score", 0),
-                "sector_pts":  h.get("sector_pts", 0),
-            })
-        checkpoint = {"hits": serialisable, "scan_ts": scan_ts, "mode": mode,
-                      "checkpoint": True, "hit_count": len(hits)}
-        gist_id = st.session_state.get("_gist_id_cache") or ""
-        try:
-            gist_id = gist_id or st.secrets["gist"].get("gist_id", "").strip()
-        except Exception:
-            pass
-        headers = _gist_headers()
-        if not headers:
-            return
-        payload = {"files": {"scanner_checkpoint.json": {"content": json.dumps(checkpoint)}}}
-        if gist_id:
-            requests.patch(f"https://api.github.com/gists/{gist_id}",
-                          json=payload, headers=headers, timeout=8)
+        gist_id = gist_id or st.secrets["gist"].get("gist_id", "").strip()
     except Exception:
-        pass  # best-effort — never interrupt scan
+        pass
+    return gist_id
 
-def gist_load_checkpoint():
-    """Load scan checkpoint from Gist on session start."""
+def gist_checkpoint_writer():
+    """Background checkpoint uploader for one scan — None if Gist is off or
+    no gist exists yet. Submitting never blocks the scan loop."""
     if not _gist_enabled():
         return None
     try:
-        gist_id = st.session_state.get("_gist_id_cache") or ""
-        try:
-            gist_id = gist_id or st.secrets["gist"].get("gist_id", "").strip()
-        except Exception:
-            pass
+        gist_id = _gist_id()
         if not gist_id:
             return None
-        headers = _gist_headers()
-        if not headers:
-            return None
-        r = requests.get(f"https://api.github.com/gists/{gist_id}", headers=headers, timeout=8)
-        if r.status_code != 200:
-            return None
-        files = r.json().get("files", {})
-        cp_file = files.get("scanner_checkpoint.json", {})
-        raw_url = cp_file.get("raw_url")
-        if not raw_url:
-            return None
-        r2 = requests.get(raw_url, timeout=8)
-        data = r2.json()
-        return data if data.get("checkpoint") else None
+        return GistCheckpointWriter(st.secrets["gist"]["token"], gist_id)
     except Exception:
         return None
 
-def _save_state(hits, logs, scanned, skipped, total, universe, sector_returns,
-                watchlist, mode, scan_ts):
-    """Write incremental scan state to /tmp. Called after each hit."""
-    try:
-        # hits contains DataFrames in wr/dr — serialise only JSON-safe fields
-        serialisable_hits = []
-        for h in hits:
-            serialisable_hits.append({
-                "ticker":      h["ticker"],
-                "score":       h["score"],
-                "norm_score":  h.get("norm_score", 0),
-                "base_score":  h.get("base_score", 0),
-                "bonus_score": h.get("bonus_score", 0),
-                "w_pass":      h["w_pass"],
-                "d_pass":      h["d_pass"],
-                "sector":      h.get("sector", ""),
-                "sector_rel":  h.get("sector_rel"),
-                "sector_pts":  h.get("sector_pts", 0),
-                "wr": {k: v for k, v in h["wr"].items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-                "dr": {k: v for k, v in h["dr"].items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-                "rr": {k: v for k, v in h.get("rr", {}).items()
-                       if isinstance(v, (int, float, str, bool, type(None)))},
-            })
-        state = {
-            "hits":           serialisable_hits,
-            "logs":           logs[-200:],          # last 200 log lines
-            "scanned":        scanned,
-            "skipped":        skipped,
-            "total":          total,
-            "universe":       universe,
-            "sector_returns": sector_returns,
-            "watchlist":      watchlist,
-            "mode":           mode,
-            "scan_ts":        scan_ts,
-            "complete":       False,
-        }
-        with open(SAVE_PATH, "w") as f:
-            json.dump(state, f)
-    except Exception:
-        pass  # persistence is best-effort — never crash the scan
-
-def _save_complete(hits, logs, scanned, skipped, total, universe,
-                   sector_returns, watchlist, mode, scan_ts):
-    """Mark scan as complete in the save file."""
-    _save_state(hits, logs, scanned, skipped, total, universe,
-                sector_returns, watchlist, mode, scan_ts)
+def gist_load_checkpoint():
+    """Load scan checkpoint from Gist on session start."""
+    if not _gist_enabled():
+        return None
     try:
-        with open(SAVE_PATH, "r") as f:
-            state = json.load(f)
-        state["complete"] = True
-        with open(SAVE_PATH, "w") as f:
-            json.dump(state, f)
+        gist_id = _gist_id()
+        if not gist_id:
+            return None
+        return load_checkpoint(st.secrets["gist"]["token"], gist_id)
     except Exception:
-        pass
+        return None
 
 def _load_state():
-    """Load persisted state. Returns dict or None."""
+    """Replay the scan journal (or a legacy whole-file snapshot). Returns dict or None."""
+    saved = replay_journal(JOURNAL_PATH)
+    if saved is not None:
+        return saved
     try:
         if not os.path.exists(SAVE_PATH):
             return None
@@ -249,7 +163,8 @@ def _load_state():
         return None
 
 def _clear_state():
-    """Delete the save file."""
+    """Delete the journal (and any legacy snapshot)."""
+    clear_journal(JOURNAL_PATH)
     try:
         if os.path.exists(SAVE_PATH):
             os.remove(SAVE_PATH)
@@ -271,6 +186,9 @@ if "persistence_checked" not in st.session_state:
             "scan_ts":   saved.get("scan_ts", ""),
             "complete":  saved.get("complete", False),
         }
+        # Interrupted journal with its parameters → offer "Resume scan"
+        if saved.get("resumable"):
+            st.session_state["_resume_state"] = saved
         if saved.get("sector_returns"):
             st.session_state["sector_returns_26"] = saved["sector_returns"]
         if saved.get("watchlist"):
@@ -1071,6 +989,13 @@ with st.sidebar:
         custom_tickers_input = st.text_area("Tickers (comma separated)", "TPL, NVDA, TSLA")
 
     max_stocks  = st.number_input("Max stocks to scan", 50, 2000, 500, step=50)
+    scan_workers = st.slider("Parallel workers", 1, 16, 8,
+        help="Tickers fetched and evaluated concurrently. 1 = serial scan.")
+    scan_processes = st.slider("CPU worker processes", 0, max(os.cpu_count() or 1, 1), 0,
+        help="Run the checks and scoring in separate processes — worth it for large universes "
+             "with warm caches, where the scan is CPU-bound. 0 = evaluate on the worker threads.")
+    yf_req_rate  = st.slider("Max Yahoo requests / sec", 1, 20, 8,
+        help="Shared throttle across all workers — lower it if Yahoo starts returning empty data.")
     min_display = st.slider("Min score to display", 0, 90, 60,
         help="Show everything above this score — lower = wider net. Hard pass/fail gates removed.")
     run_scan = st.button("🚀 Run Scanner")
@@ -1225,87 +1150,29 @@ def fetch_tradingview_tickers(
     except Exception as e:
         return [], [], str(e)
 
-# ── yfinance Data Helpers ─────────────────────────────────────────────────────
-_yf_cache = {}
-
-# ── Sector ETF map ────────────────────────────────────────────────────────────
-SECTOR_ETF_MAP = {
-    "XLK":  "Technology",
-    "XLV":  "Healthcare",
-    "XLF":  "Financials",
-    "XLE":  "Energy",
-    "XLB":  "Basic Materials",
-    "XLI":  "Industrials",
-    "XLC":  "Communication",
-    "XLY":  "Consumer Cyclical",
-    "XLP":  "Consumer Defensive",
-    "XLU":  "Utilities",
-    "XLRE": "Real Estate",
-    "GDX":  "Gold Miners",
-}
-
+# ── Sector returns ────────────────────────────────────────────────────────────
 def fetch_sector_returns(period_weeks=26):
     """
-    Fetch 26W return for each sector ETF vs SPY.
+    period_weeks return for each sector ETF vs SPY.
     Returns dict: {ticker_sector_etf: relative_return_pct}
-    Pre-fetched once per scan, cached in session state.
+    Closes come from the process-wide sector_return_service (one batched
+    refresh a day for every session); the result is pinned in session state
+    so a scan — or a restored one — keeps the values it was scored with.
     """
     key = f"sector_returns_{period_weeks}"
     if key in st.session_state:
         return st.session_state[key]
-    results = {}
-    try:
-        spy = yf.Ticker("SPY").history(period="1y", interval="1wk", auto_adjust=True)
-        spy_ret = (spy["Close"].iloc[-1] / spy["Close"].iloc[-period_weeks] - 1) * 100 if len(spy) >= period_weeks else 0
-        for etf in list(SECTOR_ETF_MAP.keys()):
-            try:
-                df = yf.Ticker(etf).history(period="1y", interval="1wk", auto_adjust=True)
-                if len(df) >= period_weeks:
-                    etf_ret = (df["Close"].iloc[-1] / df["Close"].iloc[-period_weeks] - 1) * 100
-                    results[etf] = round(etf_ret - spy_ret, 1)
-                else:
-                    results[etf] = 0
-            except Exception:
-                results[etf] = 0
-    except Exception:
-        pass
+    results = sector_relative_returns(period_weeks)
     st.session_state[key] = results
     return results
 
-def get_stock_sector_etf(ticker):
-    """Map a stock to its sector ETF using yfinance info."""
-    cache_key = f"sector_{ticker}"
-    if cache_key in st.session_state:
-        return st.session_state[cache_key]
-    try:
-        info = yf.Ticker(ticker).info
-        sector = info.get("sector", "")
-        # Map yfinance sector string to ETF
-        mapping = {
-            "Technology":             "XLK",
-            "Healthcare":             "XLV",
-            "Financial Services":     "XLF",
-            "Energy":                 "XLE",
-            "Basic Materials":        "XLB",
-            "Industrials":            "XLI",
-            "Communication Services": "XLC",
-            "Consumer Cyclical":      "XLY",
-            "Consumer Defensive":     "XLP",
-            "Utilities":              "XLU",
-            "Real Estate":            "XLRE",
-        }
-        etf = mapping.get(sector, None)
-        st.session_state[cache_key] = (etf, sector)
-        return (etf, sector)
-    except Exception:
-        return (None, "")
-
 
-def sector_heat_strip(sector_returns, hit_sectors=None):
+def sector_heat_strip(sector_returns, hit_sectors=None, other_lookbacks=None):
     """
     Sector heat strip — ranked horizontal bar cards.
     Sorted best → worst 26W momentum vs SPY.
     Each row: label | filled bar | +/- % | hit count badge
+    other_lookbacks: optional {weeks: {etf: rel}} shown in each row's tooltip.
     """
     if not sector_returns:
         return ""
@@ -1350,11 +1217,14 @@ def sector_heat_strip(sector_returns, hit_sectors=None):
         bar_w   = max(4, round(abs(rel) / max_abs * 100))
         hits    = hit_sectors.get(short, 0)
         hits_txt = f"{hits}✦" if hits else ""
+        tip     = f"{full}: {sign}{rel}% vs SPY (26W)" + "".join(
+            f" · {w}W {'+' if r[etf] >= 0 else ''}{r[etf]}%"
+            for w, r in sorted((other_lookbacks or {}).items()) if etf in r)
 
         # Inline styles used as fallback — Safari sometimes ignores CSS classes
         # in Streamlit's unsafe_allow_html markdown
         rows_html.append(
-            f'<div style="display:flex;align-items:center;gap:8px;height:26px;cursor:default" title="{full}: {sign}{rel}% vs SPY (26W)">'
+            f'<div style="display:flex;align-items:center;gap:8px;height:26px;cursor:default" title="{tip}">'
             f'  <div style="font-family:DM Mono,monospace;font-size:0.68rem;font-weight:600;'
             f'       color:#e2e8f0;width:58px;flex-shrink:0;text-align:right;'
             f'       white-space:nowrap;overflow:hidden;text-overflow:ellipsis">{short}</div>'
@@ -1381,65 +1251,6 @@ def sector_heat_strip(sector_returns, hit_sectors=None):
         f'</div>'
     )
 
-def score_sector(ticker, sector_returns):
-    """
-    Return (bonus_pts, sector_name, relative_return).
-    +10 pts if sector >+15% vs SPY over 26W
-    +5  pts if sector +5% to +15%
-     0  pts if sector -5% to +5%
-    -5  pts if sector underperforming
-    """
-    etf, sector_name = get_stock_sector_etf(ticker)
-    if etf is None or etf not in sector_returns:
-        return 0, sector_name or "Unknown", None
-    rel = sector_returns[etf]
-    if rel >= 15:
-        pts = 10
-    elif rel >= 5:
-        pts = 5
-    elif rel >= -5:
-        pts = 0
-    else:
-        pts = -5
-    return pts, sector_name, rel
-
-# Sector-aware prior run thresholds
-# Cyclical/commodity sectors have full cycles at 100-150%
-# Growth sectors need 300%+ to signal a genuine institutional run
-SECTOR_RUN_THRESHOLDS = {
-    "Energy":             150,
-    "Materials":          150,
-    "Industrials":        200,
-    "Utilities":          120,
-    "Real Estate":        120,
-    "Financials":         200,
-    "Consumer Staples":   150,
-    "Consumer Discretionary": 250,
-    "Health Care":        250,
-    "Communication Services": 300,
-    "Technology":         300,
-    "Unknown":            300,  # conservative default
-}
-
-def get_sector_run_threshold(ticker):
-    """Return the min prior run % for this stock's sector."""
-    _, sector = get_stock_sector_etf(ticker)
-    return SECTOR_RUN_THRESHOLDS.get(sector, 300)
-
-# Known ADR tickers — common foreign names trading as ADRs on US exchanges
-# Used to switch from absolute volume floor to relative volume check
-_KNOWN_ADRS = {
-    "BHP", "RIO", "VALE", "SID", "PBR", "CX", "BABA", "JD", "NIO", "XPEV",
-    "LI", "BIDU", "TME", "BILI", "IQ", "WB", "GRAB", "SE", "SHOP", "ASML",
-    "TSM", "UMC", "SNY", "AZN", "NVS", "RHHBY", "BAYRY", "SAP", "SIEGY",
-    "TM", "HMC", "SONY", "SAN", "BBVA", "IBN", "HDB", "INFY", "WIT",
-    "BP", "SHEL", "TOT", "E", "ENI", "EQNR", "STO",
-}
-
-def is_adr(ticker):
-    return ticker.upper() in _KNOWN_ADRS
-
-
 # ── Design System Helpers ─────────────────────────────────────────────────────
 
 def score_arc(score, category="watch"):
@@ -1527,1011 +1338,6 @@ def correction_bar(corr_pct, color):
         f'</div>'
     )
 
-def get_yf_data(ticker, period="5y", freq="1wk"):
-    """
-    Fetch OHLCV from yfinance with in-memory caching.
-    freq: "1wk" for weekly, "1d" for daily
-    Returns a DataFrame with columns: open, high, low, close, volume (lowercase)
-    """
-    cache_key = f"{ticker}_{freq}"
-    if cache_key in _yf_cache:
-        return _yf_cache[cache_key]
-    try:
-        tk = yf.Ticker(ticker)
-        df = tk.history(period=period, interval=freq, auto_adjust=True)
-        if df is None or df.empty:
-            return None
-        df = df.reset_index()
-        # Normalise column names to lowercase
-        df.columns = [c.lower() for c in df.columns]
-        # Rename Date/Datetime → date
-        if "datetime" in df.columns:
-            df = df.rename(columns={"datetime": "date"})
-        if "date" in df.columns:
-            df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
-        df = df.sort_values("date").reset_index(drop=True)
-        _yf_cache[cache_key] = df
-        return df
-    except Exception:
-        return None
-
-def calc_sma(series, period):
-    return series.rolling(window=period, min_periods=period).mean()
-
-def calc_ema(series, period):
-    return series.ewm(span=period, adjust=False).mean()
-
-def calc_atr_pct(df, period=14, use_median=True):
-    """
-    ATR as % of close. use_median=True uses median TR to reduce earnings
-    gap noise — a single gap week inflates mean ATR for the full period,
-    causing valid post-earnings coiling setups to fail the ATR filter.
-    """
-    high  = df["high"]
-    low   = df["low"]
-    close = df["close"]
-    prev  = close.shift(1)
-    tr = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
-    if use_median:
-        atr_val = tr.iloc[-period:].median() if len(tr) >= period else tr.median()
-    else:
-        atr_val = tr.rolling(period).mean().iloc[-1]
-    return float(atr_val / close.iloc[-1] * 100)
-
-def check_weekly(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult, ticker=None):
-    """
-    Weekly retest criteria.
-    ticker: if provided, uses sector-aware run threshold (commodities need less
-    prior run than tech to be considered a genuine institutional cycle).
-    """
-    res = {}
-    if len(df_w) < 52:
-        return False, {"error": "short"}
-    closes = df_w["close"]; vols = df_w["volume"]
-
-    sma200_series = calc_sma(closes, min(200, len(closes) - 1))
-    sma200 = sma200_series.iloc[-1]
-    cur    = closes.iloc[-1]
-
-    # ── ATH: full history ending 8 weeks ago ─────────────────────────────────
-    # Uses ALL available history (not just 4yr) so long-cycle stocks like LITE
-    # (IPO 2013, ATH $391 in 2021) get their real ATH captured.
-    # Ends 8 weeks ago to avoid counting the current rally as the ATH.
-    win_end   = max(0, len(closes) - 8)
-    ath_w     = closes.iloc[:win_end]
-    ath       = ath_w.max() if len(ath_w) > 0 else closes.iloc[0]
-    atl       = ath_w.min() if len(ath_w) > 0 else closes.iloc[0]
-
-    dist = (cur - sma200) / sma200 * 100
-    run  = (ath - atl) / atl * 100  if atl > 0 else 0
-    corr = (ath - cur) / ath * 100  if ath > cur else 0  # 0 if price > ATH (breakout)
-
-    # Sector-aware run threshold — commodity/cyclical cycles are smaller than tech
-    if ticker:
-        sector_run_min = get_sector_run_threshold(ticker)
-        effective_run_min = min(w_prior_run, sector_run_min)
-    else:
-        effective_run_min = w_prior_run
-
-    # ── Volume: best of 4W rolling OR peak single week in last 12W ────────────
-    # Catches both sustained accumulation AND a single explosive volume week.
-    avg_vol_20w = vols.rolling(20).mean().iloc[-1]
-    avg_vol_4w  = vols.rolling(4).mean().iloc[-1]
-    peak_12w    = vols.iloc[-12:].max() if len(vols) >= 12 else vols.max()
-    vr_rolling  = avg_vol_4w  / avg_vol_20w if avg_vol_20w > 0 else 0
-    vr_peak     = peak_12w    / avg_vol_20w if avg_vol_20w > 0 else 0
-    vr          = max(vr_rolling, vr_peak)
-
-    # ── FIX 5: ADR relative volume ───────────────────────────────────────────
-    # ADRs have structurally lower absolute share volume than domestic names.
-    # For ADRs, measure vol vs own 52W history rather than absolute level.
-    # This prevents BHP/ASML/TSM being filtered for "low volume" unfairly.
-    adr_flag = is_adr(ticker) if ticker else False
-    if adr_flag and avg_vol_20w > 0:
-        # Vol rank: where does recent 4W sit in its own 52W distribution?
-        vol_52w = vols.iloc[-52:] if len(vols) >= 52 else vols
-        vol_pct_rank = (avg_vol_4w > vol_52w).mean() * 100  # percentile
-        # Override vr with percentile-based equivalent if ADR
-        # 80th percentile → treat as 1.5× (good), 95th → 2.5× (strong)
-        if vol_pct_rank >= 95:
-            vr = max(vr, 2.5)
-        elif vol_pct_rank >= 80:
-            vr = max(vr, 1.5)
-        elif vol_pct_rank >= 60:
-            vr = max(vr, 1.2)
-    else:
-        adr_flag = False
-        vol_pct_rank = None
-
-    # ── FIX 3: Multi-year volume high ──────────────────────────────────────────
-    # Is the recent volume surge the highest in 3 years (156 weeks)?
-    # This is a different magnitude of signal to a ratio — it means institutions
-    # entered at a scale not seen since the last major cycle.
-    vol_lookback = min(156, len(vols) - 1)
-    hist_vol_max = vols.iloc[-vol_lookback:-1].max() if vol_lookback > 1 else 0
-    recent_peak  = vols.iloc[-12:].max() if len(vols) >= 12 else vols.max()
-    multiyear_vol_high = recent_peak >= hist_vol_max * 0.95  # within 5% of 3yr high
-    vol_rank_pct = (recent_peak / hist_vol_max * 100) if hist_vol_max > 0 else 0
-
-    # ── FIX 2: Undercut and reclaim of 200W SMA ──────────────────────────────
-    # Look back 8 weeks for any week where:
-    #   weekly low < 200W SMA AND weekly close > 200W SMA
-    # This is the capitulation wick pattern — stronger than a clean touch.
-    # The false breakdown flushes weak holders and traps short sellers.
-    highs_w = df_w["high"]
-    lows_w  = df_w["low"]
-    undercut_reclaim = False
-    undercut_reclaim_weeks_ago = None
-    lookback_uc = min(8, len(closes) - 1)
-    for _i in range(1, lookback_uc + 1):
-        _sma = sma200_series.iloc[-_i] if len(sma200_series) >= _i else sma200
-        _lo  = lows_w.iloc[-_i]
-        _cl  = closes.iloc[-_i]
-        if _lo < _sma and _cl > _sma:
-            undercut_reclaim = True
-            undercut_reclaim_weeks_ago = _i
-            break
-
-    # ── 200W SMA Slope — graded, normalised, with deceleration check ────────────
-    # Raw slope is dollar-denominated and not comparable across price levels.
-    # Normalised slope = (sma[-1] - sma[-5]) / sma[-5] * 100  (% change over 5W)
-    # Acceleration = difference in 5W slope between two consecutive 5W windows.
-    # Positive acceleration = slope is improving (less negative or more positive).
-    if len(sma200_series) >= 10:
-        sma_now   = sma200_series.iloc[-1]
-        sma_5w    = sma200_series.iloc[-5]
-        sma_10w   = sma200_series.iloc[-9]   # start of prior 5W window
-        slope_now = (sma_now  - sma_5w)  / sma_5w  * 100 if sma_5w  > 0 else 0
-        slope_5w  = (sma_5w   - sma_10w) / sma_10w * 100 if sma_10w > 0 else 0
-        slope_accel = slope_now - slope_5w   # positive = flattening/turning
-    else:
-        slope_now   = 0.0
-        slope_5w    = 0.0
-        slope_accel = 0.0
-
-    # Slope grade:
-    #   "rising"      slope_now > +0.10%
-    #   "flattening"  slope_now between -0.10% and +0.10% OR accel > 0.05 while declining
-    #   "declining"   slope_now < -0.10% and still deteriorating
-    if slope_now >= 0.10:
-        slope_grade = "rising"
-    elif slope_now >= -0.10 or (slope_now < -0.10 and slope_accel >= 0.05):
-        slope_grade = "flattening"
-    else:
-        slope_grade = "declining"
-
-    pass_dist = (-w_dist_200sma_lo <= dist <= w_dist_200sma_hi)
-
-    res.update({
-        "dist_200sma_pct":        round(dist, 2),
-        "sma200":                 round(sma200, 2),
-        "current_close":          round(cur, 2),
-        "prior_run_pct":          round(run, 1),
-        "correction_from_ath_pct":round(corr, 1),
-        "vol_ratio":              round(vr, 2),
-        "sma200_slope_pct":       round(slope_now, 3),
-        "sma200_slope_accel":     round(slope_accel, 3),
-        "sma200_slope_grade":     slope_grade,
-        # keep legacy key for base breakout compat
-        "sma200_slope":           round(slope_now, 3),
-        "pass_200sma_proximity":  pass_dist,
-        "pass_prior_run":         run >= effective_run_min,
-        "sector_run_min":         effective_run_min,
-        "pass_correction":        corr >= w_correction,
-        "pass_volume_surge":      vr >= w_vol_mult,
-        "pass_sma200_slope":      slope_grade != "declining",
-        "undercut_reclaim":       undercut_reclaim,
-        "undercut_reclaim_wks":   undercut_reclaim_weeks_ago,
-        "multiyear_vol_high":     multiyear_vol_high,
-        "vol_rank_pct":           round(vol_rank_pct, 0),
-        "adr_flag":               adr_flag,
-        "adr_vol_pct_rank":       round(vol_pct_rank, 0) if vol_pct_rank is not None else None,
-    })
-    # ── FIX 4: Resistance flip to support ──────────────────────────────────────
-    # Find the highest weekly close in a 3-month window that ended 6+ months ago.
-    # If current price is sitting within 3% above that level, it flipped to support.
-    res_flip = False
-    res_flip_level = None
-    if len(closes) >= 52:
-        # Resistance window: 26W to 52W ago (roughly 6-12 months back)
-        res_window = closes.iloc[-52:-26]
-        if len(res_window) > 0:
-            prior_resistance = res_window.max()
-            # Current price within 0–3% above that resistance level
-            dist_from_res = (cur - prior_resistance) / prior_resistance * 100
-            if 0 <= dist_from_res <= 3.0:
-                res_flip = True
-                res_flip_level = round(prior_resistance, 2)
-
-    res["resistance_flip"]       = res_flip
-    res["resistance_flip_level"] = res_flip_level
-
-    passed = all([res["pass_200sma_proximity"], res["pass_prior_run"],
-                  res["pass_correction"], res["pass_volume_surge"]])
-    return passed, res
-
-def check_daily(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma):
-    """
-    Daily checks + two-stage ATR-exhaustion signal.
-
-    Stage 1 — Alert (yellow dot):
-        Did price reach ≤ −10× ATR from the rising 50D SMA at any point
-        in the last 60 days? If yes, yellow_dot_fired = True.
-        This is context only — no points awarded.
-
-    Stage 2 — Response (what happened after the dot):
-        "ma_reclaim"  +8pts  — price crossed back above rising 10D EMA,
-                                volume expanding, EMA slope turning up
-        "basing"      +8pts  — ATR contracting, price coiling in <3% range,
-                                volume drying up (base forming, not yet broken)
-        "breakout"   +12pts  — price breaks above 5-day range top with vol surge
-        "watching"     0pts  — dot fired but no actionable response yet
-        None                 — dot never fired, signal irrelevant
-    """
-    res = {}
-    if len(df_d) < 55:
-        return False, {"error": "short"}
-
-    closes  = df_d["close"]
-    highs   = df_d["high"]
-    lows    = df_d["low"]
-    vols    = df_d["volume"]
-    cur     = closes.iloc[-1]
-
-    sma50_series = calc_sma(closes, 50)
-    ema10_series = calc_ema(closes, 10)
-    ema20_series = calc_ema(closes, 20)
-
-    sma50 = sma50_series.iloc[-1]
-    ema10 = ema10_series.iloc[-1]
-    ema20 = ema20_series.iloc[-1]
-    atr   = calc_atr_pct(df_d)
-    p50   = (cur - sma50) / sma50 * 100
-    ema_sp = (ema10 - ema20) / ema20 * 100
-    hi     = highs.iloc[-1]
-    lo     = lows.iloc[-1]
-    rng_pos = (cur - lo) / (hi - lo) if hi != lo else 0.5
-
-    # ── 50D SMA slope ─────────────────────────────────────────────────────────
-    sma50_slope = (sma50_series.iloc[-1] - sma50_series.iloc[-20])                   / sma50_series.iloc[-20] * 100                   if len(sma50_series) >= 20 and sma50_series.iloc[-20] > 0 else 0
-    sma50_rising = sma50_slope > 0
-
-    # ── Current ATR multiple from 50D ─────────────────────────────────────────
-    atr_abs = atr / 100 * cur  # ATR in dollar terms
-    atr_mult_from_50d = (cur - sma50) / atr_abs if atr_abs > 0 else 0
-
-    # ══════════════════════════════════════════════════════════════════════════
-    # STAGE 1 — Yellow dot: did ≤ −10× ATR fire in last 60 days?
-    # ══════════════════════════════════════════════════════════════════════════
-    yellow_dot_fired  = False
-    yellow_dot_day    = None   # how many days ago the most recent dot fired
-    lookback_d        = min(60, len(closes) - 1)
-
-    for i in range(1, lookback_d + 1):
-        day_close = closes.iloc[-i]
-        day_sma50 = sma50_series.iloc[-i] if len(sma50_series) >= i else sma50
-        day_atr_abs = atr_abs  # use current ATR as proxy (stable enough over 60D)
-        if day_atr_abs > 0:
-            day_mult = (day_close - day_sma50) / day_atr_abs
-            if day_mult <= -10.0:
-                yellow_dot_fired = True
-                yellow_dot_day   = i
-                break   # find most recent occurrence
-
-    # ══════════════════════════════════════════════════════════════════════════
-    # STAGE 2 — Response detection (only if dot fired)
-    # ══════════════════════════════════════════════════════════════════════════
-    post_dot_stage = None
-    post_dot_pts   = 0
-
-    if yellow_dot_fired and yellow_dot_day is not None:
-        # ── A) Base Breakout ─────────────────────────────────────────────────
-        # Price breaks above the 5-day range top (measured from just before
-        # today) with a volume surge — strongest signal, highest pts
-        if len(closes) >= 6:
-            range_5d_high = highs.iloc[-6:-1].max()
-            range_5d_low  = lows.iloc[-6:-1].min()
-            avg_vol_20d   = vols.rolling(20).mean().iloc[-1]
-            vol_today     = vols.iloc[-1]
-            broke_out     = cur > range_5d_high * 1.005   # 0.5% buffer
-            vol_surge     = vol_today > avg_vol_20d * 1.5
-            if broke_out and vol_surge and sma50_rising:
-                post_dot_stage = "breakout"
-                post_dot_pts   = 12
-
-        # ── B) MA Reclaim ────────────────────────────────────────────────────
-        # Price has crossed back above the rising 10D EMA after having been
-        # below it. Volume on the reclaim is above average.
-        if post_dot_stage is None and len(closes) >= 5:
-            # Was below EMA10 yesterday, above today
-            was_below = closes.iloc[-2] < ema10_series.iloc[-2]
-            now_above = cur >= ema10_series.iloc[-1]
-            ema10_slope_5d = (ema10_series.iloc[-1] - ema10_series.iloc[-5])                               / ema10_series.iloc[-5] * 100                               if len(ema10_series) >= 5 and ema10_series.iloc[-5] > 0 else 0
-            ema10_turning  = ema10_slope_5d >= 0   # flattening or rising
-            vol_expanding  = vols.iloc[-1] > vols.rolling(20).mean().iloc[-1] * 1.2
-            if was_below and now_above and ema10_turning and sma50_rising:
-                post_dot_stage = "ma_reclaim"
-                post_dot_pts   = 8
-
-        # ── C) Basing ────────────────────────────────────────────────────────
-        # ATR contracting + price coiling in narrow range + volume drying up
-        # Means institutions are absorbing supply quietly after the selloff
-        if post_dot_stage is None and len(closes) >= 15:
-            atr_5d  = calc_atr_pct(df_d.iloc[-5:])   if len(df_d) >= 5  else atr
-            atr_10d = calc_atr_pct(df_d.iloc[-15:-5]) if len(df_d) >= 15 else atr
-            range_5d_hi = highs.iloc[-5:].max()
-            range_5d_lo = lows.iloc[-5:].min()
-            range_5d_pct = (range_5d_hi - range_5d_lo) / range_5d_lo * 100                            if range_5d_lo > 0 else 999
-            avg_vol_20d  = vols.rolling(20).mean().iloc[-1]
-            avg_vol_5d   = vols.iloc[-5:].mean()
-            atr_contracting = atr_5d < atr_10d * 0.80   # 20%+ contraction
-            coiling         = range_5d_pct < 4.0         # price in <4% range
-            vol_drying      = avg_vol_5d < avg_vol_20d * 0.8
-            if atr_contracting and coiling and sma50_rising:
-                post_dot_stage = "basing"
-                post_dot_pts   = 10 if vol_drying else 8   # extra if vol also dry
-
-        # ── D) Watching ──────────────────────────────────────────────────────
-        # Dot fired but no clear response pattern yet — on radar, not actionable
-        if post_dot_stage is None:
-            post_dot_stage = "watching"
-            post_dot_pts   = 0
-
-    res.update({
-        "atr_pct":            round(atr, 2),
-        "pct_above_50sma":    round(p50, 2),
-        "ema10_vs_ema20_pct": round(ema_sp, 2),
-        "candle_range_position": round(rng_pos, 2),
-        "atr_mult_from_50d":  round(atr_mult_from_50d, 2),
-        "sma50_rising":       sma50_rising,
-        "yellow_dot_fired":   yellow_dot_fired,
-        "yellow_dot_day":     yellow_dot_day,
-        "post_dot_stage":     post_dot_stage,
-        "post_dot_pts":       post_dot_pts,
-        "pass_atr":           d_atr_pct_min <= atr <= d_atr_pct_max,
-        "pass_50sma":         -40 <= p50 <= d_above_50sma,
-        "pass_ema_cross":     ema_sp > -5,
-        "pass_candle_position": rng_pos >= 0.4,
-        # Legacy key — True if currently AT the dot level (for retest mode compat)
-        "pass_atr_mult":      yellow_dot_fired and post_dot_stage != "watching",
-    })
-    return res["pass_atr"] and res["pass_50sma"], res
-
-def check_recovery_structure(df_w):
-    """
-    Detects which recovery structure (if any) is present after the bottom.
-    Returns a dict with:
-      - structure:    "ma_stack" | "bounce_ema" | "first_pullback" | "none"
-      - structure_pts: 0–15 (bonus points)
-      - structure_label: human-readable label for the badge
-      - sub-fields for the card metric strip
-    
-    Three patterns detected:
-    
-    1. MA STACK — EMAs aligned in bull order above 200W SMA
-       10W EMA > 20W EMA > 50W SMA, all above 200W SMA
-       Full stack = 15pts, partial (2 of 3 in order) = 8pts
-    
-    2. BOUNCE OFF RISING EMA — price pulling back to rising 10W/20W EMA
-       Price within 5% below the EMA, EMA slope positive over 8W,
-       price higher than 12 weeks ago (uptrend intact)
-       = 10pts
-    
-    3. FIRST PULLBACK — ran to local high, now consolidating or pulling back
-       Local high 4–16W ago was 10%+ above current price,
-       price near 20W or 50W EMA (within 8%),
-       weekly ATR contracting (last 4W avg ATR < prior 8W avg ATR)
-       = 10pts
-    """
-    res = {
-        "structure": "none",
-        "structure_pts": 0,
-        "structure_label": "No structure",
-        "ma_stack_full": False,
-        "ma_stack_partial": False,
-        "bounce_ema": False,
-        "first_pullback": False,
-        "ema10w": None,
-        "ema20w": None,
-        "sma50w": None,
-        "local_high_pct": None,
-        "atr_contracting": False,
-    }
-
-    if len(df_w) < 52:
-        return res
-
-    closes = df_w["close"]
-    highs  = df_w["high"]
-    lows   = df_w["low"]
-    cur    = closes.iloc[-1]
-
-    # ── Compute MAs ───────────────────────────────────────────────────────────
-    ema10w_s = calc_ema(closes, 10)
-    ema20w_s = calc_ema(closes, 20)
-    sma50w_s = calc_sma(closes, min(50, len(closes)-1))
-    sma200_s = calc_sma(closes, min(200, len(closes)-1))
-
-    ema10w  = ema10w_s.iloc[-1]
-    ema20w  = ema20w_s.iloc[-1]
-    sma50w  = sma50w_s.iloc[-1]
-    sma200  = sma200_s.iloc[-1]
-
-    res["ema10w"] = round(ema10w, 2)
-    res["ema20w"] = round(ema20w, 2)
-    res["sma50w"] = round(sma50w, 2)
-
-    # ── Structure 1: MA Stack ─────────────────────────────────────────────────
-    above_200  = sma50w > sma200   # 50W above 200W — base requirement
-    ema_stack  = ema10w > ema20w   # 10W EMA above 20W EMA
-    sma_stack  = ema20w > sma50w   # 20W EMA above 50W SMA
-    price_top  = cur > ema10w      # price leading the stack
-
-    stack_score = sum([above_200, ema_stack, sma_stack, price_top])
-    full_stack    = stack_score >= 4
-    partial_stack = stack_score == 3
-
-    res["ma_stack_full"]    = full_stack
-    res["ma_stack_partial"] = partial_stack
-
-    if full_stack:
-        res["structure"]     = "ma_stack"
-        res["structure_pts"] = 15
-        res["structure_label"] = "MA Stack"
-        return res
-    if partial_stack:
-        res["structure"]     = "ma_stack"
-        res["structure_pts"] = 8
-        res["structure_label"] = "Partial Stack"
-        # Don't return — still check other structures to label correctly
-
-    # ── Structure 2: Bounce off rising EMA ───────────────────────────────────
-    # Price pulling back to 10W or 20W EMA with positive slope
-    dist_ema10 = (cur - ema10w) / ema10w * 100  # negative = below EMA
-    dist_ema20 = (cur - ema20w) / ema20w * 100
-
-    # EMA slopes: positive over last 8 weeks
-    ema10_slope = ema10w_s.iloc[-1] - ema10w_s.iloc[-8] if len(ema10w_s) >= 8 else 0
-    ema20_slope = ema20w_s.iloc[-1] - ema20w_s.iloc[-8] if len(ema20w_s) >= 8 else 0
-
-    # Price trend: higher than 12 weeks ago
-    price_12w_ago   = closes.iloc[-12] if len(closes) >= 12 else closes.iloc[0]
-    uptrend_intact  = cur > price_12w_ago
-
-    touching_ema10 = -5.0 <= dist_ema10 <= 2.0 and ema10_slope > 0
-    touching_ema20 = -5.0 <= dist_ema20 <= 2.0 and ema20_slope > 0
-
-    if (touching_ema10 or touching_ema20) and uptrend_intact and res["structure_pts"] == 0:
-        res["structure"]      = "bounce_ema"
-        res["structure_pts"]  = 10
-        res["structure_label"]= "EMA Bounce"
-        res["bounce_ema"]     = True
-
-    # ── Structure 3: First Pullback ───────────────────────────────────────────
-    # Local high 4–16W ago was 10%+ above current; price near 20W/50W EMA;
-    # ATR contracting (last 4W < prior 8W)
-    lookback = min(16, len(closes) - 1)
-    local_high = closes.iloc[-lookback:-1].max() if lookback > 1 else cur
-    local_high_pct = (local_high - cur) / cur * 100 if cur > 0 else 0
-
-    dist_to_ema20 = abs((cur - ema20w) / ema20w * 100)
-    dist_to_sma50 = abs((cur - sma50w) / sma50w * 100)
-    near_ma = dist_to_ema20 <= 8 or dist_to_sma50 <= 8
-
-    # ATR contraction: compare last 4W vs prior 8W
-    if len(highs) >= 12:
-        tr_series = pd.concat([
-            highs - lows,
-            (highs - closes.shift(1)).abs(),
-            (lows  - closes.shift(1)).abs()
-        ], axis=1).max(axis=1)
-        atr_4w  = tr_series.iloc[-4:].mean()
-        atr_8w  = tr_series.iloc[-12:-4].mean()
-        atr_contracting = atr_4w < atr_8w * 0.85  # 15% contraction
-    else:
-        atr_contracting = False
-
-    res["local_high_pct"]  = round(local_high_pct, 1)
-    res["atr_contracting"] = atr_contracting
-
-    if local_high_pct >= 10 and near_ma and res["structure_pts"] == 0:
-        res["structure"]      = "first_pullback"
-        res["structure_pts"]  = 10 if atr_contracting else 7
-        res["structure_label"]= "First Pullback" + (" + Compression" if atr_contracting else "")
-        res["first_pullback"] = True
-
-    return res
-
-def check_base_breakout(df_w, bb_base_years, bb_range_pct, bb_atr_max,
-                         bb_vol_mult, bb_sma_lo, bb_sma_hi):
-    """
-    Base Breakout Mode criteria:
-    - Multi-year tight sideways consolidation (low ATR, narrow range)
-    - Price near / breaking above 200W SMA
-    - Volume surge on breakout week
-    - Long base duration
-    """
-    res = {}
-    if len(df_w) < 52:
-        return False, {"error": "short"}
-
-    closes = df_w["close"]
-    vols   = df_w["volume"]
-    cur    = closes.iloc[-1]
-
-    # 200W SMA (use available history)
-    sma200_series = calc_sma(closes, min(200, len(closes) - 1))
-    sma200 = sma200_series.iloc[-1]
-    dist   = (cur - sma200) / sma200 * 100
-
-    # Base window = last bb_base_years * 52 weeks
-    base_weeks = int(bb_base_years * 52)
-    base_window = closes.iloc[-(base_weeks + 1):-1] if len(closes) > base_weeks else closes.iloc[:-1]
-
-    if len(base_window) < 26:
-        return False, {"error": "insufficient base history"}
-
-    base_high = base_window.max()
-    base_low  = base_window.min()
-    base_range_pct = (base_high - base_low) / base_low * 100 if base_low > 0 else 999
-
-    # Weekly ATR% during base (avg ATR over base window)
-    if len(df_w) >= base_weeks + 1:
-        base_df = df_w.iloc[-(base_weeks + 1):-1].copy()
-    else:
-        base_df = df_w.iloc[:-1].copy()
-    base_atr = calc_atr_pct(base_df) if len(base_df) >= 14 else 999
-
-    # Volume surge — current 4W avg vs 20W avg
-    avg_vol_4w  = vols.rolling(4).mean().iloc[-1]
-    avg_vol_20w = vols.rolling(20).mean().iloc[-1]
-    vr = avg_vol_4w / avg_vol_20w if avg_vol_20w > 0 else 0
-
-    # Base duration — how many consecutive weeks price stayed within base range
-    # Count weeks from end going backwards where close stayed within base_low*0.9 to base_high*1.1
-    duration_weeks = 0
-    for i in range(len(closes) - 2, max(0, len(closes) - base_weeks * 2) - 1, -1):
-        if base_low * 0.85 <= closes.iloc[i] <= base_high * 1.15:
-            duration_weeks += 1
-        else:
-            break
-    duration_years = round(duration_weeks / 52, 1)
-
-    slope = sma200_series.iloc[-1] - sma200_series.iloc[-5] if len(sma200_series) >= 5 else 0
-
-    # ── Sub-type detection ────────────────────────────────────────────────────
-    # Growth stock base (PLTR style):
-    #   - 200W SMA well below price (price never retested it, SMA still rising)
-    #   - MAs beginning to stack in bull order
-    #   - Base tighter on shorter timeframe (18mo vs 3yr)
-    # Commodity cycle base (KGC style):
-    #   - Price near 200W SMA (just breaking above)
-    #   - Longer multi-year base
-    #   - Lower ATR expected during base
-    ema10w = calc_ema(closes, 10).iloc[-1]  if len(closes) >= 10  else cur
-    ema20w = calc_ema(closes, 20).iloc[-1]  if len(closes) >= 20  else cur
-    sma50w = calc_sma(closes, min(50, len(closes)-1)).iloc[-1]
-    ma_stack = (cur > ema10w > ema20w > sma50w > sma200)
-    ma_partial = sum([cur > ema10w, ema10w > ema20w, ema20w > sma50w, sma50w > sma200]) >= 3
-    # Growth: price >50% above 200W SMA, MAs stacking, base was 12-30 months
-    is_growth_base = dist > 50 and (ma_stack or ma_partial) and duration_weeks <= 130
-    # Commodity: price within 40% of 200W SMA, longer base typical
-    is_commodity_base = dist <= 60
-    sub_type = "growth" if is_growth_base else "commodity"
-
-    pass_sma      = (-bb_sma_lo <= dist <= bb_sma_hi)
-    pass_range    = base_range_pct <= bb_range_pct
-    pass_atr_base = base_atr <= bb_atr_max
-    pass_vol      = vr >= bb_vol_mult
-    pass_duration = duration_weeks >= (bb_base_years * 52 * 0.5)  # at least half the target duration
-
-    res.update({
-        "dist_200sma_pct":    round(dist, 2),
-        "sma200":             round(sma200, 2),
-        "current_close":      round(cur, 2),
-        "base_range_pct":     round(base_range_pct, 1),
-        "base_atr_pct":       round(base_atr, 2),
-        "base_duration_yrs":  duration_years,
-        "vol_ratio":          round(vr, 2),
-        "sma200_slope":       round(slope, 2),
-        "pass_200sma_proximity": pass_sma,
-        "pass_base_range":    pass_range,
-        "pass_base_atr":      pass_atr_base,
-        "pass_volume_surge":  pass_vol,
-        "pass_base_duration": pass_duration,
-        "pass_sma200_slope":  slope >= -0.05,
-        "sub_type":           sub_type,
-        "ma_stack":           ma_stack,
-        "ma_partial":         ma_partial,
-        "ema10w":             round(ema10w, 2),
-        "ema20w":             round(ema20w, 2),
-        "sma50w":             round(sma50w, 2),
-        # Compat fields for shared badge renderer
-        "pass_prior_run":     True,
-        "correction_from_ath_pct": 0,
-        "prior_run_pct":      0,
-    })
-    # ── Sub-type detection: Growth Stock Base vs Commodity Cycle ────────────────
-    # Growth base: shorter history OK, higher ATR acceptable, MA stack forming,
-    #   stock recently broke out of base (dist from 200W SMA elevated),
-    #   typically tech/AI/healthcare sector
-    # Commodity cycle: longer base, lower ATR, 200W SMA acts as floor,
-    #   vol surge at breakout is primary signal
-    #
-    # Heuristic: if base_atr > 3% OR dist > 50% above 200W SMA → growth profile
-    if base_atr > 3.0 or dist > 50:
-        base_subtype = "growth"
-        # Growth: relax base duration (min 12 months), tighter vol requirement
-        pass_duration_growth = duration_weeks >= 52
-    else:
-        base_subtype = "commodity"
-        pass_duration_growth = pass_duration
-
-    res["base_subtype"]        = base_subtype
-    res["pass_duration_typed"] = pass_duration_growth
-
-    passed = all([pass_sma, pass_range, pass_atr_base, pass_vol,
-                  pass_duration_growth if base_subtype == "growth" else pass_duration])
-    return passed, res
-
-def score_base_breakout(br, dr):
-    """
-    Base Breakout scoring — sub-typed for Growth vs Commodity.
-    Growth base: shorter duration OK, higher ATR acceptable, MA stack forming.
-    Commodity cycle: longer base, lower ATR, 200W SMA proximity critical.
-    ATR-multiple-from-50D bonus: rewards precise pullback entry (PLTR signal).
-    """
-    pts = 0
-    subtype = br.get("base_subtype", "commodity")
-
-    if subtype == "growth":
-        # Growth: base range + vol + MA stack more important than duration
-        if br.get("pass_200sma_proximity"): pts += 15   # less critical — can be well above
-        if br.get("pass_base_range"):       pts += 20
-        if br.get("pass_base_atr"):         pts += 15   # relaxed — growth is volatile
-        if br.get("pass_volume_surge"):     pts += 25   # most important for growth breakouts
-        if br.get("pass_duration_typed"):   pts += 10
-        if br.get("pass_sma200_slope"):     pts += 5
-        if dr.get("pass_atr"):              pts += 5
-        if dr.get("pass_50sma"):            pts += 5    # MA stack alignment
-        # ATR-exhaustion response bonus — points come from Stage 2, not Stage 1
-        # Stage 1 (dot firing) = alert only, no pts
-        # Stage 2 (response):  breakout=12, basing=8-10, ma_reclaim=8, watching=0
-        pts += dr.get("post_dot_pts", 0)
-        if dr.get("pass_ema_cross"):        pts += 3
-        if dr.get("pass_candle_position"):  pts += 2
-        # partial: -13 for the 15 not awarded on proximity
-    else:
-        # Commodity: proximity + duration + vol all equally critical
-        if br.get("pass_200sma_proximity"): pts += 25
-        if br.get("pass_base_range"):       pts += 20
-        if br.get("pass_base_atr"):         pts += 20
-        if br.get("pass_volume_surge"):     pts += 20
-        if br.get("pass_base_duration"):    pts += 10
-        if br.get("pass_sma200_slope"):     pts += 5
-        if dr.get("pass_atr"):              pts += 5
-        if dr.get("pass_50sma"):            pts += 5
-        if dr.get("pass_ema_cross"):        pts += 3
-        if dr.get("pass_candle_position"):  pts += 2
-
-    return pts
-
-def score_setup(wr, dr):
-    """
-    Proportional scoring — rewards extremity, not just binary pass/fail.
-    Total: 100 points possible.
-
-    Prior run  (25pts): scales from 0 at 100% run to 25 at 1000%+
-    Correction (20pts): scales from 0 at 30% to 20 at 80%+
-    Volume     (20pts): scales from 0 at 1x to 20 at 3x+
-    200W SMA   (15pts): 15 if within window, partial credit for close misses
-    SMA slope  (0-8pts): graded — rising=8, flattening=5, declining=0
-    Daily ATR  ( 5pts): binary — in range
-    50D SMA    ( 5pts): binary — not too extended
-    EMA cross  ( 3pts): binary — EMA10 > EMA20
-    Candle pos ( 2pts): binary — closing in upper half of range
-    """
-    pts = 0
-
-    # Prior run — proportional 0–25pts (scales up to 1000%)
-    run = wr.get("prior_run_pct", 0)
-    pts += min(25, max(0, (run - 100) / 900 * 25))
-
-    # Correction — proportional 0–20pts (20% = 0pts, 80% = 20pts)
-    corr = wr.get("correction_from_ath_pct", 0)
-    pts += min(20, max(0, (corr - 20) / 60 * 20))
-
-    # Volume surge — proportional 0–20pts (1x = 0pts, 3x+ = 20pts)
-    vr = wr.get("vol_ratio", 0)
-    pts += min(20, max(0, (vr - 1.0) / 2.0 * 20))
-
-    # 200W SMA proximity — 15pts if inside window, 5pts if within 10% outside
-    dist = wr.get("dist_200sma_pct", 999)
-    if wr.get("pass_200sma_proximity"):
-        pts += 15
-    elif abs(dist) <= 10:
-        pts += 5  # partial credit for near misses
-
-    # 200W SMA slope — graded 0/3/5/8pts
-    slope_grade = wr.get("sma200_slope_grade", "declining")
-    slope_accel = wr.get("sma200_slope_accel", 0)
-    if slope_grade == "rising":
-        pts += 8    # cleanest signal — SMA actively rising
-    elif slope_grade == "flattening":
-        pts += 5    # floor forming — acceptable for early-stage setups
-    else:
-        pts += 0    # still declining — penalise, PYPL/ENPH style trap
-
-    # Binary daily criteria
-    if dr.get("pass_atr"):              pts += 5
-    if dr.get("pass_50sma"):            pts += 5
-    if dr.get("pass_ema_cross"):        pts += 3
-    if dr.get("pass_candle_position"):  pts += 2
-
-    # Fix 4 bonus: resistance flip to support (+5pts)
-    if wr.get("resistance_flip"):
-        pts += 5
-
-    # Fix 2 bonus: undercut and reclaim of 200W SMA (+8pts)
-    # Most powerful when recent (within 4W) — decays to 4pts for older signals
-    if wr.get("undercut_reclaim"):
-        wks = wr.get("undercut_reclaim_wks", 8)
-        pts += 8 if wks <= 4 else 4
-
-    # Fix 3 bonus: multi-year volume high (+6pts)
-    # Institutional participation at a scale not seen since last cycle
-    if wr.get("multiyear_vol_high"):
-        pts += 6
-
-    return round(pts)
-
-# ── Backtest Helpers ─────────────────────────────────────────────────────────
-
-# Known historic setups for validation
-KNOWN_SETUPS = [
-    {
-        "ticker": "TPL",
-        "date": "2026-02-03",
-        "label": "Texas Pacific Land — Feb 2026",
-        "desc": "Retested rising 200W SMA at ~$335 after 70% correction from $1,200 ATH. "
-                "Volume surge 3.9× average. Ran from $270 to $589 in 6 weeks.",
-        "expected_score": 90,
-    },
-    {
-        "ticker": "NVDA",
-        "date": "2023-01-09",
-        "label": "NVIDIA — Jan 2023",
-        "desc": "Retested 200W SMA after ~65% correction from $346 ATH during 2022 bear. "
-                "Setup preceded massive AI-driven run to $974.",
-        "expected_score": 75,
-    },
-    {
-        "ticker": "META",
-        "date": "2022-11-07",
-        "label": "Meta Platforms — Nov 2022",
-        "desc": "Down 77% from ATH, retesting long-term support. Massive prior run 2012–2021. "
-                "Recovered from $88 low to over $500.",
-        "expected_score": 75,
-    },
-    {
-        "ticker": "TSLA",
-        "date": "2023-01-09",
-        "label": "Tesla — Jan 2023",
-        "desc": "80% correction from $414 ATH to ~$101 low, testing major long-term support. "
-                "Prior run of 1,500%+ from 2019 base.",
-        "expected_score": 70,
-    },
-    {
-        "ticker": "NVDA",
-        "date": "2024-01-08",
-        "label": "NVIDIA — Jan 2024 (ideal entry)",
-        "desc": "Post-consolidation breakout after the Jan 2023 bottom. 200W SMA now "
-                "rising strongly. MAs stacking in bull order. First clean weekly close "
-                "above all key MAs with expanding volume — the textbook re-entry.",
-        "expected_score": 85,
-    },
-    {
-        "ticker": "AMD",
-        "date": "2022-10-17",
-        "label": "AMD — Oct 2022 (200W SMA retest)",
-        "desc": "~70% correction from $164 ATH. 200W SMA beginning to flatten after "
-                "steep decline. Massive prior run 2018–2021. Similar setup to NVDA Jan 2023 "
-                "— AI/data centre tailwind drove subsequent 300%+ run.",
-        "expected_score": 75,
-    },
-    {
-        "ticker": "COIN",
-        "date": "2023-01-09",
-        "label": "Coinbase — Jan 2023 (crypto cycle bottom)",
-        "desc": "~90% correction from $430 ATH during crypto winter. 200W SMA beginning "
-                "to flatten. Accumulated at lows before BTC ETF approval catalyst. "
-                "Ran from ~$30 to $280+ in 2023-2024.",
-        "expected_score": 70,
-    },
-    {
-        "ticker": "PYPL",
-        "date": "2023-01-09",
-        "label": "PayPal — Jan 2023 ⚠ TRAP",
-        "desc": "NEGATIVE EXAMPLE: 200W SMA still steeply declining at entry. No base "
-                "formed, no accumulation volume, no macro catalyst. Price drifted sideways "
-                "for 2 years. Kept as a calibration trap — scanner should score this LOW.",
-        "expected_score": 45,
-        "is_trap": True,
-    },
-    {
-        "ticker": "ENPH",
-        "date": "2023-10-30",
-        "label": "Enphase Energy — Oct 2023 ⚠ TRAP",
-        "desc": "NEGATIVE EXAMPLE: Still in freefall at entry date. 200W SMA declining "
-                "steeply, never retested, correction ongoing to $47 by Feb 2026. "
-                "Kept as calibration — scanner should score this LOW.",
-        "expected_score": 40,
-        "is_trap": True,
-    },
-    {
-        "ticker": "LITE",
-        "date": "2025-07-07",
-        "label": "Lumentum Holdings — Jul 2025",
-        "desc": "91% correction from $391 ATH down to $35 low. Price sitting ~20-25% "
-                "below rising 200W SMA (~$67). Prior run 1,460%+. Volume surge visible "
-                "on weekly as institutions accumulated. Ran from $51 to $391 in months.",
-        "expected_score": 70,
-    },
-    {
-        "ticker": "LITE",
-        "date": "2025-08-04",
-        "label": "Lumentum Holdings — Aug 2025 (breakout week)",
-        "desc": "Week price crossed back above 200W SMA with massive volume surge. "
-                "Classic retest-then-breakout confirmation. ATR% elevated showing "
-                "volatility expansion at the start of the move.",
-        "expected_score": 75,
-        "mode": "retest",
-    },
-    {
-        "ticker": "KGC",
-        "date": "2024-10-07",
-        "label": "Kinross Gold — Oct 2024 (base breakout)",
-        "desc": "Multi-year sideways base from 2022–2024 between $3.50–$8.00. "
-                "Gold sector tailwind from macro. Volume surge as price broke above "
-                "200W SMA (~$5.50). Ran from ~$8 to $35+ by Feb 2026.",
-        "expected_score": 70,
-        "mode": "base_breakout",
-    },
-    {
-        "ticker": "KGC",
-        "date": "2024-12-30",
-        "label": "Kinross Gold — Dec 2024 (mid breakout)",
-        "desc": "Price already above 200W SMA, base breakout confirmed. "
-                "Still early in the move — $9.78 with 200W SMA at $5.93.",
-        "expected_score": 65,
-        "mode": "base_breakout",
-    },
-    {
-        "ticker": "PLTR",
-        "date": "2024-10-28",
-        "label": "Palantir — Oct 2024 (growth base entry)",
-        "desc": "Multi-year base 2022–2024 between $6–$20. 200W SMA well below "
-                "price (~$12) — growth stock base, not a SMA retest. "
-                "MAs stacking in bull order. First ATR-zone yellow dot appears. "
-                "Broke out from base top to $125+ by Feb 2026.",
-        "expected_score": 72,
-        "mode": "base_breakout",
-    },
-    {
-        "ticker": "PLTR",
-        "date": "2024-11-04",
-        "label": "Palantir — Nov 2024 (growth base breakout)",
-        "desc": "Multi-year base from 2022–2024 between $6–$20. Full MA stack "
-                "forming (EMA10=$42.55, EMA20=$36.92, SMA50=$26.66, SMA200=$18.40). "
-                "Massive vol surge on election week (604M shares). Price broke "
-                "above 200W SMA and accelerated. ATR-mult from 50D = ideal pullback zone. "
-                "Classic growth base breakout — NOT a 200W SMA retest.",
-        "expected_score": 72,
-        "mode": "base_breakout",
-    },
-    {
-        "ticker": "BHP",
-        "date": "2025-01-13",
-        "label": "BHP Group — Jan 2025 (commodity retest)",
-        "desc": "53% correction from $85 ATH to $39.73 low. 200W SMA rising throughout — "
-                "never lost upward angle. Classic undercut and reclaim: weekly low briefly "
-                "below 200W SMA then snapped back above. Highest volume in 3 years on "
-                "breakout. ADR on NYSE — relative vol used. Prior run ~110% "
-                "(commodities threshold, not 300% tech threshold).",
-        "expected_score": 68,
-        "mode": "retest",
-    },
-    {
-        "ticker": "PLTR",
-        "date": "2024-10-30",
-        "label": "Palantir — Oct 2024 (first yellow dot)",
-        "desc": "First yellow dot fires — price extended −10× ATR below the rising 50D SMA. "
-                "This exhaustion level marked the final shakeout before the Nov surge. "
-                "Volume quiet, 50D rising, MAs stacking — textbook growth base entry.",
-        "expected_score": 65,
-        "mode": "base_breakout",
-    },
-]
-
-def get_yf_data_asof(ticker, as_of_date, lookback_years=12, freq="1wk"):
-    """
-    Fetch historical data and truncate to simulate scanning on a past date.
-    Returns only data available up to as_of_date.
-    """
-    try:
-        start = (as_of_date - timedelta(days=365 * lookback_years)).strftime("%Y-%m-%d")
-        end   = (as_of_date + timedelta(days=7)).strftime("%Y-%m-%d")
-        tk = yf.Ticker(ticker)
-        df = tk.history(start=start, end=end, interval=freq, auto_adjust=True)
-        if df is None or df.empty:
-            return None
-        df = df.reset_index()
-        df.columns = [c.lower() for c in df.columns]
-        if "datetime" in df.columns:
-            df = df.rename(columns={"datetime": "date"})
-        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
-        # Truncate to as_of_date
-        df = df[df["date"] <= pd.Timestamp(as_of_date)].sort_values("date").reset_index(drop=True)
-        return df if len(df) > 0 else None
-    except Exception:
-        return None
-
-def run_single_backtest(ticker, as_of_date, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction,
-                         w_vol_mult, d_atr_pct_min, d_atr_pct_max, d_above_50sma,
-                         mode="retest",
-                         bb_base_years=2, bb_range_pct=60, bb_atr_max=4.0,
-                         bb_vol_mult=2.0, bb_sma_lo=10, bb_sma_hi=40):
-    """Run scanner criteria on a single ticker as of a specific past date."""
-    df_w = get_yf_data_asof(ticker, as_of_date, lookback_years=10, freq="1wk")
-    df_d = get_yf_data_asof(ticker, as_of_date, lookback_years=2, freq="1d")
-
-    if df_w is None or len(df_w) < 52:
-        return None, None, None, "Insufficient weekly history"
-    if df_d is None or len(df_d) < 55:
-        return None, None, None, "Insufficient daily history"
-
-    d_pass, dr = check_daily(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma)
-
-    if mode == "retest":
-        w_pass, wr = check_weekly(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult)
-        sc = score_setup(wr, dr)
-    else:
-        w_pass, wr = check_base_breakout(df_w, bb_base_years, bb_range_pct,
-                                          bb_atr_max, bb_vol_mult, bb_sma_lo, bb_sma_hi)
-        sc = score_base_breakout(wr, dr)
-    return w_pass, d_pass, sc, wr, dr
-
-# ── Forward Return Helper ────────────────────────────────────────────────────
-def get_forward_return(ticker, as_of_date, weeks):
-    """
-    Fetch the closing price N weeks after as_of_date and compute % return.
-    Returns (fwd_price, fwd_return_pct) or (None, None) if data unavailable.
-    """
-    try:
-        start = as_of_date.strftime("%Y-%m-%d")
-        end   = (as_of_date + timedelta(days=weeks * 7 + 14)).strftime("%Y-%m-%d")
-        tk    = yf.Ticker(ticker)
-        df    = tk.history(start=start, end=end, interval="1wk", auto_adjust=True)
-        if df is None or len(df) < 2:
-            return None, None
-        df = df.reset_index()
-        df.columns = [c.lower() for c in df.columns]
-        if "datetime" in df.columns:
-            df = df.rename(columns={"datetime": "date"})
-        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
-        # Entry = first available close on or after as_of_date
-        entry_row = df.iloc[0]
-        entry_price = entry_row["close"]
-        # Target = closest row to N weeks forward
-        target_date = as_of_date + timedelta(weeks=weeks)
-        df["dist"] = (df["date"] - target_date).abs()
-        fwd_row   = df.loc[df["dist"].idxmin()]
-        fwd_price = fwd_row["close"]
-        fwd_ret   = (fwd_price - entry_price) / entry_price * 100
-        return round(fwd_price, 2), round(fwd_ret, 2)
-    except Exception:
-        return None, None
-
 # ── Global UI Helper ─────────────────────────────────────────────────────────
 def badge(ok, label):
     cls = "badge-green" if ok else "badge-red"
@@ -2720,6 +1526,9 @@ with tab1:
                     st.session_state["finviz_meta"]    = meta
                     with st.spinner("Pre-fetching sector momentum data..."):
                         fetch_sector_returns(26)
+                        # Seed the persistent sector index from TradingView's
+                        # sector column — saves a yfinance .info call per name
+                        sector_index.seed_from_tradingview(meta)
                     st.success(f"✅ {len(found)} tickers loaded · sector data cached — go to Scanner tab")
                     # Show cap tier breakdown
                     if meta:
@@ -2809,7 +1618,8 @@ with tab2:
         _status_label = "✅ Scan completed" if _done else f"⚡ Scan interrupted at {_n}/{_total} tickers"
         _status_color = "#10b981" if _done else "#f59e0b"
 
-        _rb1, _rb2, _rb3 = st.columns([4, 1, 1])
+        _can_resume = not _done and st.session_state.get("_resume_state") is not None
+        _rb1, _rb2, _rb3, _rb4 = st.columns([4, 1, 1, 1])
         _rb1.markdown(
             f'<div style="background:var(--bg-card);border:1px solid {_status_color};' +
             f'border-radius:10px;padding:0.75rem 1.1rem;display:flex;align-items:center;gap:1rem">' +
@@ -2821,11 +1631,18 @@ with tab2:
             unsafe_allow_html=True)
         if _rb2.button("📋 Show Results", use_container_width=True, key="resume_show"):
             st.session_state["show_restored"] = True
-        if _rb3.button("🗑 Discard", use_container_width=True, key="resume_discard"):
+        if _can_resume and _rb3.button(f"▶ Resume ({_n}/{_total})", use_container_width=True,
+                                       key="resume_scan",
+                                       help="Continue from the first unscanned ticker with the "
+                                            "interrupted scan's parameters"):
+            st.session_state["_resume_requested"] = True
+            st.rerun()
+        if _rb4.button("🗑 Discard", use_container_width=True, key="resume_discard"):
             st.session_state.pop("_restored_hits", None)
             st.session_state.pop("_restored_logs", None)
             st.session_state.pop("_restored_meta", None)
             st.session_state.pop("show_restored", None)
+            st.session_state.pop("_resume_state", None)
             _clear_state()
             st.rerun()
 
@@ -2887,16 +1704,31 @@ with tab2:
     scan_universe = list(dict.fromkeys(scan_universe))[:int(max_stocks)]
     min_price = st.session_state.get("min_price", 5)
 
-    if run_scan:
+    # ── Resume: rerun the interrupted scan's universe + parameters ────────────
+    _resume = None
+    if st.session_state.pop("_resume_requested", False) and not run_scan:
+        _resume = st.session_state.get("_resume_state")
+    if _resume:
+        _rh             = _resume["header"]
+        scan_universe   = _rh["universe"]
+        is_retest       = _rh["params"]["is_retest"]
+        min_price       = _rh["params"]["min_price"]
+        min_display     = _rh.get("min_display", min_display)
+    _scanning = run_scan or _resume is not None
+
+    if _scanning:
         # No API key needed for yfinance
         if not scan_universe:
             st.error("No tickers to scan.")
             st.stop()
 
-        _yf_cache.clear()  # fresh cache each scan run
+        # Bars come from the process-wide _yf_cache, shared with every other
+        # session and valid until the next market close — no per-scan clear.
 
         st.markdown('<div class="section-header">Scan in Progress</div>', unsafe_allow_html=True)
         sector_returns = fetch_sector_returns(26)  # instant if pre-fetched in Tab 1
+        if _resume and _resume.get("sector_returns"):
+            sector_returns = _resume["sector_returns"]   # same sector bonus as the first half
         if sector_returns:
             cols = st.columns(6)
             for i, (etf, rel) in enumerate(sector_returns.items()):
@@ -2922,125 +1754,134 @@ with tab2:
         skipped = 0
         total   = len(scan_universe)
         scan_ts = datetime.now().strftime("%Y-%m-%d %H:%M")
+        _start  = 0
+        if _resume:
+            # Everything up to universe[scanned] is already journaled — hits
+            # and non-hits alike — so pick up from the first missing ticker
+            hits    = list(_resume["hits"])
+            logs    = list(_resume["logs"]) + [f"▶ Resumed at {_resume['scanned']}/{total}"]
+            skipped = _resume["skipped"]
+            scan_ts = _resume["scan_ts"] or scan_ts
+            _start  = _resume["scanned"]
         if "watchlist" not in st.session_state:
             st.session_state["watchlist"] = {}
         # Clear any previous restored state since we're starting fresh
         st.session_state.pop("_restored_hits", None)
         st.session_state.pop("_restored_meta", None)
         st.session_state.pop("show_restored", None)
+        st.session_state.pop("_resume_state", None)
 
         # ── P04: Live hits panel ───────────────────────────────────────────
         live_hits_ph = st.empty()
         _sector_hit_counts = {}  # sector name → hit count for heat strip
+        for _h in hits:
+            _sn = _h.get("sector") or "Unknown"
+            _sector_hit_counts[_sn] = _sector_hit_counts.get(_sn, 0) + 1
+
+        # ── Streaming scan — pipeline stages score, sinks render + persist ──────
+        yf_rate_limiter.set_rate(yf_req_rate)
+        _scan_params = {
+            "is_retest": is_retest, "min_price": min_price,
+            "w_dist_200sma_lo": w_dist_200sma_lo, "w_dist_200sma_hi": w_dist_200sma_hi,
+            "w_prior_run": w_prior_run, "w_correction": w_correction, "w_vol_mult": w_vol_mult,
+            "bb_base_years": bb_base_years, "bb_range_pct": bb_range_pct, "bb_atr_max": bb_atr_max,
+            "bb_vol_mult": bb_vol_mult, "bb_sma_lo": bb_sma_lo, "bb_sma_hi": bb_sma_hi,
+            "d_atr_pct_min": d_atr_pct_min, "d_atr_pct_max": d_atr_pct_max,
+            "d_above_50sma": d_above_50sma,
+        }
+        if _resume:
+            _scan_params = dict(_resume["header"]["params"])
+        _journal  = ScanJournal(JOURNAL_PATH)
+        if _resume:
+            _journal.resume(_resume)
+        else:
+            _journal.start(universe=scan_universe, total=total, sector_returns=sector_returns,
+                           watchlist=st.session_state.get("watchlist", {}),
+                           mode="retest" if is_retest else "base", scan_ts=scan_ts,
+                           params=_scan_params, min_display=min_display)
+        _gist_writer = gist_checkpoint_writer()
+
+        class _ScannerTabSink(Sink):
+            """The Scanner tab as one more pipeline sink — progress, log, metric cards, live hits."""
+            name = "ui"
+
+            def __init__(self, hits, logs, skipped, sector_counts):
+                super().__init__()
+                self.hits, self.logs, self.skipped = hits, logs, skipped
+                self.sector_counts = sector_counts
+
+            def write(self, rec):
+                i, ticker = rec["i"], rec["ticker"]
+                pbar.progress((i + 1) / total)
+                status_txt.markdown(
+                    f'<span style="font-family:Space Mono;font-size:0.75rem;color:#64748b;">Scanning {ticker} ({i+1}/{total})</span>',
+                    unsafe_allow_html=True)
+                kind, log = outcome(rec, min_display, min_price)
+                self.logs.append(log)
+                if kind == "skip":
+                    # No data, or below the price floor backstop
+                    self.skipped += 1
+                    log_ph.markdown(f'<div class="log-box">{"<br>".join(self.logs[-20:])}</div>', unsafe_allow_html=True)
+                    return
 
-        for i, ticker in enumerate(scan_universe):
-            pbar.progress((i + 1) / total)
-            status_txt.markdown(
-                f'<span style="font-family:Space Mono;font-size:0.75rem;color:#64748b;">Scanning {ticker} ({i+1}/{total})</span>',
-                unsafe_allow_html=True)
-
-            df_w = get_yf_data(ticker, period="max", freq="1wk")
-            if df_w is None or len(df_w) < 100:
-                skipped += 1
-                logs.append(f"⚠ {ticker} — no data")
-                log_ph.markdown(f'<div class="log-box">{"<br>".join(logs[-20:])}</div>', unsafe_allow_html=True)
-                continue
-
-            # ── Price filter backstop ─────────────────────────────────────────
-            _cur_price = df_w["close"].iloc[-1]
-            if _cur_price < min_price:
-                skipped += 1
-                logs.append(f"✗ {ticker} — price ${_cur_price:.2f} below ${min_price} floor")
-                log_ph.markdown(f'<div class="log-box">{"<br>".join(logs[-20:])}</div>', unsafe_allow_html=True)
-                continue
-
-            if is_retest:
-                w_pass, wr = check_weekly(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult, ticker=ticker)
-            else:
-                w_pass, wr = check_base_breakout(df_w, bb_base_years, bb_range_pct, bb_atr_max, bb_vol_mult, bb_sma_lo, bb_sma_hi)
-
-            df_d = get_yf_data(ticker, period="1y", freq="1d")
-            d_pass, dr = (False, {}) if (df_d is None or len(df_d) < 55) else check_daily(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma)
-
-            # Stash daily ATR-mult into wr so card renderer can display it
-            if not is_retest and dr:
-                wr["atr_mult_from_50d"] = dr.get("atr_mult_from_50d")
-            sc = score_setup(wr, dr) if is_retest else score_base_breakout(wr, dr)
-
-            # ── Recovery structure detection (Retest Mode only) ───────────────
-            rr = check_recovery_structure(df_w) if is_retest else {
-                "structure": "none", "structure_pts": 0, "structure_label": "N/A",
-                "ema10w": None, "ema20w": None, "sma50w": None,
-                "local_high_pct": None, "atr_contracting": False
-            }
-            sc = max(0, sc + rr["structure_pts"])
-
-            # ── Sector momentum bonus ─────────────────────────────────────────
-            sector_pts, sector_name, sector_rel = score_sector(ticker, sector_returns)
-            sc = max(0, sc + sector_pts)
-
-            # ── No hard gate — score everything, display above min_display ──
-            base_sc  = score_setup(wr, dr) if is_retest else score_base_breakout(wr, dr)
-            bonus_sc = sc - base_sc
-            norm_sc  = round(min(100, sc / 1.25))
-            if sc >= min_display:
-                hits.append({"ticker": ticker, "score": sc, "norm_score": norm_sc,
-                             "base_score": base_sc, "bonus_score": bonus_sc,
-                             "wr": wr, "dr": dr,
-                             "w_pass": w_pass, "d_pass": d_pass,
-                             "sector": sector_name, "sector_rel": sector_rel,
-                             "sector_pts": sector_pts, "rr": rr})
-                flag = "✅" if (w_pass and d_pass) else ("◑" if w_pass else "○")
-                logs.append(f"{flag} {ticker} — {norm_sc}/100 (raw {sc})")
-                # ── Track sector hits for heat strip ─────────────────────
-                _sn = sector_name or "Unknown"
-                _sector_hit_counts[_sn] = _sector_hit_counts.get(_sn, 0) + 1
-                # ── P04: Update live hits panel ───────────────────────────
-                _live_sorted = sorted(hits, key=lambda x: x["norm_score"], reverse=True)[:6]
-                _live_html = '<div style="margin:0.5rem 0"><div class="live-hits-header"><span class="live-dot"></span>Live hits — ' + str(len(hits)) + ' found</div>'
-                for _lh in _live_sorted:
-                    _lcat = "full" if _lh["score"] >= 80 else ("strong" if _lh["score"] >= 60 else "watch")
-                    _lcolor = "#10b981" if _lcat == "full" else ("#f59e0b" if _lcat == "strong" else "#818cf8")
-                    _lsig = signal_summary(_lh["wr"], _lh["dr"], _lh.get("rr",{}), is_retest)
-                    _live_html += (
-                        f'<div style="display:flex;align-items:center;gap:0.75rem;'
-                        f'background:var(--bg-card);border:1px solid var(--border);'
-                        f'border-left:3px solid {_lcolor};border-radius:10px;'
-                        f'padding:0.45rem 0.8rem;margin-bottom:0.3rem;'
-                        f'animation:cardSlideIn 0.25s ease forwards">'
-                        f'<span style="font-family:DM Mono,monospace;font-size:0.62rem;color:{_lcolor};font-weight:800;min-width:40px">{_lh["norm_score"]}</span>'
-                        f'<span style="font-family:Bricolage Grotesque,sans-serif;font-weight:700;font-size:0.9rem">{_lh["ticker"]}</span>'
-                        f'<span style="font-family:DM Mono,monospace;font-size:0.58rem;color:var(--text-muted);flex:1">{_lsig}</span>'
-                        f'</div>'
-                    )
-                _live_html += '</div>'
-                live_hits_ph.markdown(_live_html, unsafe_allow_html=True)
-                # ── Incremental save after every hit ─────────────────────
-                _save_state(hits, logs, i + 1, skipped, total,
-                            scan_universe, sector_returns,
-                            st.session_state.get("watchlist", {}),
-                            "retest" if is_retest else "base",
-                            scan_ts)
-                # ── Gist checkpoint every 5 hits — survives container restart ──
-                if len(hits) % 5 == 0:
-                    gist_checkpoint_hits(hits, scan_ts,
-                                        "retest" if is_retest else "base")
-            else:
-                logs.append(f"✗ {ticker} — {norm_sc}/100 (raw {sc})")
-
-            log_ph.markdown(f'<div class="log-box">{"<br>".join(logs[-20:])}</div>', unsafe_allow_html=True)
-            met_scanned.markdown(f'<div class="metric-card"><div class="label">Scanned</div><div class="value">{i+1}</div></div>', unsafe_allow_html=True)
-            met_hits.markdown(f'<div class="metric-card"><div class="label">Hits</div><div class="value" style="color:#22c55e">{len(hits)}</div></div>', unsafe_allow_html=True)
-            met_skipped.markdown(f'<div class="metric-card"><div class="label">Skipped</div><div class="value" style="color:#ef4444">{skipped}</div></div>', unsafe_allow_html=True)
+                # ── No hard gate — score everything, display above min_display ──
+                if kind == "hit":
+                    _hit = rec["hit"]
+                    self.hits.append(_hit)
+                    # ── Track sector hits for heat strip ─────────────────────
+                    _sn = _hit["sector"] or "Unknown"
+                    self.sector_counts[_sn] = self.sector_counts.get(_sn, 0) + 1
+                    # ── P04: Update live hits panel ───────────────────────────
+                    _live_sorted = sorted(self.hits, key=lambda x: x["norm_score"], reverse=True)[:6]
+                    _live_html = '<div style="margin:0.5rem 0"><div class="live-hits-header"><span class="live-dot"></span>Live hits — ' + str(len(self.hits)) + ' found</div>'
+                    for _lh in _live_sorted:
+                        _lcat = "full" if _lh["score"] >= 80 else ("strong" if _lh["score"] >= 60 else "watch")
+                        _lcolor = "#10b981" if _lcat == "full" else ("#f59e0b" if _lcat == "strong" else "#818cf8")
+                        _lsig = signal_summary(_lh["wr"], _lh["dr"], _lh.get("rr",{}), is_retest)
+                        _live_html += (
+                            f'<div style="display:flex;align-items:center;gap:0.75rem;'
+                            f'background:var(--bg-card);border:1px solid var(--border);'
+                            f'border-left:3px solid {_lcolor};border-radius:10px;'
+                            f'padding:0.45rem 0.8rem;margin-bottom:0.3rem;'
+                            f'animation:cardSlideIn 0.25s ease forwards">'
+                            f'<span style="font-family:DM Mono,monospace;font-size:0.62rem;color:{_lcolor};font-weight:800;min-width:40px">{_lh["norm_score"]}</span>'
+                            f'<span style="font-family:Bricolage Grotesque,sans-serif;font-weight:700;font-size:0.9rem">{_lh["ticker"]}</span>'
+                            f'<span style="font-family:DM Mono,monospace;font-size:0.58rem;color:var(--text-muted);flex:1">{_lsig}</span>'
+                            f'</div>'
+                        )
+                    _live_html += '</div>'
+                    live_hits_ph.markdown(_live_html, unsafe_allow_html=True)
+
+                log_ph.markdown(f'<div class="log-box">{"<br>".join(self.logs[-20:])}</div>', unsafe_allow_html=True)
+                met_scanned.markdown(f'<div class="metric-card"><div class="label">Scanned</div><div class="value">{i+1}</div></div>', unsafe_allow_html=True)
+                met_hits.markdown(f'<div class="metric-card"><div class="label">Hits</div><div class="value" style="color:#22c55e">{len(self.hits)}</div></div>', unsafe_allow_html=True)
+                met_skipped.markdown(f'<div class="metric-card"><div class="label">Skipped</div><div class="value" style="color:#ef4444">{self.skipped}</div></div>', unsafe_allow_html=True)
+
+        # Sinks run in order on every finished ticker: the tab, then the
+        # journal (one appended line each, completed when the scan finishes),
+        # then the Gist checkpoint — every 5 hits plus a final one, queued to
+        # a background uploader so the loop never blocks on api.github.com
+        _ui_sink = _ScannerTabSink(hits, logs, skipped, _sector_hit_counts)
+        _sinks   = [_ui_sink, JournalSink(_journal, min_display, min_price, skipped=skipped,
+                                          watchlist=st.session_state.get("watchlist", {}))]
+        if _gist_writer:
+            _sinks.append(GistSink(_gist_writer, scan_ts, "retest" if is_retest else "base",
+                                   min_display, hits=hits))
+        # Weekly gates per ticker, not per 100-ticker batch, so the progress
+        # bar, log and journal advance with every ticker
+        _pipeline = build_pipeline(_scan_params, sector_returns, workers=scan_workers,
+                                   processes=scan_processes, weekly="serial")
+        _pipeline.drain(scan_universe, _sinks, start=_start)
+        hits, logs, skipped = _ui_sink.hits, _ui_sink.logs, _ui_sink.skipped
 
         pbar.progress(1.0)
         status_txt.markdown('<span style="font-family:Space Mono;font-size:0.75rem;color:#22c55e;">✓ Scan complete</span>', unsafe_allow_html=True)
-        # Mark complete in persisted state
-        _save_complete(hits, logs, total, skipped, total, scan_universe,
-                       sector_returns, st.session_state.get("watchlist", {}),
-                       "retest" if is_retest else "base", scan_ts)
-        # Final Gist checkpoint — catches any hits since last 5-hit checkpoint
-        gist_checkpoint_hits(hits, scan_ts, "retest" if is_retest else "base")
+        _ci = _yf_cache.info()
+        st.caption(f"Bar cache: {_ci['hits']:,} hits · {_ci['misses']:,} misses · "
+                   f"{_ci['waits']:,} shared fetches · {_ci['entries']:,} series ({_ci['mb']} MB)")
+        st.caption("Stage time: " + " · ".join(f"{_n} {_s:.1f}s" for _n, _, _s in _pipeline.timings()))
+        # Repack the universe's bars so a cold restart can score straight away
+        rebuild_after_scan(scan_universe)
 
         # Persist hits to session state so star-button reruns don't lose results
         hits_sorted_final = sorted(hits, key=lambda x: x["norm_score"], reverse=True)
@@ -3066,7 +1907,9 @@ with tab2:
             )
             st.markdown(_summary_html, unsafe_allow_html=True)
             # Sector heat strip with hit counts
-            st.markdown(sector_heat_strip(sector_returns, _sector_hit_counts), unsafe_allow_html=True)
+            st.markdown(sector_heat_strip(sector_returns, _sector_hit_counts,
+                                          sector_return_service.table((4, 13, 52))),
+                        unsafe_allow_html=True)
         st.markdown(f'<div class="section-header">Results — {mode_label}</div>', unsafe_allow_html=True)
 
         if not hits:
@@ -3447,7 +2290,7 @@ with tab2:
 
     # ── Rerun path: star was clicked, render persisted results ─────────────
     # NOTE: this is now INDEPENDENT of watchlist — watchlist renders below unconditionally.
-    if not run_scan and st.session_state.get("last_hits"):
+    if not _scanning and st.session_state.get("last_hits"):
         hits_sorted   = st.session_state["last_hits"]
         _mode_was     = st.session_state.get("last_hits_mode", "retest")
         _mode_label   = "🔄 Retest Mode" if _mode_was == "retest" else "📦 Base Breakout Mode"
@@ -3668,7 +2511,7 @@ with tab2:
         render_category("Strong  60–79",  "🟡", "cat-strong",  strong_hits)
         render_category("Watchlist  <60", "🔵", "cat-watch",   watch_hits)
 
-    elif not run_scan:
+    elif not _scanning:
         # Idle state — no scan running, no results, no watchlist
         if scan_universe:
             st.markdown(f"""
@@ -3911,10 +2754,9 @@ with tab3:
                     continue
 
                 w_pass, d_pass, sc, wr, dr = result
-                # NOTE: sector bonus intentionally excluded from backtest scores.
-                # sector_returns always reflects today, not the validation date,
-                # so adding it would give random/misleading bonus points.
-                # The base score (100pts max) is used for validation comparisons.
+                # The base score (100pts max) is used for validation comparisons;
+                # the live-equivalent score (structure + sector bonus as of the
+                # setup date, from sector_history) is shown alongside it.
                 is_trap_setup = s.get("is_trap", False)
                 if is_trap_setup:
                     full_pass = sc <= 55   # traps should score LOW — pass if scanner correctly rejects them
@@ -3952,7 +2794,7 @@ with tab3:
                         </div>
                         <div style="display:flex;gap:1rem;align-items:center">
                             <span style="font-family:Space Mono,monospace;font-size:0.75rem;color:{status_color};font-weight:700">{status_icon}</span>
-                            <span style="font-family:Space Mono,monospace;font-size:0.72rem;color:#f59e0b">{sc}/100 <span style="color:#64748b;font-size:0.62rem">(base only · no sector/structure bonus)</span>
+                            <span style="font-family:Space Mono,monospace;font-size:0.72rem;color:#f59e0b">{sc}/100 <span style="color:#64748b;font-size:0.62rem">(base) · live {wr.get('live_score', sc)}/125 · sector {wr.get('sector_pts', 0):+d} as of date</span>
                                 <span style="color:#64748b;font-size:0.62rem">expected ~{s['expected_score']} · delta {delta_str}</span>
                             </span>
                             <a class="tv-btn" href="{tv_link}" target="_blank">📈 Chart ↗</a>
@@ -3984,6 +2826,79 @@ with tab3:
             </div>
             """, unsafe_allow_html=True)
 
+        # ── Parameter sweep: validator over many threshold combinations ─────
+        st.markdown('<div class="section-header">Parameter Sweep — Find Robust Thresholds</div>',
+                    unsafe_allow_html=True)
+        st.caption("Runs the validator above over a grid (or random sample) of threshold values. "
+                   "Setup data is loaded once; combinations are scored in parallel. "
+                   "Other sidebar values stay fixed. Robust = caught + traps rejected.")
+        sw_mode = st.radio("Sweep thresholds for", ["Retest setups", "Base-breakout setups"],
+                           horizontal=True, key="sw_mode")
+        sw_key_mode = "retest" if sw_mode == "Retest setups" else "base_breakout"
+
+        def _sweep_default(v, step, floor=0):
+            vals = sorted({max(floor, round(v - step, 2)), v, round(v + step, 2)})
+            return ", ".join(f"{x:g}" for x in vals)
+
+        _sw_current = {
+            "w_dist_200sma_lo": (w_dist_200sma_lo, 10), "w_dist_200sma_hi": (w_dist_200sma_hi, 10),
+            "w_prior_run": (w_prior_run, 50), "w_correction": (w_correction, 5),
+            "w_vol_mult": (w_vol_mult, 0.2),
+            "bb_base_years": (bb_base_years, 1), "bb_range_pct": (bb_range_pct, 10),
+            "bb_atr_max": (bb_atr_max, 1.0), "bb_vol_mult": (bb_vol_mult, 0.25),
+            "bb_sma_lo": (bb_sma_lo, 5), "bb_sma_hi": (bb_sma_hi, 10),
+        }
+        sw_spec = {}
+        sw_cols = st.columns(3)
+        for j, k in enumerate(SWEEP_KEYS[sw_key_mode]):
+            v, step = _sw_current[k]
+            raw = sw_cols[j % 3].text_input(k, value=_sweep_default(v, step, floor=1 if k == "bb_base_years" else 0),
+                                            key=f"sw_{k}")
+            try:
+                sw_spec[k] = [type(v)(float(x)) for x in re.split(r"[\s,;]+", raw.strip()) if x]
+            except ValueError:
+                sw_spec[k] = [v]
+            sw_spec[k] = sw_spec[k] or [v]
+
+        sw_c1, sw_c2 = st.columns([1, 1])
+        with sw_c1:
+            sw_kind = st.radio("Combinations", ["Full grid", "Random sample"], horizontal=True, key="sw_kind")
+        with sw_c2:
+            sw_n = st.number_input("Sample size", min_value=10, max_value=20000, value=500, step=50,
+                                   key="sw_n", disabled=(sw_kind == "Full grid"))
+        combos = param_grid(sw_spec) if sw_kind == "Full grid" else param_sample(sw_spec, int(sw_n))
+        st.caption(f"{len(combos):,} combinations")
+
+        if st.button("▶ Run Sweep", key="sw_run"):
+            sw_base = {
+                "w_dist_200sma_lo": w_dist_200sma_lo, "w_dist_200sma_hi": w_dist_200sma_hi,
+                "w_prior_run": w_prior_run, "w_correction": w_correction, "w_vol_mult": w_vol_mult,
+                "bb_base_years": bb_base_years, "bb_range_pct": bb_range_pct, "bb_atr_max": bb_atr_max,
+                "bb_vol_mult": bb_vol_mult, "bb_sma_lo": bb_sma_lo, "bb_sma_hi": bb_sma_hi,
+                "d_atr_pct_min": d_atr_pct_min, "d_atr_pct_max": d_atr_pct_max,
+                "d_above_50sma": d_above_50sma,
+            }
+            sw_pbar = st.progress(0)
+            with st.spinner("Loading setup history…"):
+                sw_cases = load_cases(mode=sw_key_mode)
+            sw_df = run_sweep(combos, sw_base, cases=sw_cases,
+                              progress=lambda done, total: sw_pbar.progress(done / max(total, 1)))
+            sw_pbar.empty()
+            if sw_df.empty:
+                st.warning("No combinations to evaluate.")
+            else:
+                best = sw_df.iloc[0]
+                n_cases = len(sw_cases)
+                st.markdown(f'''
+                <div style="background:#111827;border:1px solid #1e293b;border-radius:10px;padding:1rem 1.5rem;
+                            margin:0.5rem 0;font-family:Space Mono,monospace;font-size:0.78rem;color:#94a3b8">
+                    Best: <b style="color:#f59e0b">{int(best["robust"])}/{n_cases}</b> robust ·
+                    {int(best["caught"])} caught · {int(best["missed"])} missed ·
+                    {int(best["trap_rejected"])} traps rejected · {int(best["false_positive"])} false positives
+                    <br>{" · ".join(f"{k} = {best[k]:g}" for k in sw_spec)}
+                </div>''', unsafe_allow_html=True)
+                st.dataframe(sw_df.head(25), use_container_width=True)
+
     # ── SUB-TAB B: Date Picker ────────────────────────────────────────────────
     with bt_tab_b:
         st.markdown('<div class="section-header">Scan Any Past Date</div>', unsafe_allow_html=True)
@@ -4097,6 +3012,7 @@ with tab3:
                             </div>
                             <div style="display:flex;gap:1rem;align-items:center">
                                 <span style="font-family:Space Mono,monospace;font-size:0.72rem;color:#f59e0b;font-weight:700">{h['score']}/100</span>
+                                <span style="font-family:Space Mono,monospace;font-size:0.62rem;color:#64748b">live {wr.get('live_score', h['score'])}/125</span>
                                 <a class="tv-btn" href="{tv_link}" target="_blank">📈 Chart ↗</a>
                             </div>
                         </div>
@@ -4121,6 +3037,45 @@ with tab3:
                 </div>
                 """, unsafe_allow_html=True)
 
+        # ── Signal history: every past weekly firing in one pass per ticker ──
+        st.markdown('<div class="section-header">Signal History — Every Past Weekly Firing</div>',
+                    unsafe_allow_html=True)
+        st.caption("Walks the weekly check across each ticker's full history (10-year lookback "
+                   "per week, same as the date scan). Weekly criteria only — run a date scan "
+                   "on a firing week for the daily check and score.")
+        wf_since = st.date_input("Firings since", value=datetime(2015, 1, 1).date(),
+                                 min_value=datetime(2000, 1, 1).date(),
+                                 max_value=datetime.now().date(), key="wf_since")
+        wf_run = st.button("▶ Find All Past Firings", key="wf_run")
+
+        if wf_run:
+            raw_tickers = re.split(r"[\s,;]+", bt_tickers_input.strip())
+            wf_tickers  = [t.upper() for t in raw_tickers if re.match(r"^[A-Z]{1,5}$", t.upper())]
+            wf_params   = {
+                "is_retest": is_retest,
+                "w_dist_200sma_lo": w_dist_200sma_lo, "w_dist_200sma_hi": w_dist_200sma_hi,
+                "w_prior_run": w_prior_run, "w_correction": w_correction, "w_vol_mult": w_vol_mult,
+                "bb_base_years": bb_base_years, "bb_range_pct": bb_range_pct, "bb_atr_max": bb_atr_max,
+                "bb_vol_mult": bb_vol_mult, "bb_sma_lo": bb_sma_lo, "bb_sma_hi": bb_sma_hi,
+            }
+            wf_pbar = st.progress(0)
+            fired = walk_forward_scan(
+                wf_tickers, wf_params, since=wf_since, new_only=True,
+                progress=lambda i, t: wf_pbar.progress((i + 1) / max(len(wf_tickers), 1)))
+            wf_pbar.empty()
+            if fired.empty:
+                st.warning("No weekly firings found for these tickers since "
+                           f"{wf_since}. Try more tickers or relax criteria.")
+            else:
+                show = ["ticker", "date", "close", "sma200", "dist_200sma_pct", "vol_ratio"]
+                show += (["prior_run_pct", "correction_from_ath_pct", "sma200_slope_grade"]
+                         if is_retest else ["base_range_pct", "base_atr_pct", "base_duration_yrs"])
+                st.markdown(f'<div style="font-family:Space Mono,monospace;font-size:0.72rem;color:#94a3b8">'
+                            f'{len(fired)} new firings across {fired["ticker"].nunique()} tickers</div>',
+                            unsafe_allow_html=True)
+                st.dataframe(fired[show].round(2).sort_values("date", ascending=False)
+                             .reset_index(drop=True), use_container_width=True)
+
 
     # ── SUB-TAB C: Forward Return Validator ──────────────────────────────────
     with bt_tab_c:
@@ -4201,10 +3156,11 @@ with tab3:
                 if sc < fv_min_score:
                     continue
 
-                # Fetch forward returns for signals and a sample of non-signals
-                r4w_p,  r4w  = get_forward_return(ticker, as_of, 4)
-                r8w_p,  r8w  = get_forward_return(ticker, as_of, 8)
-                r12w_p, r12w = get_forward_return(ticker, as_of, 12)
+                # Forward returns for signals and a sample of non-signals — all horizons, one pass
+                fwd = forward_returns(ticker, as_of, (4, 8, 12))
+                r4w_p,  r4w  = fwd[4]["price"],  fwd[4]["ret"]
+                r8w_p,  r8w  = fwd[8]["price"],  fwd[8]["ret"]
+                r12w_p, r12w = fwd[12]["price"], fwd[12]["ret"]
 
                 row = {
                     "ticker":    ticker,
@@ -4220,6 +3176,8 @@ with tab3:
                     "price_4w":  r4w_p,
                     "price_8w":  r8w_p,
                     "price_12w": r12w_p,
+                    "runup_12w": fwd[12]["max_runup"],
+                    "dd_12w":    fwd[12]["max_drawdown"],
                 }
                 if w_pass and d_pass:
                     signals.append(row)
@@ -4350,6 +3308,8 @@ with tab3:
                         "Price 4W":   row["price_4w"],
                         "Price 8W":   row["price_8w"],
                         "Price 12W":  row["price_12w"],
+                        "Max Run-up 12W %": row["runup_12w"],
+                        "Max DD 12W %":     row["dd_12w"],
                     })
                 df_fv = pd.DataFrame(export_rows)
                 st.markdown('<div class="section-header">Export</div>', unsafe_allow_html=True)
@@ -0,0 +1,511 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import fresh_until
+from market_data import SECTOR_ETF_MAP, SECTOR_RETRY_S, BarCache, fetch_bars
+from scan_engine import (
+    check_weekly, check_daily, check_base_breakout, check_recovery_structure, score_setup,
+    score_base_breakout, score_sector,
+)
+
+# ── Backtest Helpers ─────────────────────────────────────────────────────────
+# Known setups + as-of helpers behind the Backtest tab. Streamlit-free so the
+# benchmark harness and offline tooling can import KNOWN_SETUPS directly.
+
+# Known historic setups for validation
+KNOWN_SETUPS = [
+    {
+        "ticker": "TPL",
+        "date": "2026-02-03",
+        "label": "Texas Pacific Land — Feb 2026",
+        "desc": "Retested rising 200W SMA at ~$335 after 70% correction from $1,200 ATH. "
+                "Volume surge 3.9× average. Ran from $270 to $589 in 6 weeks.",
+        "expected_score": 90,
+    },
+    {
+        "ticker": "NVDA",
+        "date": "2023-01-09",
+        "label": "NVIDIA — Jan 2023",
+        "desc": "Retested 200W SMA after ~65% correction from $346 ATH during 2022 bear. "
+                "Setup preceded massive AI-driven run to $974.",
+        "expected_score": 75,
+    },
+    {
+        "ticker": "META",
+        "date": "2022-11-07",
+        "label": "Meta Platforms — Nov 2022",
+        "desc": "Down 77% from ATH, retesting long-term support. Massive prior run 2012–2021. "
+                "Recovered from $88 low to over $500.",
+        "expected_score": 75,
+    },
+    {
+        "ticker": "TSLA",
+        "date": "2023-01-09",
+        "label": "Tesla — Jan 2023",
+        "desc": "80% correction from $414 ATH to ~$101 low, testing major long-term support. "
+                "Prior run of 1,500%+ from 2019 base.",
+        "expected_score": 70,
+    },
+    {
+        "ticker": "NVDA",
+        "date": "2024-01-08",
+        "label": "NVIDIA — Jan 2024 (ideal entry)",
+        "desc": "Post-consolidation breakout after the Jan 2023 bottom. 200W SMA now "
+                "rising strongly. MAs stacking in bull order. First clean weekly close "
+                "above all key MAs with expanding volume — the textbook re-entry.",
+        "expected_score": 85,
+    },
+    {
+        "ticker": "AMD",
+        "date": "2022-10-17",
+        "label": "AMD — Oct 2022 (200W SMA retest)",
+        "desc": "~70% correction from $164 ATH. 200W SMA beginning to flatten after "
+                "steep decline. Massive prior run 2018–2021. Similar setup to NVDA Jan 2023 "
+                "— AI/data centre tailwind drove subsequent 300%+ run.",
+        "expected_score": 75,
+    },
+    {
+        "ticker": "COIN",
+        "date": "2023-01-09",
+        "label": "Coinbase — Jan 2023 (crypto cycle bottom)",
+        "desc": "~90% correction from $430 ATH during crypto winter. 200W SMA beginning "
+                "to flatten. Accumulated at lows before BTC ETF approval catalyst. "
+                "Ran from ~$30 to $280+ in 2023-2024.",
+        "expected_score": 70,
+    },
+    {
+        "ticker": "PYPL",
+        "date": "2023-01-09",
+        "label": "PayPal — Jan 2023 ⚠ TRAP",
+        "desc": "NEGATIVE EXAMPLE: 200W SMA still steeply declining at entry. No base "
+                "formed, no accumulation volume, no macro catalyst. Price drifted sideways "
+                "for 2 years. Kept as a calibration trap — scanner should score this LOW.",
+        "expected_score": 45,
+        "is_trap": True,
+    },
+    {
+        "ticker": "ENPH",
+        "date": "2023-10-30",
+        "label": "Enphase Energy — Oct 2023 ⚠ TRAP",
+        "desc": "NEGATIVE EXAMPLE: Still in freefall at entry date. 200W SMA declining "
+                "steeply, never retested, correction ongoing to $47 by Feb 2026. "
+                "Kept as calibration — scanner should score this LOW.",
+        "expected_score": 40,
+        "is_trap": True,
+    },
+    {
+        "ticker": "LITE",
+        "date": "2025-07-07",
+        "label": "Lumentum Holdings — Jul 2025",
+        "desc": "91% correction from $391 ATH down to $35 low. Price sitting ~20-25% "
+                "below rising 200W SMA (~$67). Prior run 1,460%+. Volume surge visible "
+                "on weekly as institutions accumulated. Ran from $51 to $391 in months.",
+        "expected_score": 70,
+    },
+    {
+        "ticker": "LITE",
+        "date": "2025-08-04",
+        "label": "Lumentum Holdings — Aug 2025 (breakout week)",
+        "desc": "Week price crossed back above 200W SMA with massive volume surge. "
+                "Classic retest-then-breakout confirmation. ATR% elevated showing "
+                "volatility expansion at the start of the move.",
+        "expected_score": 75,
+        "mode": "retest",
+    },
+    {
+        "ticker": "KGC",
+        "date": "2024-10-07",
+        "label": "Kinross Gold — Oct 2024 (base breakout)",
+        "desc": "Multi-year sideways base from 2022–2024 between $3.50–$8.00. "
+                "Gold sector tailwind from macro. Volume surge as price broke above "
+                "200W SMA (~$5.50). Ran from ~$8 to $35+ by Feb 2026.",
+        "expected_score": 70,
+        "mode": "base_breakout",
+    },
+    {
+        "ticker": "KGC",
+        "date": "2024-12-30",
+        "label": "Kinross Gold — Dec 2024 (mid breakout)",
+        "desc": "Price already above 200W SMA, base breakout confirmed. "
+                "Still early in the move — $9.78 with 200W SMA at $5.93.",
+        "expected_score": 65,
+        "mode": "base_breakout",
+    },
+    {
+        "ticker": "PLTR",
+        "date": "2024-10-28",
+        "label": "Palantir — Oct 2024 (growth base entry)",
+        "desc": "Multi-year base 2022–2024 between $6–$20. 200W SMA well below "
+                "price (~$12) — growth stock base, not a SMA retest. "
+                "MAs stacking in bull order. First ATR-zone yellow dot appears. "
+                "Broke out from base top to $125+ by Feb 2026.",
+        "expected_score": 72,
+        "mode": "base_breakout",
+    },
+    {
+        "ticker": "PLTR",
+        "date": "2024-11-04",
+        "label": "Palantir — Nov 2024 (growth base breakout)",
+        "desc": "Multi-year base from 2022–2024 between $6–$20. Full MA stack "
+                "forming (EMA10=$42.55, EMA20=$36.92, SMA50=$26.66, SMA200=$18.40). "
+                "Massive vol surge on election week (604M shares). Price broke "
+                "above 200W SMA and accelerated. ATR-mult from 50D = ideal pullback zone. "
+                "Classic growth base breakout — NOT a 200W SMA retest.",
+        "expected_score": 72,
+        "mode": "base_breakout",
+    },
+    {
+        "ticker": "BHP",
+        "date": "2025-01-13",
+        "label": "BHP Group — Jan 2025 (commodity retest)",
+        "desc": "53% correction from $85 ATH to $39.73 low. 200W SMA rising throughout — "
+                "never lost upward angle. Classic undercut and reclaim: weekly low briefly "
+                "below 200W SMA then snapped back above. Highest volume in 3 years on "
+                "breakout. ADR on NYSE — relative vol used. Prior run ~110% "
+                "(commodities threshold, not 300% tech threshold).",
+        "expected_score": 68,
+        "mode": "retest",
+    },
+    {
+        "ticker": "PLTR",
+        "date": "2024-10-30",
+        "label": "Palantir — Oct 2024 (first yellow dot)",
+        "desc": "First yellow dot fires — price extended −10× ATR below the rising 50D SMA. "
+                "This exhaustion level marked the final shakeout before the Nov surge. "
+                "Volume quiet, 50D rising, MAs stacking — textbook growth base entry.",
+        "expected_score": 65,
+        "mode": "base_breakout",
+    },
+]
+
+# ── Backtest Data Provider ───────────────────────────────────────────────────
+# Every backtest question (10y weekly / 2y daily as of a date, 4/8/12-week
+# forward closes) is a window of the same full history. BacktestData fetches
+# period="max" per ticker and frequency — through the on-disk bar store,
+# so it survives restarts and refreshes incrementally — and answers every
+# as-of truncation and forward window by slicing in memory. Re-running the
+# Known Setup Validator (LITE, PLTR, NVDA, KGC appear several times each)
+# or a forward-validation batch no longer re-downloads anything.
+# Frames live in a BarCache of their own: one fetch per key with concurrent
+# callers, held until the trading calendar says newer bars exist
+# (fresh_until), least recently used evicted past BACKTEST_CACHE_MAX_MB.
+# Failed fetches aren't cached — the next call tries again.
+BACKTEST_CACHE_MAX_MB = float(os.environ.get("SCANNER_BACKTEST_CACHE_MB", 512))
+
+
+class BacktestData:
+    def __init__(self, max_mb=BACKTEST_CACHE_MAX_MB):
+        self._frames    = BarCache(max_mb)
+        self._downloads = 0
+
+    @property
+    def stats(self):
+        return {"downloads": self._downloads, "hits": self._frames.stats["hits"]}
+
+    def _load(self, ticker, freq):
+        self._downloads += 1
+        return fetch_bars(ticker, "max", freq)
+
+    def history(self, ticker, freq="1wk"):
+        """Full history for ticker / freq, fetched once while current. None if unavailable."""
+        return self._frames.fetch((ticker, freq), lambda: self._load(ticker, freq))
+
+    def asof(self, ticker, as_of_date, lookback_years=12, freq="1wk"):
+        """Bars in [as_of - lookback_years, as_of] — what a scan on as_of_date saw."""
+        df = self.history(ticker, freq)
+        if df is None:
+            return None
+        start = pd.Timestamp(as_of_date - timedelta(days=365 * lookback_years)).normalize()
+        dates = df["date"]
+        out = df[(dates >= start) & (dates <= pd.Timestamp(as_of_date))].reset_index(drop=True)
+        return out if len(out) > 0 else None
+
+    def forward(self, ticker, as_of_date, weeks):
+        """Weekly bars from as_of_date through the forward window (+2 weeks slack)."""
+        df = self.history(ticker, "1wk")
+        if df is None:
+            return None
+        start = pd.Timestamp(as_of_date).normalize()
+        end   = start + timedelta(days=weeks * 7 + 14)
+        dates = df["date"]
+        return df[(dates >= start) & (dates < end)].reset_index(drop=True)
+
+    def clear(self):
+        self._frames.clear()
+
+
+backtest_data = BacktestData()
+
+
+def get_yf_data_asof(ticker, as_of_date, lookback_years=12, freq="1wk"):
+    """
+    Fetch historical data and truncate to simulate scanning on a past date.
+    Returns only data available up to as_of_date.
+    """
+    try:
+        return backtest_data.asof(ticker, as_of_date, lookback_years, freq)
+    except Exception:
+        return None
+
+# ── Point-in-Time Sector Returns ─────────────────────────────────────────────
+# score_sector() needs each sector ETF's return vs SPY as it stood on the scan
+# date, but the live sector returns only know today. SectorHistory builds, once
+# per lookback, the relative return at every SPY weekly bar over the full
+# history — the same period="max" BacktestData series, so the 13 fetches go
+# through the bar store. Row t is what sector_relative_returns(weeks) would
+# have returned after that bar: c[t] / c[t - weeks + 1] - 1 minus SPY's, 0 for
+# an ETF with fewer than `weeks` bars by then, NaN before it listed (left out
+# of the lookup, so score_sector gives no bonus). asof() is a binary search
+# on the dates plus one row read. Tables are rebuilt on the same calendar
+# expiry as BacktestData, so later as-of dates pick up new bars; a build
+# without SPY (or missing an ETF) is retried after SECTOR_RETRY_S, serving
+# the last good table meanwhile.
+
+class SectorHistory:
+    def __init__(self, data):
+        self.data    = data
+        self._tables = {}
+        self._lock   = threading.Lock()
+
+    def _build(self, weeks):
+        spy = _weekly_arrays("SPY", self.data)
+        if spy is None:
+            return None
+        dates = spy[0]
+
+        def _returns(d, c):
+            i   = np.searchsorted(d, dates, "right") - 1   # last bar on / before each SPY bar
+            ret = np.full(len(dates), np.nan)
+            ok  = i >= weeks - 1
+            ret[ok] = (c[i[ok]] / c[i[ok] - weeks + 1] - 1) * 100
+            return i, ret
+
+        spy_ret = np.nan_to_num(_returns(*spy)[1])   # SPY too short → 0, as live
+        values  = np.full((len(dates), len(SECTOR_ETF_MAP)), np.nan)
+        for j, etf in enumerate(SECTOR_ETF_MAP):
+            arrs = _weekly_arrays(etf, self.data)
+            if arrs is None:
+                continue
+            i, ret = _returns(*arrs)
+            values[:, j] = np.where(i < 0, np.nan, np.where(np.isnan(ret), 0.0, ret - spy_ret))
+        return dates, values
+
+    def _arrays(self, weeks):
+        with self._lock:   # one build per lookback even with concurrent callers
+            arrs, expires = self._tables.get(weeks, (None, 0))
+            now = time.time()
+            if now >= expires:
+                try:
+                    built = self._build(weeks)
+                except Exception:
+                    built = None
+                if built is None or np.isnan(built[1][-1]).any():
+                    expires = now + SECTOR_RETRY_S   # SPY or an ETF failed to load
+                else:
+                    expires = fresh_until(now)
+                arrs = built if built is not None else arrs   # keep the last good table meanwhile
+                self._tables[weeks] = (arrs, expires)
+            return arrs
+
+    def table(self, weeks=26):
+        """DataFrame indexed by SPY weekly bar date, one column per sector ETF. None if SPY is unavailable."""
+        arrs = self._arrays(weeks)
+        if arrs is None:
+            return None
+        dates, values = arrs
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates), columns=list(SECTOR_ETF_MAP))
+
+    def asof(self, as_of_date, weeks=26):
+        """{etf: relative_return_pct} as a scan on as_of_date saw it — {} before SPY's history."""
+        arrs = self._arrays(weeks)
+        if arrs is None:
+            return {}
+        dates, values = arrs
+        i = int(np.searchsorted(dates, pd.Timestamp(as_of_date).value, "right")) - 1
+        if i < 0:
+            return {}
+        return {etf: round(float(v), 1) for etf, v in zip(SECTOR_ETF_MAP, values[i]) if not np.isnan(v)}
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+sector_history = SectorHistory(backtest_data)
+
+
+def run_single_backtest(ticker, as_of_date, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction,
+                         w_vol_mult, d_atr_pct_min, d_atr_pct_max, d_above_50sma,
+                         mode="retest",
+                         bb_base_years=2, bb_range_pct=60, bb_atr_max=4.0,
+                         bb_vol_mult=2.0, bb_sma_lo=10, bb_sma_hi=40):
+    """
+    Run scanner criteria on a single ticker as of a specific past date.
+    sc is the base score the validator thresholds are tuned on; the
+    live-equivalent score — plus recovery structure (Retest Mode) and the
+    as-of sector bonus — is stashed in wr: live_score, live_norm_score,
+    structure_pts, sector, sector_rel, sector_pts.
+    """
+    df_w = get_yf_data_asof(ticker, as_of_date, lookback_years=10, freq="1wk")
+    df_d = get_yf_data_asof(ticker, as_of_date, lookback_years=2, freq="1d")
+
+    if df_w is None or len(df_w) < 52:
+        return None, None, None, "Insufficient weekly history"
+    if df_d is None or len(df_d) < 55:
+        return None, None, None, "Insufficient daily history"
+
+    d_pass, dr = check_daily(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma)
+
+    if mode == "retest":
+        w_pass, wr = check_weekly(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult)
+        sc = score_setup(wr, dr)
+    else:
+        w_pass, wr = check_base_breakout(df_w, bb_base_years, bb_range_pct,
+                                          bb_atr_max, bb_vol_mult, bb_sma_lo, bb_sma_hi)
+        sc = score_base_breakout(wr, dr)
+
+    # Live-equivalent score, built up as score_ticker does
+    rr = check_recovery_structure(df_w) if mode == "retest" else {"structure_pts": 0}
+    try:
+        sector_pts, sector_name, sector_rel = score_sector(ticker, sector_history.asof(as_of_date))
+    except Exception:
+        sector_pts, sector_name, sector_rel = 0, "Unknown", None
+    live = max(0, max(0, sc + rr["structure_pts"]) + sector_pts)
+    wr.update({"live_score": live, "live_norm_score": round(min(100, live / 1.25)),
+               "structure_pts": rr["structure_pts"], "sector": sector_name,
+               "sector_rel": sector_rel, "sector_pts": sector_pts})
+    return w_pass, d_pass, sc, wr, dr
+
+# ── Forward Return Helpers ───────────────────────────────────────────────────
+# All horizons for one entry come out of one pass over one weekly series:
+# searchsorted finds the entry bar, each horizon's window end and the bars
+# either side of its target date; a running max / min from the entry bar
+# gives run-up and drawdown for every horizon at once. Per horizon the
+# result matches the single-horizon rule get_forward_return always used —
+# entry = first weekly close on/after as_of, exit = the close nearest
+# as_of + N weeks within an N-weeks-plus-14-days window (ties → earlier
+# bar), None unless that window holds at least two bars.
+# max_runup / max_drawdown: best and worst close between entry and exit,
+# % vs entry (drawdown capped at 0, run-up floored at 0).
+
+FORWARD_HORIZONS = (4, 8, 12)
+
+_DAY_NS  = 86_400 * 10**9
+_WEEK_NS = 7 * _DAY_NS
+
+
+def _forward_block(dates, closes, as_of_ns, horizons):
+    """
+    dates: sorted int64 ns, closes: float array, as_of_ns: (m,) int64 ns.
+    Returns dict of (m, H) arrays — entry, price, ret, max_runup,
+    max_drawdown — NaN where a horizon has no usable window.
+    """
+    n      = len(dates)
+    h      = np.asarray(horizons, dtype=np.int64)
+    start  = as_of_ns - as_of_ns % _DAY_NS                  # window opens at midnight
+    i0     = np.searchsorted(dates, start, "left")          # entry bar
+    end    = start[:, None] + h * _WEEK_NS + 14 * _DAY_NS
+    target = as_of_ns[:, None] + h * _WEEK_NS
+    j      = np.searchsorted(dates, end, "left")            # window = [i0, j)
+    k      = np.searchsorted(dates, target, "left")
+    valid  = (j - i0[:, None]) >= 2
+    last   = max(n - 1, 0)
+    lo     = np.clip(np.maximum(k - 1, i0[:, None]), 0, last)
+    hi     = np.clip(np.minimum(k, j - 1), 0, last)
+    pick   = np.where(np.abs(dates[hi] - target) < np.abs(dates[lo] - target), hi, lo)
+
+    entry  = closes[np.minimum(i0, last)][:, None]
+    price  = closes[pick]
+    off    = np.where(valid, pick - i0[:, None], 0)
+    width  = int(off.max()) + 1 if off.size else 1
+    path   = closes[np.minimum(i0[:, None] + np.arange(width), last)]
+    run_hi = np.take_along_axis(np.maximum.accumulate(path, axis=1), off, axis=1)
+    run_lo = np.take_along_axis(np.minimum.accumulate(path, axis=1), off, axis=1)
+
+    nan = np.nan
+    return {
+        "entry":        np.where(valid, entry, nan),
+        "price":        np.where(valid, price, nan),
+        "ret":          np.where(valid, (price - entry) / entry * 100, nan),
+        "max_runup":    np.where(valid, np.maximum(run_hi / entry - 1, 0) * 100, nan),
+        "max_drawdown": np.where(valid, np.minimum(run_lo / entry - 1, 0) * 100, nan),
+    }
+
+
+def _weekly_arrays(ticker, data):
+    df = data.history(ticker, "1wk")
+    if df is None or len(df) == 0:
+        return None
+    return (df["date"].to_numpy(dtype="datetime64[ns]").astype(np.int64),
+            df["close"].to_numpy(dtype=float))
+
+
+def forward_returns(ticker, as_of_date, horizons=FORWARD_HORIZONS, data=None):
+    """
+    Forward outcome of an entry on as_of_date at every horizon (weeks).
+    Returns {weeks: {"price", "ret", "max_runup", "max_drawdown"}} — values
+    rounded to 2dp, None where unavailable.
+    """
+    empty = {"price": None, "ret": None, "max_runup": None, "max_drawdown": None}
+    try:
+        arrs = _weekly_arrays(ticker, data or backtest_data)
+        if arrs is None:
+            return {w: dict(empty) for w in horizons}
+        as_of = np.array([pd.Timestamp(as_of_date).value], dtype=np.int64)
+        blk   = _forward_block(*arrs, as_of, horizons)
+        out   = {}
+        for c, w in enumerate(horizons):
+            out[w] = {f: (None if np.isnan(blk[f][0, c]) else round(blk[f][0, c], 2))
+                      for f in empty}
+        return out
+    except Exception:
+        return {w: dict(empty) for w in horizons}
+
+
+def forward_returns_batch(pairs, horizons=FORWARD_HORIZONS, data=None):
+    """
+    Vectorised forward_returns over many (ticker, as_of_date) pairs — one
+    history lookup and one _forward_block per ticker. Returns a long
+    DataFrame (ticker, as_of, weeks, entry, price, ret, max_runup,
+    max_drawdown) in input order; NaN where unavailable, not rounded.
+    """
+    data   = data or backtest_data
+    pairs  = [(t, pd.Timestamp(d)) for t, d in pairs]
+    fields = ("entry", "price", "ret", "max_runup", "max_drawdown")
+    m, H   = len(pairs), len(horizons)
+    cols   = {f: np.full((m, H), np.nan) for f in fields}
+    by_ticker = {}
+    for row, (t, _) in enumerate(pairs):
+        by_ticker.setdefault(t, []).append(row)
+    for t, rows in by_ticker.items():
+        try:
+            arrs = _weekly_arrays(t, data)
+        except Exception:
+            arrs = None
+        if arrs is None:
+            continue
+        rows  = np.asarray(rows)
+        as_of = np.array([pairs[r][1].value for r in rows], dtype=np.int64)
+        blk   = _forward_block(*arrs, as_of, horizons)
+        for f in fields:
+            cols[f][rows] = blk[f]
+    return pd.DataFrame({
+        "ticker": np.repeat([t for t, _ in pairs], H),
+        "as_of":  np.repeat([d for _, d in pairs], H),
+        "weeks":  np.tile(np.asarray(horizons), m),
+        **{f: cols[f].ravel() for f in fields},
+    })
+
+
+def get_forward_return(ticker, as_of_date, weeks):
+    """
+    Fetch the closing price N weeks after as_of_date and compute % return.
+    Returns (fwd_price, fwd_return_pct) or (None, None) if data unavailable.
+    """
+    r = forward_returns(ticker, as_of_date, (weeks,))[weeks]
+    return r["price"], r["ret"]
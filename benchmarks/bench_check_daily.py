@@ -0,0 +1,215 @@
+"""
+Micro-benchmark: check_daily per-ticker cost, Series/.iloc loop vs arrays.
+
+    python benchmarks/bench_check_daily.py [--tickers 500] [--repeat 5]
+
+check_daily_legacy below is the pre-vectorization implementation, kept
+verbatim as the baseline. Every synthetic ticker is run through both and the
+result dicts must be identical (values and types) before timings are shown.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_engine import calc_sma, calc_ema, calc_atr_pct, check_daily  # noqa: E402
+from benchmarks.fixtures import synth_daily                             # noqa: E402
+
+
+# ── Baseline (pre-vectorization) ──────────────────────────────────────────────
+
+def check_daily_legacy(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma):
+    """
+    Daily checks + two-stage ATR-exhaustion signal.
+
+    Stage 1 — Alert (yellow dot):
+        Did price reach ≤ −10× ATR from the rising 50D SMA at any point
+        in the last 60 days? If yes, yellow_dot_fired = True.
+        This is context only — no points awarded.
+
+    Stage 2 — Response (what happened after the dot):
+        "ma_reclaim"  +8pts  — price crossed back above rising 10D EMA,
+                                volume expanding, EMA slope turning up
+        "basing"      +8pts  — ATR contracting, price coiling in <3% range,
+                                volume drying up (base forming, not yet broken)
+        "breakout"   +12pts  — price breaks above 5-day range top with vol surge
+        "watching"     0pts  — dot fired but no actionable response yet
+        None                 — dot never fired, signal irrelevant
+    """
+    res = {}
+    if len(df_d) < 55:
+        return False, {"error": "short"}
+
+    closes  = df_d["close"]
+    highs   = df_d["high"]
+    lows    = df_d["low"]
+    vols    = df_d["volume"]
+    cur     = closes.iloc[-1]
+
+    sma50_series = calc_sma(closes, 50)
+    ema10_series = calc_ema(closes, 10)
+    ema20_series = calc_ema(closes, 20)
+
+    sma50 = sma50_series.iloc[-1]
+    ema10 = ema10_series.iloc[-1]
+    ema20 = ema20_series.iloc[-1]
+    atr   = calc_atr_pct(df_d)
+    p50   = (cur - sma50) / sma50 * 100
+    ema_sp = (ema10 - ema20) / ema20 * 100
+    hi     = highs.iloc[-1]
+    lo     = lows.iloc[-1]
+    rng_pos = (cur - lo) / (hi - lo) if hi != lo else 0.5
+
+    # ── 50D SMA slope ─────────────────────────────────────────────────────────
+    sma50_slope = (sma50_series.iloc[-1] - sma50_series.iloc[-20])                   / sma50_series.iloc[-20] * 100                   if len(sma50_series) >= 20 and sma50_series.iloc[-20] > 0 else 0
+    sma50_rising = sma50_slope > 0
+
+    # ── Current ATR multiple from 50D ─────────────────────────────────────────
+    atr_abs = atr / 100 * cur  # ATR in dollar terms
+    atr_mult_from_50d = (cur - sma50) / atr_abs if atr_abs > 0 else 0
+
+    # ══════════════════════════════════════════════════════════════════════════
+    # STAGE 1 — Yellow dot: did ≤ −10× ATR fire in last 60 days?
+    # ══════════════════════════════════════════════════════════════════════════
+    yellow_dot_fired  = False
+    yellow_dot_day    = None   # how many days ago the most recent dot fired
+    lookback_d        = min(60, len(closes) - 1)
+
+    for i in range(1, lookback_d + 1):
+        day_close = closes.iloc[-i]
+        day_sma50 = sma50_series.iloc[-i] if len(sma50_series) >= i else sma50
+        day_atr_abs = atr_abs  # use current ATR as proxy (stable enough over 60D)
+        if day_atr_abs > 0:
+            day_mult = (day_close - day_sma50) / day_atr_abs
+            if day_mult <= -10.0:
+                yellow_dot_fired = True
+                yellow_dot_day   = i
+                break   # find most recent occurrence
+
+    # ══════════════════════════════════════════════════════════════════════════
+    # STAGE 2 — Response detection (only if dot fired)
+    # ══════════════════════════════════════════════════════════════════════════
+    post_dot_stage = None
+    post_dot_pts   = 0
+
+    if yellow_dot_fired and yellow_dot_day is not None:
+        # ── A) Base Breakout ─────────────────────────────────────────────────
+        # Price breaks above the 5-day range top (measured from just before
+        # today) with a volume surge — strongest signal, highest pts
+        if len(closes) >= 6:
+            range_5d_high = highs.iloc[-6:-1].max()
+            range_5d_low  = lows.iloc[-6:-1].min()
+            avg_vol_20d   = vols.rolling(20).mean().iloc[-1]
+            vol_today     = vols.iloc[-1]
+            broke_out     = cur > range_5d_high * 1.005   # 0.5% buffer
+            vol_surge     = vol_today > avg_vol_20d * 1.5
+            if broke_out and vol_surge and sma50_rising:
+                post_dot_stage = "breakout"
+                post_dot_pts   = 12
+
+        # ── B) MA Reclaim ────────────────────────────────────────────────────
+        # Price has crossed back above the rising 10D EMA after having been
+        # below it. Volume on the reclaim is above average.
+        if post_dot_stage is None and len(closes) >= 5:
+            # Was below EMA10 yesterday, above today
+            was_below = closes.iloc[-2] < ema10_series.iloc[-2]
+            now_above = cur >= ema10_series.iloc[-1]
+            ema10_slope_5d = (ema10_series.iloc[-1] - ema10_series.iloc[-5])                               / ema10_series.iloc[-5] * 100                               if len(ema10_series) >= 5 and ema10_series.iloc[-5] > 0 else 0
+            ema10_turning  = ema10_slope_5d >= 0   # flattening or rising
+            vol_expanding  = vols.iloc[-1] > vols.rolling(20).mean().iloc[-1] * 1.2
+            if was_below and now_above and ema10_turning and sma50_rising:
+                post_dot_stage = "ma_reclaim"
+                post_dot_pts   = 8
+
+        # ── C) Basing ────────────────────────────────────────────────────────
+        # ATR contracting + price coiling in narrow range + volume drying up
+        # Means institutions are absorbing supply quietly after the selloff
+        if post_dot_stage is None and len(closes) >= 15:
+            atr_5d  = calc_atr_pct(df_d.iloc[-5:])   if len(df_d) >= 5  else atr
+            atr_10d = calc_atr_pct(df_d.iloc[-15:-5]) if len(df_d) >= 15 else atr
+            range_5d_hi = highs.iloc[-5:].max()
+            range_5d_lo = lows.iloc[-5:].min()
+            range_5d_pct = (range_5d_hi - range_5d_lo) / range_5d_lo * 100                            if range_5d_lo > 0 else 999
+            avg_vol_20d  = vols.rolling(20).mean().iloc[-1]
+            avg_vol_5d   = vols.iloc[-5:].mean()
+            atr_contracting = atr_5d < atr_10d * 0.80   # 20%+ contraction
+            coiling         = range_5d_pct < 4.0         # price in <4% range
+            vol_drying      = avg_vol_5d < avg_vol_20d * 0.8
+            if atr_contracting and coiling and sma50_rising:
+                post_dot_stage = "basing"
+                post_dot_pts   = 10 if vol_drying else 8   # extra if vol also dry
+
+        # ── D) Watching ──────────────────────────────────────────────────────
+        # Dot fired but no clear response pattern yet — on radar, not actionable
+        if post_dot_stage is None:
+            post_dot_stage = "watching"
+            post_dot_pts   = 0
+
+    res.update({
+        "atr_pct":            round(atr, 2),
+        "pct_above_50sma":    round(p50, 2),
+        "ema10_vs_ema20_pct": round(ema_sp, 2),
+        "candle_range_position": round(rng_pos, 2),
+        "atr_mult_from_50d":  round(atr_mult_from_50d, 2),
+        "sma50_rising":       sma50_rising,
+        "yellow_dot_fired":   yellow_dot_fired,
+        "yellow_dot_day":     yellow_dot_day,
+        "post_dot_stage":     post_dot_stage,
+        "post_dot_pts":       post_dot_pts,
+        "pass_atr":           d_atr_pct_min <= atr <= d_atr_pct_max,
+        "pass_50sma":         -40 <= p50 <= d_above_50sma,
+        "pass_ema_cross":     ema_sp > -5,
+        "pass_candle_position": rng_pos >= 0.4,
+        # Legacy key — True if currently AT the dot level (for retest mode compat)
+        "pass_atr_mult":      yellow_dot_fired and post_dot_stage != "watching",
+    })
+    return res["pass_atr"] and res["pass_50sma"], res
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+
+ARGS = (1.5, 8.0, 25.0)   # d_atr_pct_min, d_atr_pct_max, d_above_50sma
+
+
+def _same(a, b):
+    if a.keys() != b.keys():
+        return False
+    return all(type(a[k]) is type(b[k]) and (a[k] == b[k] or (a[k] != a[k] and b[k] != b[k]))
+               for k in a)
+
+
+def _time(fn, frames, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for df in frames:
+            fn(df, *ARGS)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(frames) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers", type=int, default=500)
+    ap.add_argument("--repeat",  type=int, default=5)
+    a = ap.parse_args()
+
+    frames = [synth_daily(s) for s in range(a.tickers)]
+    dots = 0
+    for i, df in enumerate(frames):
+        old, new = check_daily_legacy(df, *ARGS), check_daily(df, *ARGS)
+        if old[0] != new[0] or not _same(old[1], new[1]):
+            sys.exit(f"mismatch on synthetic ticker {i}: {old} != {new}")
+        dots += bool(new[1].get("yellow_dot_fired"))
+
+    before = _time(check_daily_legacy, frames, a.repeat)
+    after  = _time(check_daily, frames, a.repeat)
+    print(f"{a.tickers} tickers ({dots} with a yellow dot), outputs identical")
+    print(f"  before  {before:8.1f} µs/ticker")
+    print(f"  after   {after:8.1f} µs/ticker   ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
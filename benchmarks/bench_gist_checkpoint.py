@@ -0,0 +1,211 @@
+"""
+Gist checkpoint benchmark against a local stand-in for the Gist API.
+
+    python benchmarks/bench_gist_checkpoint.py [--tickers 2000] [--hit-every 8]
+                                               [--latency 0.5] [--fail-rate 0.1]
+
+Simulates a scan that checkpoints every 5 hits three ways: the old inline
+whole-list PATCH (scan thread waits on every upload), GistCheckpointWriter
+with whole-list payloads, and GistCheckpointWriter with the default
+delta-encoded payloads. Reports time the scan loop spent blocked, PATCH
+count and bytes uploaded, then reloads the checkpoint through
+load_checkpoint() — counting the GETs it needed — and checks it
+round-trips every hit. StandInGistServer is reusable — it speaks
+just enough of the Gist API (GET / PATCH /gists/<id>, raw_url downloads,
+null-content deletes) with injectable latency and 5xx failures.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gist_checkpoint import (                                   # noqa: E402
+    GistCheckpointWriter, build_checkpoint_files, checkpoint_hit, gist_url, load_checkpoint,
+)
+
+GIST_ID = "standin"
+TOKEN   = "ghp_standin"
+
+
+# ── Stand-in Gist API ─────────────────────────────────────────────────────────
+
+class StandInGistServer:
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0):
+        self.files     = {}
+        self.latency   = latency
+        self.fail_rate = fail_rate
+        self.rng       = random.Random(seed)
+        self.lock      = threading.Lock()
+        self.stats     = {"patch": 0, "get": 0, "raw": 0, "bytes_in": 0, "bytes_out": 0,
+                          "failed": 0}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a):
+                pass
+
+            def _reply(self, code, body=b"", ctype="application/json"):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server.lock:
+                    server.stats["bytes_out"] += len(body)
+
+            def _gate(self):
+                time.sleep(server.latency)
+                with server.lock:
+                    fail = server.rng.random() < server.fail_rate
+                    if fail:
+                        server.stats["failed"] += 1
+                if fail:
+                    self._reply(502, b'{"message": "stand-in failure"}')
+                return fail
+
+            def do_GET(self):
+                if self._gate():
+                    return
+                parts = self.path.strip("/").split("/")
+                if parts[0] == "raw":
+                    with server.lock:
+                        server.stats["raw"] += 1
+                        f = server.files.get(parts[-1])
+                    if f is None:
+                        return self._reply(404)
+                    return self._reply(200, f.encode(), "text/plain")
+                with server.lock:
+                    server.stats["get"] += 1
+                    files = {
+                        name: {"filename": name, "content": content, "truncated": False,
+                               "raw_url": f"{server.url}/raw/{GIST_ID}/{name}"}
+                        for name, content in server.files.items()
+                    }
+                self._reply(200, json.dumps({"id": GIST_ID, "files": files}).encode())
+
+            def do_PATCH(self):
+                n = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(n)
+                if self._gate():
+                    return
+                with server.lock:
+                    server.stats["patch"] += 1
+                    server.stats["bytes_in"] += n
+                    for name, spec in json.loads(body).get("files", {}).items():
+                        if spec is None or spec.get("content") is None:
+                            server.files.pop(name, None)
+                        else:
+                            server.files[name] = spec["content"]
+                self._reply(200, b'{"id": "standin"}')
+
+        self.httpd  = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url    = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# ── Synthetic hits ────────────────────────────────────────────────────────────
+
+def make_hit(i):
+    """Hit dict with roughly the real wr / dr / rr field counts."""
+    wr = {f"w_{k}": round(i * 0.37 + k, 2) for k in range(22)}
+    wr.update({"current_close": 10.0 + i, "sma200_slope_grade": "rising",
+               "pass_prior_run": True, "undercut_reclaim_wks": None})
+    dr = {f"d_{k}": round(i * 0.11 + k, 2) for k in range(12)}
+    dr.update({"post_dot_stage": "watching", "yellow_dot_fired": True})
+    rr = {"structure": "ma_stack", "structure_pts": 8, "structure_label": "Partial Stack",
+          "ema10w": 12.3, "ema20w": 11.9, "sma50w": 11.1, "local_high_pct": 4.2,
+          "atr_contracting": False}
+    return {"ticker": f"T{i:05d}", "score": 60 + i % 40, "norm_score": 48 + i % 32,
+            "base_score": 55, "bonus_score": 5, "w_pass": True, "d_pass": False,
+            "sector": "Technology", "sector_rel": 4.2, "sector_pts": 0,
+            "wr": wr, "dr": dr, "rr": rr}
+
+
+# ── Runs ──────────────────────────────────────────────────────────────────────
+
+def simulate(api_url, mode, tickers, hit_every, tick_s, build):
+    """Scan loop stand-in. Returns (loop seconds, blocked seconds, final hits,
+    writer stats). build=None → the writer's default delta builder."""
+    hits     = []
+    blocked  = 0.0
+    session  = requests.Session()
+    headers  = {"Authorization": f"token {TOKEN}", "Content-Type": "application/json"}
+    writer   = GistCheckpointWriter(TOKEN, GIST_ID, api_url=api_url, backoff_base=0.05,
+                                    build=build) if mode != "sync" else None
+    t_start = time.perf_counter()
+
+    def checkpoint():
+        t0 = time.perf_counter()
+        if writer:
+            writer.submit(hits, "bench", "retest")
+        else:
+            # Pre-change behaviour: serialise everything, block on the PATCH
+            try:
+                session.patch(gist_url(GIST_ID, api_url), headers=headers, timeout=8,
+                              data=json.dumps({"files": build_checkpoint_files(
+                                  hits, "bench", "retest")}))
+            except Exception:
+                pass
+        return time.perf_counter() - t0
+
+    for i in range(tickers):
+        time.sleep(tick_s)
+        if i % hit_every == 0:
+            hits.append(make_hit(i))
+            if len(hits) % 5 == 0:
+                blocked += checkpoint()
+    blocked += checkpoint()
+    loop_s = time.perf_counter() - t_start
+    if writer:
+        writer.close(timeout=30)
+    return loop_s, blocked, hits, writer.stats if writer else None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tickers",   type=int,   default=2000)
+    ap.add_argument("--hit-every", type=int,   default=8)
+    ap.add_argument("--tick-ms",   type=float, default=1.0, help="simulated per-ticker work")
+    ap.add_argument("--latency",   type=float, default=0.5, help="stand-in response delay (s)")
+    ap.add_argument("--fail-rate", type=float, default=0.1, help="fraction of 502 responses")
+    a = ap.parse_args()
+
+    runs = (("sync", None), ("async", build_checkpoint_files), ("delta", None))
+    for mode, build in runs:
+        with StandInGistServer(a.latency, a.fail_rate) as srv:
+            loop_s, blocked, hits, wstats = simulate(
+                srv.url, mode, a.tickers, a.hit_every, a.tick_ms / 1000, build)
+            srv.fail_rate = 0.0
+            gets0 = srv.stats["get"] + srv.stats["raw"]
+            t0 = time.perf_counter()
+            cp = load_checkpoint(TOKEN, GIST_ID, api_url=srv.url)
+            load_ms = (time.perf_counter() - t0) * 1000
+            gets = srv.stats["get"] + srv.stats["raw"] - gets0
+            want = json.loads(json.dumps([checkpoint_hit(h) for h in hits]))
+            ok = "ok" if cp and cp["hits"] == want else "MISMATCH"
+            print(f"{mode:5s}  loop {loop_s:7.2f}s  blocked {blocked:7.2f}s  "
+                  f"PATCH {srv.stats['patch']:4d}  up {srv.stats['bytes_in'] / 1024:9.1f} KB  "
+                  f"502s {srv.stats['failed']:3d}  load {gets} GET / {load_ms:5.0f} ms  "
+                  f"files {len(srv.files):3d}  round-trip {ok}")
+            if wstats:
+                print(f"       writer: submitted {wstats['submitted']} · coalesced "
+                      f"{wstats['coalesced']} · sent {wstats['sent']} · retried {wstats['failed']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Frozen OHLCV fixtures for the benchmark suite.
+
+    python benchmarks/fixtures.py --record     # snapshot KNOWN_SETUPS from Yahoo
+
+Two sources, both replayed fully offline:
+  known      — the KNOWN_SETUPS tickers, recorded once into benchmarks/fixtures/
+               as parquet and sliced as-of each setup date with the same
+               windows run_single_backtest uses (10y weekly, 2y daily).
+  synthetic  — a seeded random-walk universe (default 2,000 names), rebuilt
+               bit-identically on every run. Mixed history lengths plus
+               injected drawdowns so every branch of the checks gets hit.
+"""
+import argparse
+import os
+import sys
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+
+# Weekly history lengths cycled through the synthetic universe — 5y period
+# through IPO-2000s names on period="max"
+_SYNTH_WEEKS = (260, 520, 1040, 1300, 1560)
+
+
+def _fixture_path(ticker, freq):
+    return os.path.join(FIXTURE_DIR, f"{ticker}_{freq}.parquet")
+
+
+# ── Known setups ──────────────────────────────────────────────────────────────
+
+def record_known_setups():
+    """Download weekly max + daily history for every KNOWN_SETUPS ticker."""
+    from backtest import KNOWN_SETUPS
+    from market_data import BAR_FIELDS, _download_single
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    earliest = {}
+    for s in KNOWN_SETUPS:
+        d = pd.Timestamp(s["date"])
+        earliest[s["ticker"]] = min(d, earliest.get(s["ticker"], d))
+    for ticker, first in earliest.items():
+        df_w = _download_single(ticker, "1wk", period="max")
+        df_d = _download_single(ticker, "1d", start=first - timedelta(days=365 * 2 + 30))
+        if df_w is None or df_d is None:
+            print(f"  {ticker:6s} no data — skipped")
+            continue
+        df_w[BAR_FIELDS].to_parquet(_fixture_path(ticker, "1wk"), index=False)
+        df_d[BAR_FIELDS].to_parquet(_fixture_path(ticker, "1d"), index=False)
+        print(f"  {ticker:6s} {len(df_w):5d} weekly  {len(df_d):5d} daily")
+
+
+def load_known_setups():
+    """
+    One case per KNOWN_SETUPS entry whose ticker has been recorded.
+    Returns [] when nothing is recorded yet.
+    """
+    from backtest import KNOWN_SETUPS
+
+    cases = []
+    for s in KNOWN_SETUPS:
+        path_w = _fixture_path(s["ticker"], "1wk")
+        path_d = _fixture_path(s["ticker"], "1d")
+        if not (os.path.exists(path_w) and os.path.exists(path_d)):
+            continue
+        as_of = pd.Timestamp(s["date"])
+        w = pd.read_parquet(path_w)
+        d = pd.read_parquet(path_d)
+        w = w[(w["date"] >= as_of - timedelta(days=365 * 10)) & (w["date"] <= as_of)]
+        d = d[(d["date"] >= as_of - timedelta(days=365 * 2)) & (d["date"] <= as_of)]
+        cases.append({
+            "ticker": s["ticker"],
+            "mode":   s.get("mode", "retest"),
+            "weekly": w.reset_index(drop=True),
+            "daily":  d.reset_index(drop=True),
+        })
+    return cases
+
+
+# ── Synthetic universe ────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=None)
+def _weekly_dates(n):
+    return pd.date_range(end="2026-01-05", periods=n, freq="W-MON")
+
+
+@lru_cache(maxsize=None)
+def _daily_dates(n):
+    return pd.bdate_range("2025-01-02", periods=n)
+
+
+def _bars(r, ret, dates, vol_lo, vol_hi):
+    close = 20 * np.exp(np.cumsum(ret))
+    n = len(close)
+    return pd.DataFrame({
+        "date":   dates,
+        "open":   close * (1 + r.normal(0, 0.01, n)),
+        "high":   close * (1 + np.abs(r.normal(0, 0.02, n))),
+        "low":    close * (1 - np.abs(r.normal(0, 0.02, n))),
+        "close":  close,
+        "volume": r.integers(vol_lo, vol_hi, n).astype(float),
+    })
+
+
+def synth_weekly(seed, n):
+    """Cyclical weekly walk — multi-year runs and 40-80% drawdowns."""
+    r = np.random.default_rng(seed)
+    t = np.arange(n)
+    cycle = 0.012 * np.sin(2 * np.pi * t / r.integers(150, 400) + r.uniform(0, 6))
+    ret = r.normal(0.002, 0.045, n) + cycle
+    return _bars(r, ret, _weekly_dates(n), 100_000, 5_000_000)
+
+
+def synth_daily(seed, n=252):
+    """One year of daily bars; every third series gets a late selloff so the
+    yellow-dot / post-dot stages actually run."""
+    r = np.random.default_rng(seed)
+    ret = r.normal(0.0008, 0.02, n)
+    if seed % 3 == 0:
+        at = int(r.integers(n - 60, n - 5))
+        ret[at - 8:at] -= 0.06
+    close = 50 * np.exp(np.cumsum(ret))
+    return pd.DataFrame({
+        "date":   _daily_dates(n),
+        "open":   close * (1 + r.normal(0, 0.005, n)),
+        "high":   close * (1 + np.abs(r.normal(0, 0.01, n))),
+        "low":    close * (1 - np.abs(r.normal(0, 0.01, n))),
+        "close":  close,
+        "volume": r.integers(200_000, 5_000_000, n).astype(float),
+    })
+
+
+def synthetic_universe(n=2000, seed=0):
+    """n seeded cases — every fourth one scored in base-breakout mode."""
+    cases = []
+    for i in range(n):
+        s = seed * 1_000_003 + i
+        cases.append({
+            "ticker": f"SYN{i:05d}",
+            "mode":   "base_breakout" if i % 4 == 3 else "retest",
+            "weekly": synth_weekly(s, _SYNTH_WEEKS[i % len(_SYNTH_WEEKS)]),
+            "daily":  synth_daily(s),
+        })
+    return cases
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("--record", action="store_true", help="snapshot KNOWN_SETUPS from Yahoo")
+    a = ap.parse_args()
+    if a.record:
+        record_known_setups()
+    cases = load_known_setups()
+    print(f"{len(cases)} known-setup cases recorded in {FIXTURE_DIR}")
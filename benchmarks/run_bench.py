@@ -0,0 +1,274 @@
+"""
+Offline benchmark suite for the per-ticker scan pipeline.
+
+    python benchmarks/run_bench.py                       # compare vs baseline
+    python benchmarks/run_bench.py --save-baseline       # record a new baseline
+    python benchmarks/run_bench.py --universe synthetic --tickers 500 --repeat 1
+
+Times each check / scorer on its own plus evaluate_ticker and ScanExecutor
+end-to-end against warm in-memory caches, so nothing touches Yahoo. Reports
+µs per ticker, tickers/s and tracemalloc peak per stage, then diffs against
+the baseline JSON (default benchmarks/baseline.json). Baselines are machine-
+specific — record one before a change, rerun after it on the same box.
+Fixtures: see benchmarks/fixtures.py.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Caches (bar store, sector index, indicator state) go to a throwaway dir —
+# must be set before market_data is imported.
+os.environ["SCANNER_CACHE_DIR"] = tempfile.mkdtemp(prefix="scanner_bench_")
+
+import numpy as np   # noqa: E402
+import pandas as pd  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import market_data                                              # noqa: E402
+from benchmarks.fixtures import load_known_setups, synthetic_universe   # noqa: E402
+from scan_engine import (                                       # noqa: E402
+    check_weekly, check_weekly_batch, check_daily, check_recovery_structure,
+    check_base_breakout, score_setup, score_base_breakout, evaluate_ticker, ScanExecutor,
+)
+from walk_forward import walk_forward_ticker                    # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Sidebar defaults per mode (app.py)
+RETEST_PARAMS = {
+    "is_retest": True, "min_price": 5.0,
+    "w_dist_200sma_lo": 60, "w_dist_200sma_hi": 80, "w_prior_run": 300,
+    "w_correction": 35, "w_vol_mult": 1.2,
+    "bb_base_years": 2, "bb_range_pct": 60, "bb_atr_max": 4.0,
+    "bb_vol_mult": 1.5, "bb_sma_lo": 10, "bb_sma_hi": 40,
+    "d_atr_pct_min": 3.0, "d_atr_pct_max": 12.0, "d_above_50sma": 10,
+}
+BREAKOUT_PARAMS = dict(RETEST_PARAMS, **{
+    "is_retest": False, "bb_vol_mult": 2.0,
+    "d_atr_pct_min": 2.0, "d_atr_pct_max": 8.0, "d_above_50sma": 20,
+})
+SECTOR_RETURNS = {"XLK": 6.0, "XLE": -3.0, "XLF": 1.0, "XLV": 12.0, "XLB": 18.0}
+_SECTORS       = [("XLK", "Technology"), ("XLE", "Energy"), ("XLF", "Financial Services"),
+                  ("XLV", "Healthcare"), ("XLB", "Basic Materials")]
+
+
+def _wargs(p):
+    return (p["w_dist_200sma_lo"], p["w_dist_200sma_hi"], p["w_prior_run"],
+            p["w_correction"], p["w_vol_mult"])
+
+def _bargs(p):
+    return (p["bb_base_years"], p["bb_range_pct"], p["bb_atr_max"],
+            p["bb_vol_mult"], p["bb_sma_lo"], p["bb_sma_hi"])
+
+def _dargs(p):
+    return (p["d_atr_pct_min"], p["d_atr_pct_max"], p["d_above_50sma"])
+
+
+# ── Universe setup ────────────────────────────────────────────────────────────
+
+def build_universe(which, n, seed):
+    cases = []
+    if which in ("known", "all"):
+        cases += load_known_setups()
+    if which in ("synthetic", "all"):
+        cases += synthetic_universe(n, seed)
+    # Known setups repeat tickers at different dates — give each case its own
+    # cache key so the end-to-end stages see every as-of slice
+    seen = {}
+    for c in cases:
+        k = seen.get(c["ticker"], 0)
+        seen[c["ticker"]] = k + 1
+        c["key"] = c["ticker"] if k == 0 else f"{c['ticker']}.{k}"
+        c["params"] = RETEST_PARAMS if c["mode"] == "retest" else BREAKOUT_PARAMS
+    return [c for c in cases if len(c["weekly"]) >= 52 and len(c["daily"]) >= 55]
+
+
+def warm_caches(cases):
+    """Pre-load frames + sector entries exactly as a warm scan would see them."""
+    for i, c in enumerate(cases):
+        market_data._yf_cache[f"{c['key']}_1wk"] = market_data.as_bars(c["weekly"])
+        market_data._yf_cache[f"{c['key']}_1d"]  = market_data.as_bars(c["daily"])
+        etf, name = _SECTORS[i % len(_SECTORS)]
+        market_data.sector_index.put(c["key"], etf, name, source="bench")
+    market_data.sector_index.save()
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+# Each stage is (name, inputs, fn) — fn(inputs) processes every input once.
+
+def build_stages(cases, workers, processes=0):
+    retest = [c for c in cases if c["mode"] == "retest"]
+    bb     = [c for c in cases if c["mode"] != "retest"]
+
+    # Scorer inputs computed once, outside the timed region
+    scored_r = []
+    for c in retest:
+        _, wr = check_weekly(c["weekly"], *_wargs(c["params"]), ticker=c["key"])
+        _, dr = check_daily(c["daily"], *_dargs(c["params"]))
+        if "error" not in wr and "error" not in dr:
+            scored_r.append((wr, dr))
+    scored_b = []
+    for c in bb:
+        _, br = check_base_breakout(c["weekly"], *_bargs(c["params"]))
+        _, dr = check_daily(c["daily"], *_dargs(c["params"]))
+        if "error" not in br and "error" not in dr:
+            scored_b.append((br, dr))
+
+    def e2e_serial(group):
+        for c in group:
+            evaluate_ticker(c["key"], c["params"], SECTOR_RETURNS)
+
+    def e2e_executor(group, processes=0):
+        for params in (RETEST_PARAMS, BREAKOUT_PARAMS):
+            keys = [c["key"] for c in group if c["params"] is params]
+            for _ in ScanExecutor(params, SECTOR_RETURNS, workers=workers,
+                                  processes=processes).run(keys):
+                pass
+
+    stages = [
+        ("check_weekly", retest, lambda g: [
+            check_weekly(c["weekly"], *_wargs(c["params"]), ticker=c["key"]) for c in g]),
+        ("check_weekly_batch", retest, lambda g: check_weekly_batch(
+            {c["key"]: c["weekly"] for c in g}, *_wargs(RETEST_PARAMS))),
+        ("check_daily", cases, lambda g: [
+            check_daily(c["daily"], *_dargs(c["params"])) for c in g]),
+        ("check_recovery_structure", retest, lambda g: [
+            check_recovery_structure(c["weekly"]) for c in g]),
+        ("check_base_breakout", bb, lambda g: [
+            check_base_breakout(c["weekly"], *_bargs(c["params"])) for c in g]),
+        ("score_setup", scored_r, lambda g: [score_setup(wr, dr) for wr, dr in g]),
+        ("score_base_breakout", scored_b, lambda g: [score_base_breakout(br, dr) for br, dr in g]),
+        ("end_to_end", cases, e2e_serial),
+        (f"end_to_end_executor_w{workers}", cases, e2e_executor),
+        # Every historical week per ticker (10y lookback), not just the latest
+        ("walk_forward", cases, lambda g: [
+            walk_forward_ticker(c["weekly"], c["params"], ticker=c["key"]) for c in g]),
+    ]
+    if processes:
+        # Includes spawning the pool (once per mode) — compare at universe scale
+        stages.append((f"end_to_end_executor_p{processes}", cases,
+                       lambda g: e2e_executor(g, processes)))
+    return stages
+
+
+def run_stage(fn, inputs, repeat):
+    """Best-of-repeat wall time, then one traced pass for peak allocation."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(inputs)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n = max(len(inputs), 1)
+    us = best / n * 1e6
+    return {
+        "tickers":       len(inputs),
+        "total_s":       round(best, 4),
+        "us_per_ticker": round(us, 1),
+        "tickers_per_s": round(1e6 / us, 1) if us > 0 else None,
+        "peak_kb":       round(peak / 1024, 1),
+    }
+
+
+# ── Baseline diff ─────────────────────────────────────────────────────────────
+
+def compare(results, baseline, tolerance):
+    """Return list of stage names slower than baseline by more than tolerance."""
+    regressions = []
+    base = baseline.get("stages", {})
+    print(f"\n  vs baseline ({baseline.get('meta', {}).get('recorded', '?')}), "
+          f"tolerance ±{tolerance:.0%}")
+    for name, r in results.items():
+        b = base.get(name)
+        if not b or not b.get("us_per_ticker"):
+            print(f"  {name:32s} (no baseline)")
+            continue
+        ratio = r["us_per_ticker"] / b["us_per_ticker"]
+        if ratio > 1 + tolerance:
+            verdict = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            verdict = "faster"
+        else:
+            verdict = "~"
+        print(f"  {name:32s} {b['us_per_ticker']:10.1f} → {r['us_per_ticker']:10.1f} µs "
+              f"({ratio:5.2f}x)  {verdict}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("--universe",  choices=("synthetic", "known", "all"), default="all")
+    ap.add_argument("--tickers",   type=int, default=2000, help="synthetic universe size")
+    ap.add_argument("--seed",      type=int, default=0)
+    ap.add_argument("--repeat",    type=int, default=3)
+    ap.add_argument("--workers",   type=int, default=8, help="ScanExecutor threads")
+    ap.add_argument("--processes", type=int, default=0,
+                    help="also time ScanExecutor with this many worker processes")
+    ap.add_argument("--stages",    default="", help="comma-separated subset to run")
+    ap.add_argument("--baseline",  default=DEFAULT_BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    ap.add_argument("--fail-on-regression", action="store_true")
+    a = ap.parse_args()
+
+    t0 = time.perf_counter()
+    cases = build_universe(a.universe, a.tickers, a.seed)
+    if not cases:
+        sys.exit("no cases — record fixtures (benchmarks/fixtures.py --record) or use synthetic")
+    warm_caches(cases)
+    known = sum(1 for c in cases if not c["ticker"].startswith("SYN"))
+    print(f"{len(cases)} cases ({known} known setups) loaded in {time.perf_counter() - t0:.1f}s")
+
+    wanted  = {s for s in a.stages.split(",") if s}
+    results = {}
+    print(f"\n  {'stage':32s} {'n':>6s} {'µs/ticker':>10s} {'tickers/s':>10s} {'peak KB':>10s}")
+    for name, inputs, fn in build_stages(cases, a.workers, a.processes):
+        if wanted and name not in wanted:
+            continue
+        r = run_stage(fn, inputs, a.repeat)
+        results[name] = r
+        print(f"  {name:32s} {r['tickers']:6d} {r['us_per_ticker']:10.1f} "
+              f"{r['tickers_per_s'] or 0:10.1f} {r['peak_kb']:10.1f}")
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n  process max RSS {max_rss_mb:.0f} MB")
+
+    regressions = []
+    if os.path.exists(a.baseline) and not a.save_baseline:
+        with open(a.baseline) as f:
+            regressions = compare(results, json.load(f), a.tolerance)
+
+    if a.save_baseline:
+        payload = {
+            "meta": {
+                "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python":   platform.python_version(),
+                "numpy":    np.__version__,
+                "pandas":   pd.__version__,
+                "machine":  platform.machine(),
+                "universe": a.universe, "tickers": len(cases), "repeat": a.repeat,
+                "max_rss_mb": round(max_rss_mb, 1),
+            },
+            "stages": results,
+        }
+        with open(a.baseline, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\n  baseline written to {a.baseline}")
+
+    if regressions and a.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
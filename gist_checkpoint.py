@@ -0,0 +1,435 @@
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ── Gist Checkpoints ──────────────────────────────────────────────────────────
+# Scan-hit checkpoints to a private GitHub Gist — survive container restarts.
+# Uploads run on a background thread so a slow api.github.com response never
+# stalls the scan loop. Pending checkpoints coalesce in a one-slot queue: the
+# scan only ever needs the newest state on GitHub, so a checkpoint submitted
+# while another is waiting simply replaces it. Streamlit-free — app.py hands
+# in the token / gist id from st.secrets.
+#
+# Checkpoints are delta-encoded (DeltaCheckpointBuilder): one columnar
+# snapshot file plus append-only delta chunks holding only the hits added
+# since the last upload, so a scan uploads each hit about once instead of
+# re-sending the whole list every time. load_checkpoint() rebuilds the hit
+# list from a single GET — the inline file contents — and still reads the
+# old whole-list checkpoint.
+#
+# SCANNER_GIST_API points everything at a different base URL (e.g. a local
+# stand-in server for benchmarks/bench_gist_checkpoint.py).
+
+GIST_API_URL        = os.environ.get("SCANNER_GIST_API", "https://api.github.com").rstrip("/")
+CHECKPOINT_FILENAME = "scanner_checkpoint.json"
+CHECKPOINT_VERSION  = 2
+
+
+def gist_url(gist_id=None, api_url=GIST_API_URL):
+    return f"{api_url}/gists/{gist_id}" if gist_id else f"{api_url}/gists"
+
+
+def _scalars(d):
+    return {k: v for k, v in (d or {}).items()
+            if isinstance(v, (int, float, str, bool, type(None)))}
+
+
+def checkpoint_hit(h):
+    """The per-hit record stored in a checkpoint — JSON-safe fields only."""
+    return {
+        "ticker":      h["ticker"],
+        "score":       h["score"],
+        "norm_score":  h.get("norm_score", 0),
+        "sector":      h.get("sector", ""),
+        "sector_rel":  h.get("sector_rel"),
+        "structure":   h.get("rr", {}).get("structure_label", ""),
+        "close":       h["wr"].get("current_close"),
+        "slope":       h["wr"].get("sma200_slope_grade", ""),
+        "wr":          _scalars(h["wr"]),
+        "dr":          _scalars(h["dr"]),
+        "rr":          _scalars(h.get("rr", {})),
+        "w_pass":      h.get("w_pass", False),
+        "d_pass":      h.get("d_pass", False),
+        "base_score":  h.get("base_score", 0),
+        "bonus_score": h.get("bonus_score", 0),
+        "sector_pts":  h.get("sector_pts", 0),
+    }
+
+
+def _dumps(obj):
+    return json.dumps(obj, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+
+def build_checkpoint_files(hits, scan_ts, mode):
+    """Gist "files" payload for a full (v1, whole-list) checkpoint of hits."""
+    checkpoint = {"hits": [checkpoint_hit(h) for h in hits], "scan_ts": scan_ts,
+                  "mode": mode, "checkpoint": True, "hit_count": len(hits)}
+    return {CHECKPOINT_FILENAME: {"content": _dumps(checkpoint)}}
+
+
+def make_session(token):
+    """Pooled keep-alive session carrying the Gist auth headers."""
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    s.mount("http://",  HTTPAdapter(pool_connections=1, pool_maxsize=2))
+    s.headers.update({"Authorization": f"token {token}",
+                      "Accept": "application/vnd.github.v3+json"})
+    return s
+
+
+# ── Columnar delta format ─────────────────────────────────────────────────────
+# A block of hits is stored column-wise: {"n": rows, "cols": {field: [values]}}
+# with wr / dr / rr flattened to "wr.field" etc. Low-cardinality string
+# columns (sector, slope grade …) are dictionary-encoded as
+# {"dict": [values], "idx": [codes]}; a field missing from some rows lists
+# those row numbers under "absent" so the round trip is exact. The
+# structure / close / slope summary fields are derived from rr / wr on load
+# and never uploaded.
+
+_NESTED  = ("wr", "dr", "rr")
+_DERIVED = ("structure", "close", "slope")
+
+
+def chunk_filename(i):
+    return f"scanner_checkpoint.d{i:03d}.json"
+
+
+def _flatten(h):
+    row = {k: v for k, v in h.items() if k not in _NESTED and k not in _DERIVED}
+    for sub in _NESTED:
+        for k, v in (h.get(sub) or {}).items():
+            row[f"{sub}.{k}"] = v
+    return row
+
+
+def _unflatten(row):
+    h = {sub: {} for sub in _NESTED}
+    for k, v in row.items():
+        sub, dot, field = k.partition(".")
+        if dot and sub in _NESTED:
+            h[sub][field] = v
+        else:
+            h[k] = v
+    h["structure"] = h["rr"].get("structure_label", "")
+    h["close"]     = h["wr"].get("current_close")
+    h["slope"]     = h["wr"].get("sma200_slope_grade", "")
+    return h
+
+
+def encode_columns(hits):
+    """checkpoint_hit() dicts → columnar block."""
+    rows = [_flatten(checkpoint_hit(h)) for h in hits]
+    n    = len(rows)
+    names = list(dict.fromkeys(k for r in rows for k in r))
+    cols, absent = {}, {}
+    for name in names:
+        vals = [r.get(name) for r in rows]
+        miss = [i for i, r in enumerate(rows) if name not in r]
+        if miss:
+            absent[name] = miss
+        uniq = list(dict.fromkeys(v for v in vals if isinstance(v, str)))
+        if n >= 4 and len(uniq) <= n // 2 and all(isinstance(v, str) for v in vals):
+            code = {v: i for i, v in enumerate(uniq)}
+            cols[name] = {"dict": uniq, "idx": [code[v] for v in vals]}
+        else:
+            cols[name] = vals
+    block = {"n": n, "cols": cols}
+    if absent:
+        block["absent"] = absent
+    return block
+
+
+def decode_columns(block):
+    """Columnar block → list of checkpoint_hit()-shaped dicts."""
+    n    = block.get("n", 0)
+    rows = [{} for _ in range(n)]
+    absent = block.get("absent", {})
+    for name, col in block.get("cols", {}).items():
+        if isinstance(col, dict):
+            col = [col["dict"][i] for i in col["idx"]]
+        skip = set(absent.get(name, ()))
+        for i, v in enumerate(col):
+            if i not in skip:
+                rows[i][name] = v
+    return [_unflatten(r) for r in rows]
+
+
+class DeltaCheckpointBuilder:
+    """
+    Stateful build= callable for GistCheckpointWriter. The first upload of a
+    scan is a columnar snapshot; after that each upload is one new delta
+    chunk file holding only hits[acked:]. State advances only on ack() (the
+    writer calls it after a 2xx), so a failed upload is simply rebuilt —
+    against the same chunk name — with whatever is newest by then, and a
+    request that landed but timed out client-side is overwritten rather
+    than duplicated. Once the deltas outweigh the snapshot (or max_chunks
+    files exist) the next upload compacts: a new snapshot of every hit plus
+    deletes for the old chunks, keeping total bytes uploaded linear in hits.
+    Each snapshot gets a fresh generation id; the loader ignores chunks from
+    any other generation (e.g. left over from an earlier scan). reset() —
+    called by the writer on a non-retryable error — forgets the remote
+    state and starts over with a snapshot.
+    """
+    def __init__(self, max_chunks=100, min_compact=50):
+        self.max_chunks  = max_chunks
+        self.min_compact = min_compact
+        self.reset()
+
+    def reset(self):
+        self.scan_key  = None       # (scan_ts, mode) the remote state belongs to
+        self.gen       = None
+        self.snap_n    = 0          # hits in the snapshot
+        self.acked_n   = 0          # hits on the gist (snapshot + chunks)
+        self.chunks    = 0          # delta chunk files on the gist
+        self._inflight = None
+
+    def _compact_due(self):
+        delta_n = self.acked_n - self.snap_n
+        return (self.chunks >= self.max_chunks
+                or delta_n >= max(self.snap_n, self.min_compact))
+
+    def __call__(self, hits, scan_ts, mode):
+        key = (scan_ts, mode)
+        if key != self.scan_key or len(hits) < self.acked_n:
+            # New scan (or a list that shrank) — nothing remote is reusable,
+            # and chunks from another generation are ignored on load anyway
+            self.reset()
+        if self.gen is not None and len(hits) == self.acked_n:
+            return None
+        if self.gen is None or self._compact_due():
+            gen = os.urandom(4).hex()
+            files = {CHECKPOINT_FILENAME: {"content": _dumps({
+                "v": CHECKPOINT_VERSION, "checkpoint": True, "gen": gen,
+                "scan_ts": scan_ts, "mode": mode, "hit_count": len(hits),
+                **encode_columns(hits),
+            })}}
+            if self.gen is not None:
+                files.update({chunk_filename(i): None for i in range(self.chunks)})
+            self._inflight = (key, gen, len(hits), len(hits), 0)
+            return files
+        chunk = {"v": CHECKPOINT_VERSION, "gen": self.gen, "seq": self.chunks,
+                 "start": self.acked_n, **encode_columns(hits[self.acked_n:])}
+        self._inflight = (key, self.gen, self.snap_n, len(hits), self.chunks + 1)
+        return {chunk_filename(self.chunks): {"content": _dumps(chunk)}}
+
+    def ack(self):
+        if self._inflight is not None:
+            (self.scan_key, self.gen, self.snap_n,
+             self.acked_n, self.chunks) = self._inflight
+            self._inflight = None
+
+
+def decode_checkpoint(files, fetch=None):
+    """
+    Rebuild {"hits", "scan_ts", "mode", "checkpoint", "hit_count"} from a
+    gist "files" mapping. fetch(raw_url) is used for any file the API
+    returned truncated. Reads both the v2 snapshot + deltas format and the
+    v1 whole-list checkpoint. Returns None if there is no checkpoint.
+    """
+    def content(name):
+        f = files.get(name) or {}
+        text = f.get("content")
+        if (text is None or f.get("truncated")) and fetch and f.get("raw_url"):
+            text = fetch(f["raw_url"])
+        return json.loads(text) if text else None
+
+    snap = content(CHECKPOINT_FILENAME)
+    if not snap or not snap.get("checkpoint"):
+        return None
+    if snap.get("v", 1) < 2:
+        return snap
+    hits = decode_columns(snap)
+    chunks = {}
+    for name in files:
+        if name.startswith("scanner_checkpoint.d") and name != CHECKPOINT_FILENAME:
+            try:
+                c = content(name)
+            except ValueError:
+                continue
+            if c and c.get("gen") == snap["gen"]:
+                chunks[c["seq"]] = c
+    # Apply contiguous chunks in order; a gap means a lost upload — stop there
+    seq = 0
+    while seq in chunks and chunks[seq]["start"] == len(hits):
+        hits += decode_columns(chunks[seq])
+        seq += 1
+    return {"hits": hits, "scan_ts": snap.get("scan_ts", ""), "mode": snap.get("mode", "retest"),
+            "checkpoint": True, "hit_count": len(hits)}
+
+
+def load_checkpoint(token, gist_id, api_url=GIST_API_URL, timeout=8, session=None):
+    """Fetch the checkpoint from the gist in one request. Returns dict or None."""
+    try:
+        s = session or make_session(token)
+        r = s.get(gist_url(gist_id, api_url), timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return decode_checkpoint(r.json().get("files", {}),
+                                 fetch=lambda url: s.get(url, timeout=timeout).text)
+    except Exception:
+        return None
+
+
+class GistCheckpointWriter:
+    """
+    Background uploader. submit() is O(1) on the scan thread — it stores a
+    shallow copy of the hit list and returns; the worker serialises and
+    PATCHes the newest pending state. Failures back off exponentially
+    (Retry-After honoured on 403/429) and retry with whatever is newest by
+    then. flush() blocks until everything submitted has landed or timed out.
+    The worker thread exits after idle_timeout seconds with nothing to send
+    (a scan killed by a Streamlit rerun never calls close()); the next
+    submit() starts a fresh one.
+    """
+    RETRYABLE = {403, 408, 429, 500, 502, 503, 504}
+
+    def __init__(self, token, gist_id, api_url=GIST_API_URL, timeout=8,
+                 backoff_base=1.0, backoff_max=60.0, idle_timeout=120.0,
+                 build=None):
+        self.url          = gist_url(gist_id, api_url)
+        self.timeout      = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max  = backoff_max
+        self.idle_timeout = idle_timeout
+        self._build       = build or DeltaCheckpointBuilder()
+        self._session     = make_session(token)
+        self._cond        = threading.Condition()
+        self._pending     = None        # one-slot queue: latest submit wins
+        self._closed      = False
+        self._seq         = 0           # submits accepted
+        self._done_seq    = 0           # newest submit fully handled
+        self.stats        = {"submitted": 0, "coalesced": 0, "sent": 0, "failed": 0,
+                             "bytes": 0, "last_status": None, "last_error": None}
+        self._running     = False
+        self._thread      = None
+
+    def _ensure_worker(self):
+        # caller holds self._cond
+        if not self._running:
+            self._running = True
+            self._thread  = threading.Thread(target=self._run, name="gist-checkpoint", daemon=True)
+            self._thread.start()
+
+    def submit(self, hits, scan_ts, mode):
+        with self._cond:
+            if self._closed:
+                return
+            if self._pending is not None:
+                self.stats["coalesced"] += 1
+            self._seq += 1
+            self._pending = (self._seq, list(hits), scan_ts, mode)
+            self.stats["submitted"] += 1
+            self._ensure_worker()
+            self._cond.notify_all()
+
+    def flush(self, timeout=15.0):
+        """Wait for the newest submitted checkpoint to be sent (or given up on)."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self._seq
+            while self._done_seq < target:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+            return True
+
+    def close(self, timeout=15.0):
+        """Final flush, then stop the worker."""
+        ok = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._session.close()
+        return ok
+
+    # ── worker ────────────────────────────────────────────────────────────────
+
+    def _send(self, files):
+        body = _dumps({"files": files}).encode("utf-8")
+        r = self._session.patch(self.url, data=body, timeout=self.timeout,
+                                headers={"Content-Type": "application/json"})
+        self.stats["bytes"] += len(body)
+        self.stats["last_status"] = r.status_code
+        return r
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    if not self._cond.wait(self.idle_timeout) and self._pending is None:
+                        self._running = False   # idle — submit() restarts us
+                        return
+                if self._closed:
+                    self._running = False
+                    return          # close() already flushed (or timed out)
+                seq, hits, scan_ts, mode = self._pending
+                self._pending = None
+            delay = 0.0
+            try:
+                files = self._build(hits, scan_ts, mode)
+            except Exception as e:
+                files = None                            # bad hit data — not retryable
+                self.stats["failed"] += 1
+                self.stats["last_error"] = str(e)
+            if files is None:
+                with self._cond:
+                    self._done_seq = max(self._done_seq, seq)
+                    self._cond.notify_all()
+                continue
+            try:
+                r = self._send(files)
+                if r.status_code < 300:
+                    failures = 0
+                    self.stats["sent"] += 1
+                    self._hook("ack")
+                elif r.status_code in self.RETRYABLE:
+                    failures += 1
+                    delay = self._retry_delay(failures, r.headers.get("Retry-After"))
+                else:
+                    self.stats["failed"] += 1          # 401 / 404 / 422 — retrying won't help
+                    self.stats["last_error"] = f"HTTP {r.status_code}"
+                    self._hook("reset")
+            except Exception as e:
+                failures += 1
+                delay = self._retry_delay(failures, None)
+                self.stats["last_error"] = str(e)
+            with self._cond:
+                if delay:
+                    self.stats["failed"] += 1
+                    # Re-queue unless something newer already replaced it
+                    if self._pending is None:
+                        self._pending = (seq, hits, scan_ts, mode)
+                else:
+                    self._done_seq = max(self._done_seq, seq)
+                self._cond.notify_all()
+            if delay:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed, timeout=delay)
+                    if self._closed:
+                        # Closing mid-backoff: give up on the retry
+                        self._done_seq = self._seq
+                        self._running  = False
+                        self._cond.notify_all()
+                        return
+
+    def _hook(self, name):
+        # Stateful builders (DeltaCheckpointBuilder) track what reached the gist
+        fn = getattr(self._build, name, None)
+        if fn is not None:
+            fn()
+
+    def _retry_delay(self, failures, retry_after):
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.backoff_max)
+        except ValueError:
+            pass
+        return min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
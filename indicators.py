@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from market_data import CACHE_DIR, _ADJUST_TOLERANCE
+
+# ── Indicators ────────────────────────────────────────────────────────────────
+# Moving-average / ATR helpers plus a persisted per-ticker weekly indicator
+# state, so a scan only folds in the bars appended since the last one instead
+# of re-running SMA/EMA/TR over the full period="max" history.
+
+def calc_sma(series, period):
+    return series.rolling(window=period, min_periods=period).mean()
+
+def calc_ema(series, period):
+    return series.ewm(span=period, adjust=False).mean()
+
+def calc_atr_pct(df, period=14, use_median=True):
+    """
+    ATR as % of close. use_median=True uses median TR to reduce earnings
+    gap noise — a single gap week inflates mean ATR for the full period,
+    causing valid post-earnings coiling setups to fail the ATR filter.
+    """
+    high  = df["high"]
+    low   = df["low"]
+    close = df["close"]
+    prev  = close.shift(1)
+    tr = pd.concat([high - low, (high - prev).abs(), (low - prev).abs()], axis=1).max(axis=1)
+    if use_median:
+        atr_val = tr.iloc[-period:].median() if len(tr) >= period else tr.median()
+    else:
+        atr_val = tr.rolling(period).mean().iloc[-1]
+    return float(atr_val / close.iloc[-1] * 100)
+
+
+# ── Weekly indicator state ────────────────────────────────────────────────────
+# State covers the settled bars only — everything but the last row, which is
+# the in-progress week and changes every day. Layout (m = settled bar count):
+#   sum200 / sum50   rolling close sums ending at bar m-1
+#   sma200           SMA200 at bars m-8 … m-1
+#   ema10 / ema20    EMA at bars m-7 … m-1
+#   tr               true range at bars m-11 … m-1
+#   ath / atl        max / min close over bars 0 … m-8
+# The live bar is then applied on top without being saved. Needs ≥201 bars so
+# check_weekly's min(200, n-1) window is a fixed 200; shorter histories (and
+# anything that fails validation) just use the full pandas path.
+
+INDICATOR_DIR = os.path.join(CACHE_DIR, "indicators")
+_IND_MIN_BARS = 201
+_IND_VERSION  = 1
+
+_ind_cache = {}
+_ind_lock  = threading.Lock()
+
+
+def _ind_path(ticker, freq):
+    return os.path.join(INDICATOR_DIR, freq, f"{ticker}.json")
+
+
+def _load_state(ticker, freq):
+    key = (ticker, freq)
+    with _ind_lock:
+        if key in _ind_cache:
+            return _ind_cache[key]
+    try:
+        with open(_ind_path(ticker, freq), "r") as f:
+            state = json.load(f)
+        if state.get("version") != _IND_VERSION:
+            state = None
+    except Exception:
+        state = None
+    with _ind_lock:
+        _ind_cache[key] = state
+    return state
+
+
+def _save_state(ticker, freq, state):
+    """Atomic write, best-effort — never raises."""
+    with _ind_lock:
+        _ind_cache[(ticker, freq)] = state
+    try:
+        os.makedirs(os.path.join(INDICATOR_DIR, freq), exist_ok=True)
+        path = _ind_path(ticker, freq)
+        tmp  = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def _build_state(df, m):
+    """Full-history state over the first m bars — the one O(history) pass."""
+    closes = df["close"].iloc[:m]
+    highs  = df["high"].iloc[:m]
+    lows   = df["low"].iloc[:m]
+    prev   = closes.shift(1)
+    tr = pd.concat([highs - lows, (highs - prev).abs(), (lows - prev).abs()], axis=1).max(axis=1)
+    ath_w = closes.iloc[:m - 7]
+    return {
+        "version":    _IND_VERSION,
+        "bars":       m,
+        "first_date": df["date"].iloc[0].strftime("%Y-%m-%d"),
+        "last_date":  df["date"].iloc[m - 1].strftime("%Y-%m-%d"),
+        "last_close": float(closes.iloc[-1]),
+        "sum200":     float(closes.iloc[-200:].sum()),
+        "sum50":      float(closes.iloc[-50:].sum()),
+        "sma200":     [float(x) for x in calc_sma(closes, 200).iloc[-8:]],
+        "ema10":      [float(x) for x in calc_ema(closes, 10).iloc[-7:]],
+        "ema20":      [float(x) for x in calc_ema(closes, 20).iloc[-7:]],
+        "tr":         [float(x) for x in tr.iloc[-11:]],
+        "ath":        float(ath_w.max()),
+        "atl":        float(ath_w.min()),
+    }
+
+
+def _state_matches(state, df):
+    """True if df still starts with the exact bars the state was built from."""
+    m = state["bars"]
+    if len(df) <= m:
+        return False
+    if df["date"].iloc[0].strftime("%Y-%m-%d") != state["first_date"]:
+        return False
+    if df["date"].iloc[m - 1].strftime("%Y-%m-%d") != state["last_date"]:
+        return False
+    # Dividend / split re-adjustment rescales the whole history
+    last = state["last_close"]
+    return last > 0 and abs(float(df["close"].iloc[m - 1]) / last - 1) <= _ADJUST_TOLERANCE
+
+
+def _advance(state, c, h, l, start, end):
+    """Fold settled bars start … end-1 into state. O(new bars)."""
+    s = dict(state)
+    sma200 = list(s["sma200"]); ema10 = list(s["ema10"]); ema20 = list(s["ema20"])
+    tr     = list(s["tr"])
+    a10, a20 = 2 / 11, 2 / 21
+    for p in range(start, end):
+        s["sum200"] += c[p] - c[p - 200]
+        s["sum50"]  += c[p] - c[p - 50]
+        sma200.append(s["sum200"] / 200)
+        ema10.append(a10 * c[p] + (1 - a10) * ema10[-1])
+        ema20.append(a20 * c[p] + (1 - a20) * ema20[-1])
+        tr.append(max(h[p] - l[p], abs(h[p] - c[p - 1]), abs(l[p] - c[p - 1])))
+        s["ath"] = max(s["ath"], c[p - 7])
+        s["atl"] = min(s["atl"], c[p - 7])
+    s["sma200"] = sma200[-8:]; s["ema10"] = ema10[-7:]; s["ema20"] = ema20[-7:]
+    s["tr"]     = tr[-11:]
+    return s
+
+
+def weekly_indicators(ticker, df_w, freq="1wk"):
+    """
+    Indicator view for df_w's last bar, advanced from the persisted state.
+    Returns None when df_w is too short or has gaps — callers fall back to
+    the full-history pandas path.
+    Keys (arrays oldest → newest, matching the pandas series' tails):
+      sma200 (9), sma50, ema10 (8), ema20 (8), tr (12), ath, atl
+    """
+    n = len(df_w)
+    if n < _IND_MIN_BARS:
+        return None
+    m = n - 1
+    state = _load_state(ticker, freq)
+    if state is None or not _state_matches(state, df_w) or state["bars"] < _IND_MIN_BARS - 1:
+        if df_w[["close", "high", "low"]].isna().values.any():
+            return None   # gaps — rolling sums would diverge from pandas
+        state = _build_state(df_w, m)
+        _save_state(ticker, freq, state)
+
+    tail = max(m - state["bars"], 0) + 201     # enough rows for the oldest window
+    c = df_w["close"].to_numpy(dtype=float)[-tail:].tolist()
+    h = df_w["high"].to_numpy(dtype=float)[-tail:].tolist()
+    l = df_w["low"].to_numpy(dtype=float)[-tail:].tolist()
+    if np.isnan(c).any() or np.isnan(h).any() or np.isnan(l).any():
+        return None
+    off = n - tail                               # absolute → tail index
+    if state["bars"] < m:
+        state = _advance(state, c, h, l, state["bars"] - off, m - off)
+        state["bars"]       = m
+        state["last_date"]  = df_w["date"].iloc[m - 1].strftime("%Y-%m-%d")
+        state["last_close"] = c[-2]
+        _save_state(ticker, freq, state)
+
+    # Apply the live bar without persisting it
+    live = _advance(state, c, h, l, tail - 1, tail)
+    return {
+        "sma200": np.array(state["sma200"] + live["sma200"][-1:]),
+        "sma50":  np.float64(live["sum50"] / 50),
+        "ema10":  np.array(state["ema10"] + live["ema10"][-1:]),
+        "ema20":  np.array(state["ema20"] + live["ema20"][-1:]),
+        "tr":     np.array(state["tr"] + live["tr"][-1:]),
+        "ath":    np.float64(state["ath"]),
+        "atl":    np.float64(state["atl"]),
+    }
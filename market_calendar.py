@@ -0,0 +1,173 @@
+import os
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# ── NYSE Trading Calendar ─────────────────────────────────────────────────────
+# Computed locally from the exchange's holiday rules — no network, no extra
+# dependency. Regular sessions run 09:30–16:00 New York time; early closes
+# (13:00) fall on the day after Thanksgiving and on July 3 / December 24 when
+# those are Monday–Thursday. Holidays falling on a Saturday are observed the
+# Friday before (except New Year's Day, which is then simply skipped), on a
+# Sunday the Monday after. SPECIAL_CLOSURES lists the unscheduled closures
+# (national days of mourning, weather, 9/11) since 2000.
+#
+# Freshness: bars checked after a session's close has settled cannot change
+# before the next session opens, so fresh_until() keeps them until then —
+# evening, weekend and holiday reruns need no download. Bars checked during a
+# session (or within SETTLE_S of its close, while Yahoo finalises the bar)
+# only hold for INTRADAY_TTL; after that a rerun refetches the moving
+# partial bar.
+
+MARKET_TZ    = ZoneInfo("America/New_York")
+OPEN_TIME    = dtime(9, 30)
+CLOSE_TIME   = dtime(16, 0)
+EARLY_CLOSE  = dtime(13, 0)
+SETTLE_S     = 1800
+INTRADAY_TTL = float(os.environ.get("SCANNER_INTRADAY_TTL", 900))
+
+SPECIAL_CLOSURES = frozenset(date.fromisoformat(d) for d in (
+    "2001-09-11", "2001-09-12", "2001-09-13", "2001-09-14",   # September 11
+    "2004-06-11",                                              # President Reagan
+    "2007-01-02",                                              # President Ford
+    "2012-10-29", "2012-10-30",                                # Hurricane Sandy
+    "2018-12-05",                                              # President G.H.W. Bush
+    "2025-01-09",                                              # President Carter
+))
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based; -1 = last) weekday (Mon=0) of a month."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(d):
+    if d.weekday() == 5:
+        return d - timedelta(days=1)
+    if d.weekday() == 6:
+        return d + timedelta(days=1)
+    return d
+
+
+@lru_cache(maxsize=None)
+def holidays(year):
+    """Full-day NYSE closures in year (weekends excluded)."""
+    days = {
+        _nth_weekday(year, 2, 0, 3),                  # Washington's Birthday
+        _easter(year) - timedelta(days=2),            # Good Friday
+        _nth_weekday(year, 5, 0, -1),                 # Memorial Day
+        _observed(date(year, 7, 4)),                  # Independence Day
+        _nth_weekday(year, 9, 0, 1),                  # Labor Day
+        _nth_weekday(year, 11, 3, 4),                 # Thanksgiving
+        _observed(date(year, 12, 25)),                # Christmas
+    }
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:                       # Saturday: not observed
+        days.add(_observed(new_year))
+    if year >= 1998:
+        days.add(_nth_weekday(year, 1, 0, 3))         # Martin Luther King Jr. Day
+    if year >= 2022:
+        days.add(_observed(date(year, 6, 19)))        # Juneteenth
+    days |= {d for d in SPECIAL_CLOSURES if d.year == year}
+    return frozenset(d for d in days if d.year == year)
+
+
+@lru_cache(maxsize=None)
+def early_closes(year):
+    """13:00 closes in year."""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}   # day after Thanksgiving
+    for d in (date(year, 7, 3), date(year, 12, 24)):
+        if d.weekday() <= 3:
+            days.add(d)
+    return frozenset(days - holidays(year))
+
+
+def is_trading_day(d):
+    return d.weekday() < 5 and d not in holidays(d.year)
+
+
+def session(d):
+    """(open, close) epoch seconds of d's session, or None if the market is closed that day."""
+    if not is_trading_day(d):
+        return None
+    close = EARLY_CLOSE if d in early_closes(d.year) else CLOSE_TIME
+    return (datetime.combine(d, OPEN_TIME, MARKET_TZ).timestamp(),
+            datetime.combine(d, close, MARKET_TZ).timestamp())
+
+
+def _market_date(t):
+    return datetime.fromtimestamp(t, MARKET_TZ).date()
+
+
+def previous_close(now=None):
+    """Epoch seconds of the last session close at or before now."""
+    now = time.time() if now is None else now
+    d   = _market_date(now)
+    while True:
+        s = session(d)
+        if s is not None and s[1] <= now:
+            return s[1]
+        d -= timedelta(days=1)
+
+
+def next_close(now=None):
+    """Epoch seconds of the first session close after now."""
+    now = time.time() if now is None else now
+    d   = _market_date(now)
+    while True:
+        s = session(d)
+        if s is not None and s[1] > now:
+            return s[1]
+        d += timedelta(days=1)
+
+
+def next_open(now=None):
+    """Epoch seconds of the first session open after now."""
+    now = time.time() if now is None else now
+    d   = _market_date(now)
+    while True:
+        s = session(d)
+        if s is not None and s[0] > now:
+            return s[0]
+        d += timedelta(days=1)
+
+
+def is_open(now=None):
+    now = time.time() if now is None else now
+    s   = session(_market_date(now))
+    return s is not None and s[0] <= now < s[1]
+
+
+def fresh_until(checked):
+    """
+    Epoch seconds until which bars downloaded at `checked` are current —
+    the next session open if they were fetched after a settled close, else
+    checked + INTRADAY_TTL (the partial bar is still moving).
+    """
+    if is_open(checked) or checked < previous_close(checked) + SETTLE_S:
+        return checked + INTRADAY_TTL
+    return next_open(checked)
+
+
+def is_fresh(checked, now=None):
+    """True if bars downloaded at `checked` cannot have changed by now."""
+    return (time.time() if now is None else now) < fresh_until(checked)
@@ -0,0 +1,938 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from market_calendar import fresh_until, is_fresh
+
+# ── yfinance Data Helpers ─────────────────────────────────────────────────────
+# Shared by the Streamlit UI and anything else that needs bars. Nothing in here
+# touches st.* so it can be called from worker threads and headless scripts.
+
+# Tickers per multi-symbol yf.download call. ~100 symbols per request keeps
+# Yahoo responses fast and avoids partial frames on very large universes.
+YF_BATCH_SIZE = 100
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every Yahoo request.
+    rate = requests per second (None / 0 = unlimited); burst = bucket size.
+    Concurrent scan workers call wait() before each network call, so raising
+    the worker count never raises the request rate past what Yahoo tolerates.
+    """
+    def __init__(self, rate=None, burst=4):
+        self._lock = threading.Lock()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate, burst=4):
+        with self._lock:
+            self.rate   = float(rate) if rate else None
+            self.burst  = max(1, int(burst))
+            self.tokens = float(self.burst)
+            self.stamp  = time.monotonic()
+
+    def wait(self):
+        while True:
+            with self._lock:
+                if self.rate is None:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp  = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+
+yf_rate_limiter = RateLimiter()
+
+# ── Shared bar cache ──────────────────────────────────────────────────────────
+# _yf_cache is one process-wide cache of Bars keyed "{ticker}_{freq}", shared
+# by every Streamlit session (module state outlives sessions, as
+# st.cache_resource would) and every scan. Entries expire on the trading
+# calendar (market_calendar.fresh_until): bars stored after a settled close
+# hold until the next session opens, bars stored intraday for INTRADAY_TTL.
+# The least recently used are evicted once the cached arrays pass
+# BAR_CACHE_MAX_MB. fetch() is single-flight: concurrent callers for a
+# key that is already being fetched wait for that fetch instead of starting
+# their own; batch callers claim() the keys they will fill and wait() on the
+# rest. stats: hits / misses per get() lookup (peek() and `in` don't count),
+# waits = misses served by another caller's fetch. on_drop(fn) registers a
+# callback run with the key whenever an entry leaves (expired, evicted,
+# replaced, popped, cleared) — for side tables that must not outlive it.
+BAR_CACHE_MAX_MB = float(os.environ.get("SCANNER_BAR_CACHE_MB", 1024))
+
+
+def _nbytes(value):
+    """Array bytes held by a cached value — Bars / arrays, or a DataFrame's columns."""
+    n = getattr(value, "nbytes", None)
+    if n is None and hasattr(value, "memory_usage"):
+        n = value.memory_usage(index=True).sum()
+    return int(n or 0)
+
+
+class BarCache:
+    def __init__(self, max_mb=BAR_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._lock     = threading.Lock()
+        self._entries  = OrderedDict()   # key → (value, nbytes, expires)
+        self._flights  = {}              # key → Event, while a fetch is in progress
+        self.nbytes    = 0
+        self.stats     = {"hits": 0, "misses": 0, "waits": 0, "evicted": 0, "expired": 0}
+        self._on_drop  = []
+
+    def on_drop(self, fn):
+        self._on_drop.append(fn)
+
+    def _dropped(self, key):
+        for fn in self._on_drop:
+            fn(key)
+
+    def _live(self, key):
+        e = self._entries.get(key)
+        if e is None:
+            return None
+        if time.time() >= e[2]:
+            del self._entries[key]
+            self.nbytes -= e[1]
+            self.stats["expired"] += 1
+            self._dropped(key)
+            return None
+        return e
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._live(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def peek(self, key, default=None):
+        with self._lock:
+            e = self._live(key)
+            return default if e is None else e[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            e = self._live(key)
+            if e is None:
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return e[0]
+
+    def __getitem__(self, key):
+        value = self.get(key, self)
+        if value is self:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        size = _nbytes(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+                self._dropped(key)
+            self._entries[key] = (value, size, fresh_until(time.time()))
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                gone, (_, n, _) = self._entries.popitem(last=False)
+                self.nbytes -= n
+                self.stats["evicted"] += 1
+                self._dropped(gone)
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.set()
+
+    def update(self, items):
+        for key, value in dict(items).items():
+            self[key] = value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            e = self._entries.pop(key, None)
+            if e is None:
+                return default
+            self.nbytes -= e[1]
+            self._dropped(key)
+            return e[0]
+
+    def clear(self):
+        """Drop every entry (fetches in flight still complete and are stored)."""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+            self.nbytes = 0
+            for key in keys:
+                self._dropped(key)
+
+    def claim(self, key):
+        """True if the caller should fetch key — not cached, not in flight. Pair with a store or release()."""
+        with self._lock:
+            if self._live(key) is not None or key in self._flights:
+                return False
+            self._flights[key] = threading.Event()
+            return True
+
+    def release(self, key):
+        """End a claim that produced nothing; waiters get None."""
+        with self._lock:
+            flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.set()
+
+    def wait(self, key, timeout=120):
+        """Wait for an in-flight fetch of key; the cached value or None."""
+        with self._lock:
+            flight = self._flights.get(key)
+        if flight is not None:
+            with self._lock:
+                self.stats["waits"] += 1
+            flight.wait(timeout)
+        return self.peek(key)
+
+    def fetch(self, key, load):
+        """Cached value for key, else load() once for every concurrent caller. None results aren't cached."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        if not self.claim(key):
+            return self.wait(key)   # whatever the in-flight fetch produced
+        try:
+            value = load()
+        except Exception:
+            value = None
+        if value is None:
+            self.release(key)
+        else:
+            self[key] = value
+        return value
+
+    def info(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), mb=round(self.nbytes / 1048576, 1),
+                        in_flight=len(self._flights))
+
+
+_yf_cache = BarCache()
+
+# ── On-disk bar store ─────────────────────────────────────────────────────────
+# One Parquet file per ticker and frequency, plus a small JSON sidecar that
+# records the last stored bar date and the period the file covers:
+#   {CACHE_DIR}/bars/1wk/NVDA.parquet
+#   {CACHE_DIR}/bars/1wk/NVDA.json   {"last_bar": "2026-10-12", "period": "max", ...}
+# Repeat scans only ask Yahoo for bars from the last complete stored bar onward
+# and merge them in, instead of re-downloading decades of weekly history —
+# and nothing at all while the sidecar's "updated" is still current on the
+# trading calendar (evening, weekend and holiday reruns).
+# Parquet support comes from pyarrow (already a Streamlit dependency). If it is
+# missing the store silently degrades to plain downloads.
+CACHE_DIR     = os.environ.get("SCANNER_CACHE_DIR", "/tmp/scanner_cache")
+BAR_STORE_DIR = os.path.join(CACHE_DIR, "bars")
+BAR_FIELDS    = ["date", "open", "high", "low", "close", "volume"]
+
+# Longer period = higher rank. A stored file can serve any request whose
+# period ranks at or below the one it was downloaded with.
+_PERIOD_RANK = {"1mo": 1, "3mo": 2, "6mo": 3, "ytd": 4, "1y": 4, "2y": 5,
+                "5y": 6, "10y": 7, "max": 8}
+_PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 365, "2y": 730,
+                "5y": 1826, "10y": 3652}
+
+# Relative close mismatch on the overlap bar that means Yahoo re-adjusted the
+# history (split / dividend) — the stored file is then replaced, not merged.
+_ADJUST_TOLERANCE = 1e-4
+
+
+def _normalise_ohlcv(df):
+    """
+    Put a raw yfinance frame into the scanner's shape:
+    lowercase columns, a tz-naive "date" column, sorted ascending.
+    """
+    df = df.reset_index()
+    # Normalise column names to lowercase
+    df.columns = [str(c).lower() for c in df.columns]
+    # Rename Date/Datetime → date
+    if "datetime" in df.columns:
+        df = df.rename(columns={"datetime": "date"})
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
+    return df.sort_values("date").reset_index(drop=True)
+
+
+def _store_path(ticker, freq, ext):
+    return os.path.join(BAR_STORE_DIR, freq, f"{ticker}.{ext}")
+
+
+def _read_store_meta(ticker, freq):
+    try:
+        with open(_store_path(ticker, freq, "json"), "r") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _store_covers(meta, period):
+    """True if a stored file's period is at least as long as the one requested."""
+    if not meta:
+        return False
+    have = _PERIOD_RANK.get(meta.get("period"))
+    want = _PERIOD_RANK.get(period)
+    return have is not None and want is not None and have >= want
+
+
+def load_stored_bars(ticker, freq):
+    """Read a ticker's stored bars. Returns DataFrame or None."""
+    try:
+        path = _store_path(ticker, freq, "parquet")
+        if not os.path.exists(path):
+            return None
+        df = pd.read_parquet(path)
+        return df if len(df) > 0 else None
+    except Exception:
+        return None
+
+
+def save_stored_bars(ticker, freq, df, period):
+    """Atomically write bars + sidecar. Best-effort — never raises."""
+    try:
+        os.makedirs(os.path.join(BAR_STORE_DIR, freq), exist_ok=True)
+        path = _store_path(ticker, freq, "parquet")
+        tmp  = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df[[c for c in BAR_FIELDS if c in df.columns]].to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        meta = {
+            "last_bar": df["date"].iloc[-1].strftime("%Y-%m-%d"),
+            "period":   period,
+            "bars":     len(df),
+            "updated":  time.time(),
+        }
+        meta_path = _store_path(ticker, freq, "json")
+        meta_tmp  = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(meta_tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_tmp, meta_path)
+    except Exception:
+        pass
+
+
+def _anchor_date(stored):
+    """
+    Date to resume downloading from: the second-to-last stored bar.
+    The last bar may be a partial week/day and is always re-fetched; the one
+    before it is complete and doubles as the overlap check for re-adjustment.
+    """
+    return stored["date"].iloc[-2] if len(stored) >= 2 else stored["date"].iloc[-1]
+
+
+def _merge_bars(stored, fresh):
+    """
+    Append freshly downloaded bars to stored ones.
+    Returns the merged frame, or None if the overlap bar no longer matches
+    (history was re-adjusted) and the caller should fetch the full period.
+    """
+    if fresh is None or fresh.empty:
+        return stored
+    anchor = _anchor_date(stored)
+    old = stored.loc[stored["date"] == anchor, "close"]
+    new = fresh.loc[fresh["date"] == anchor, "close"]
+    if len(old) and len(new):
+        o, n = float(old.iloc[-1]), float(new.iloc[-1])
+        if o > 0 and abs(n - o) / o > _ADJUST_TOLERANCE:
+            return None
+    fresh = fresh[[c for c in BAR_FIELDS if c in fresh.columns]]
+    merged = pd.concat([stored[stored["date"] < fresh["date"].iloc[0]], fresh],
+                       ignore_index=True)
+    return merged.drop_duplicates("date", keep="last").reset_index(drop=True)
+
+
+def period_cutoff(period):
+    """First bar date a request for period keeps; None = everything ("max")."""
+    days = _PERIOD_DAYS.get(period)
+    if days is None:
+        return None
+    return pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
+
+
+def _trim_to_period(df, period):
+    """Stored files only grow — cut back to what the caller asked for."""
+    cutoff = period_cutoff(period)
+    if cutoff is None or df is None:
+        return df
+    return df[df["date"] >= cutoff].reset_index(drop=True)
+
+
+# ── Compact bar container ─────────────────────────────────────────────────────
+# What _yf_cache holds per ticker and frequency instead of a DataFrame: one
+# contiguous array per BAR_FIELDS column — datetime64[ns] dates, float32
+# open/high/low/close, int64 volume — behind __slots__, with no index, block
+# manager or per-column metadata. float32 keeps ~7 significant digits
+# (sub-cent below $10,000); prices are widened to float64 on access, so every
+# calculation still runs in double precision.
+# Bars covers the slice of the DataFrame API the checks and indicators use —
+# bars["close"] (a Series), bars[["close", "low"]], len(), .iloc[a:b],
+# .columns, .copy() — so they take it unchanged; to_frame() for anything else.
+
+_PRICE_FIELDS = ("open", "high", "low", "close")
+
+
+def _volume_array(v):
+    v = np.asarray(v, dtype=np.float64)
+    # Whole-number volumes (always, from Yahoo) fit int64; a missing print
+    # stays NaN in float64 so rolling means still skip it
+    if np.isfinite(v).all() and (v == np.floor(v)).all():
+        return v.astype(np.int64)
+    return v
+
+
+class Bars:
+    __slots__ = ("date", "open", "high", "low", "close", "volume")
+
+    def __init__(self, date, open, high, low, close, volume):
+        self.date   = np.ascontiguousarray(date, dtype="datetime64[ns]")
+        self.open   = np.ascontiguousarray(open, dtype=np.float32)
+        self.high   = np.ascontiguousarray(high, dtype=np.float32)
+        self.low    = np.ascontiguousarray(low, dtype=np.float32)
+        self.close  = np.ascontiguousarray(close, dtype=np.float32)
+        self.volume = _volume_array(volume)
+
+    @classmethod
+    def from_frame(cls, df):
+        """From a scanner-shaped DataFrame; missing price/volume columns become NaN."""
+        nan = np.full(len(df), np.nan)
+        return cls(df["date"].to_numpy(dtype="datetime64[ns]"),
+                   *(df[c].to_numpy(dtype=float) if c in df.columns else nan
+                     for c in BAR_FIELDS[1:]))
+
+    @classmethod
+    def _wrap(cls, arrays):
+        b = object.__new__(cls)
+        for name, a in zip(cls.__slots__, arrays):
+            object.__setattr__(b, name, a)
+        return b
+
+    def __len__(self):
+        return len(self.date)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self.__slots__:
+                raise KeyError(key)
+            a = getattr(self, key)
+            return pd.Series(a.astype(np.float64) if key in _PRICE_FIELDS else a, name=key)
+        if isinstance(key, list):
+            return pd.DataFrame({k: self[k] for k in key})
+        raise KeyError(key)
+
+    @property
+    def iloc(self):
+        return _BarsSlicer(self)
+
+    @property
+    def columns(self):
+        return list(BAR_FIELDS)
+
+    @property
+    def empty(self):
+        return len(self.date) == 0
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, n).nbytes for n in self.__slots__)
+
+    def copy(self):
+        return Bars._wrap([getattr(self, n).copy() for n in self.__slots__])
+
+    def to_frame(self):
+        return pd.DataFrame({n: self[n] for n in self.__slots__})
+
+    def __repr__(self):
+        if self.empty:
+            return "Bars(0 bars)"
+        return (f"Bars({len(self)} bars, {str(self.date[0])[:10]} → {str(self.date[-1])[:10]}, "
+                f"{self.nbytes / 1024:.1f} KB)")
+
+
+class _BarsSlicer:
+    """bars.iloc[a:b] → Bars over views of the same arrays."""
+    __slots__ = ("_bars",)
+
+    def __init__(self, bars):
+        self._bars = bars
+
+    def __getitem__(self, sl):
+        if not isinstance(sl, slice):
+            raise TypeError("Bars.iloc takes a slice — use bars[field].iloc for single rows")
+        return Bars._wrap([getattr(self._bars, n)[sl] for n in Bars.__slots__])
+
+
+def as_bars(df):
+    """DataFrame → Bars; Bars and None pass through."""
+    if df is None or isinstance(df, Bars):
+        return df
+    return Bars.from_frame(df)
+
+
+def _download_single(ticker, freq, period=None, start=None):
+    yf_rate_limiter.wait()
+    tk = yf.Ticker(ticker)
+    if start is not None:
+        df = tk.history(start=start.strftime("%Y-%m-%d"), interval=freq, auto_adjust=True)
+    else:
+        df = tk.history(period=period, interval=freq, auto_adjust=True)
+    if df is None or df.empty:
+        return None
+    df = _normalise_ohlcv(df)
+    return df[[c for c in BAR_FIELDS if c in df.columns]]
+
+
+def fetch_bars(ticker, period="5y", freq="1wk"):
+    """
+    Bars for one ticker through the on-disk bar store, bypassing _yf_cache:
+    a stored file covering period is served as-is while the trading calendar
+    says it is still current (market_calendar.is_fresh), else refreshed
+    incrementally (or served as-is when offline); anything else is downloaded
+    in full and stored. The frame is not trimmed to period. Returns DataFrame
+    or None; may raise.
+    """
+    df   = None
+    meta = _read_store_meta(ticker, freq)
+    if _store_covers(meta, period):
+        stored = load_stored_bars(ticker, freq)
+        if stored is not None and is_fresh(meta.get("updated", 0)):
+            return stored   # no bar can have changed since it was downloaded
+        if stored is not None:
+            try:
+                fresh = _download_single(ticker, freq, start=_anchor_date(stored))
+            except Exception:
+                fresh = None   # offline — serve what we have
+            df = _merge_bars(stored, fresh)
+            if df is not None and fresh is not None:
+                save_stored_bars(ticker, freq, df, period)
+    if df is None:
+        df = _download_single(ticker, freq, period=period)
+        if df is None:
+            return None
+        save_stored_bars(ticker, freq, df, period)
+    return df
+
+
+def get_yf_data(ticker, period="5y", freq="1wk"):
+    """
+    Fetch OHLCV from yfinance with in-memory caching.
+    freq: "1wk" for weekly, "1d" for daily
+    Concurrent calls for the same ticker / freq share one fetch.
+    Returns Bars (date, open, high, low, close, volume) — the compact form
+    _yf_cache keeps; Bars.to_frame() if a real DataFrame is needed.
+    Backed by the on-disk bar store: if the ticker is stored, only bars since
+    the last complete stored bar are downloaded and merged.
+    """
+    def _load():
+        df = fetch_bars(ticker, period, freq)
+        return None if df is None else as_bars(_trim_to_period(df, period))
+
+    return _yf_cache.fetch(f"{ticker}_{freq}", _load)
+
+
+def _split_batch_frame(raw, tickers):
+    """
+    Split a multi-symbol yf.download frame (columns = ticker × field) into
+    {ticker: DataFrame}. Rows where a ticker has no close are dropped — they
+    are padding from the date union of the whole chunk.
+    """
+    out = {}
+    if raw is None or raw.empty:
+        return out
+    if not isinstance(raw.columns, pd.MultiIndex):
+        # Older yfinance returns flat columns for a single-symbol request
+        if len(tickers) == 1:
+            raw = pd.concat({tickers[0]: raw}, axis=1)
+        else:
+            return out
+    available = set(raw.columns.get_level_values(0))
+    for t in tickers:
+        if t not in available:
+            continue
+        sub = raw[t].dropna(subset=["Close"])
+        if sub.empty:
+            continue
+        sub = _normalise_ohlcv(sub)
+        out[t] = sub[[c for c in BAR_FIELDS if c in sub.columns]]
+    return out
+
+
+def _download_batch(chunk, freq, period=None, start=None):
+    yf_rate_limiter.wait()
+    try:
+        kwargs = {"start": start.strftime("%Y-%m-%d")} if start is not None else {"period": period}
+        raw = yf.download(chunk, interval=freq, group_by="ticker", auto_adjust=True,
+                          threads=True, progress=False, **kwargs)
+    except Exception:
+        return {}   # best-effort — per-ticker fallback still applies
+    return _split_batch_frame(raw, chunk)
+
+
+def get_yf_data_batch(tickers, period="5y", freq="1wk", chunk_size=YF_BATCH_SIZE):
+    """
+    Fetch OHLCV for many tickers with chunked multi-symbol requests.
+    Each ticker's bars are split out into the same per-ticker Bars
+    get_yf_data returns and stored in _yf_cache under the same key, so the
+    scan loop's get_yf_data calls become cache hits.
+    Stored tickers the trading calendar says are current are served without a
+    request; other stored tickers are refreshed incrementally — one request
+    per chunk starting at the oldest anchor bar in that chunk — everything
+    else gets a full-period download.
+    Tickers missing from the batch response are simply left uncached —
+    get_yf_data falls back to a single-ticker request for them. Tickers
+    another caller is already fetching are waited for, not re-downloaded.
+    Returns dict {ticker: Bars} for every ticker that has data.
+    """
+    result      = {}
+    stored      = {}
+    full_needed = []
+    claimed     = []
+    elsewhere   = []   # being fetched by another caller right now
+
+    def _keep(t, df):
+        bars = as_bars(_trim_to_period(df, period))
+        _yf_cache[f"{t}_{freq}"] = bars
+        result[t] = bars
+
+    try:   # every claim is released on any exit path, including the claim loop
+        for t in dict.fromkeys(tickers):
+            cached = _yf_cache.get(f"{t}_{freq}")
+            if cached is not None:
+                result[t] = cached
+                continue
+            if not _yf_cache.claim(f"{t}_{freq}"):
+                elsewhere.append(t)
+                continue
+            claimed.append(t)
+            meta = _read_store_meta(t, freq)
+            s = load_stored_bars(t, freq) if _store_covers(meta, period) else None
+            if s is not None and is_fresh(meta.get("updated", 0)):
+                _keep(t, s)
+            elif s is not None:
+                stored[t] = s
+            else:
+                full_needed.append(t)
+
+        # ── Incremental refresh of stored tickers ─────────────────────────────
+        stored_list = list(stored)
+        for i in range(0, len(stored_list), chunk_size):
+            chunk = stored_list[i:i + chunk_size]
+            start = min(_anchor_date(stored[t]) for t in chunk)
+            fresh = _download_batch(chunk, freq, start=start)
+            for t in chunk:
+                merged = _merge_bars(stored[t], fresh.get(t))
+                if merged is None:
+                    full_needed.append(t)   # re-adjusted history — refetch in full
+                    continue
+                if t in fresh:
+                    save_stored_bars(t, freq, merged, period)
+                _keep(t, merged)
+
+        # ── Full downloads for everything not (usably) stored ─────────────────
+        for i in range(0, len(full_needed), chunk_size):
+            chunk = full_needed[i:i + chunk_size]
+            for t, df in _download_batch(chunk, freq, period=period).items():
+                save_stored_bars(t, freq, df, period)
+                _keep(t, df)
+    finally:
+        for t in claimed:
+            if t not in result:
+                _yf_cache.release(f"{t}_{freq}")
+    for t in elsewhere:
+        bars = _yf_cache.wait(f"{t}_{freq}")
+        if bars is not None:
+            result[t] = bars
+    return result
+
+
+# ── Sector index ──────────────────────────────────────────────────────────────
+# Persistent ticker → (sector ETF, yfinance sector) map. yf.Ticker(t).info is
+# one of the slowest Yahoo endpoints and was hit for every scanned name, with
+# the result thrown away when the session ended. Entries live on disk for
+# SECTOR_INDEX_TTL and are shared by every session and scan in the process.
+SECTOR_INDEX_PATH = os.path.join(CACHE_DIR, "sector_index.json")
+SECTOR_INDEX_TTL  = 30 * 86400   # sectors almost never change
+
+# yfinance sector string → sector ETF
+YF_SECTOR_ETF = {
+    "Technology":             "XLK",
+    "Healthcare":             "XLV",
+    "Financial Services":     "XLF",
+    "Energy":                 "XLE",
+    "Basic Materials":        "XLB",
+    "Industrials":            "XLI",
+    "Communication Services": "XLC",
+    "Consumer Cyclical":      "XLY",
+    "Consumer Defensive":     "XLP",
+    "Utilities":              "XLU",
+    "Real Estate":            "XLRE",
+}
+
+# TradingView sector → yfinance sector, only where the two line up 1:1.
+# The sector string feeds SECTOR_RUN_THRESHOLDS, so ambiguous TV sectors
+# (Finance = banks + REITs, Electronic Technology = semis + defense,
+# Technology Services = software + GOOGL/META, Retail Trade, Consumer
+# Non-Durables, Process Industries…) are left for the yfinance refresh.
+TV_SECTOR_TO_YF = {
+    "Utilities":           "Utilities",
+    "Health Technology":   "Healthcare",
+    "Health Services":     "Healthcare",
+    "Energy Minerals":     "Energy",
+    "Non-Energy Minerals": "Basic Materials",
+    "Communications":      "Communication Services",
+}
+
+
+# Sector ETFs scored against SPY for the sector momentum bonus
+SECTOR_ETF_MAP = {
+    "XLK":  "Technology",
+    "XLV":  "Healthcare",
+    "XLF":  "Financials",
+    "XLE":  "Energy",
+    "XLB":  "Basic Materials",
+    "XLI":  "Industrials",
+    "XLC":  "Communication",
+    "XLY":  "Consumer Cyclical",
+    "XLP":  "Consumer Defensive",
+    "XLU":  "Utilities",
+    "XLRE": "Real Estate",
+    "GDX":  "Gold Miners",
+}
+
+
+# ── Sector returns ────────────────────────────────────────────────────────────
+# Weekly closes for SPY and every SECTOR_ETF_MAP ETF, shared by all sessions
+# and scans in the process and persisted at SECTOR_CLOSES_PATH. When the
+# stored set is older than SECTOR_RETURNS_TTL all 13 series are refreshed in
+# one batched download; callers arriving mid-refresh wait for it instead of
+# starting their own. Relative returns for any lookback come from the same
+# closes. A failed refresh keeps serving the last closes and is retried
+# after SECTOR_RETRY_S.
+SECTOR_CLOSES_PATH = os.path.join(CACHE_DIR, "sector_closes.json")
+SECTOR_RETURNS_TTL = 86400
+SECTOR_RETRY_S     = 300
+SECTOR_LOOKBACKS   = (4, 13, 26, 52)
+_SECTOR_HISTORY    = "2y"   # ≥ 53 weekly bars for the 52W lookback
+
+
+class SectorReturns:
+    def __init__(self, path=SECTOR_CLOSES_PATH, ttl=SECTOR_RETURNS_TTL):
+        self.path      = path
+        self.ttl       = ttl
+        self._lock     = threading.Lock()
+        self._closes   = None   # {ticker: [weekly closes, oldest → newest]}
+        self._fetched  = 0.0
+        self._retry_at = 0.0
+        self.stats     = {"downloads": 0, "failed": 0}
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            self._closes  = saved["closes"]
+            self._fetched = saved["fetched"]
+        except Exception:
+            self._closes = None
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"fetched": self._fetched, "closes": self._closes}, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def _refresh(self):
+        frames = _download_batch(["SPY", *SECTOR_ETF_MAP], "1wk", period=_SECTOR_HISTORY)
+        if "SPY" not in frames:
+            self.stats["failed"] += 1
+            self._retry_at = time.time() + SECTOR_RETRY_S
+            return
+        self.stats["downloads"] += 1
+        self._closes  = {t: [float(x) for x in df["close"].dropna()] for t, df in frames.items()}
+        self._fetched = time.time()
+        self._save()
+
+    def closes(self):
+        """{ticker: weekly closes} — refreshed first if stale. {} if never fetched."""
+        with self._lock:
+            if self._closes is None:
+                self._load()
+            now = time.time()
+            if (self._closes is None or now - self._fetched > self.ttl) and now >= self._retry_at:
+                self._refresh()
+            return self._closes or {}
+
+    def invalidate(self):
+        """Force a refresh on the next call."""
+        with self._lock:
+            self._fetched = 0.0
+            self._retry_at = 0.0
+
+    def relative(self, period_weeks=26):
+        """
+        period_weeks return of each SECTOR_ETF_MAP ETF minus SPY's, in %.
+        Returns {etf: relative_return_pct} — 0 for an ETF without enough
+        history, {} if SPY is unavailable.
+        """
+        closes = self.closes()
+        spy = closes.get("SPY")
+        if not spy:
+            return {}
+
+        def _ret(c):
+            return (c[-1] / c[-period_weeks] - 1) * 100
+
+        spy_ret = _ret(spy) if len(spy) >= period_weeks else 0
+        results = {}
+        for etf in SECTOR_ETF_MAP:
+            c = closes.get(etf) or []
+            results[etf] = round(_ret(c) - spy_ret, 1) if len(c) >= period_weeks else 0
+        return results
+
+    def table(self, lookbacks=SECTOR_LOOKBACKS):
+        """{weeks: {etf: relative_return_pct}} for each lookback, from one set of closes."""
+        return {w: self.relative(w) for w in lookbacks}
+
+
+sector_return_service = SectorReturns()
+
+
+def sector_relative_returns(period_weeks=26):
+    """{etf: relative_return_pct} vs SPY over period_weeks — see SectorReturns."""
+    return sector_return_service.relative(period_weeks)
+
+
+class SectorIndex:
+    """
+    Disk-backed ticker → (etf, sector) index with a TTL.
+    Thread-safe; writes are batched (save() after a refresh, or every
+    25 new entries) and atomic.
+    """
+    def __init__(self, path=SECTOR_INDEX_PATH, ttl=SECTOR_INDEX_TTL):
+        self.path     = path
+        self.ttl      = ttl
+        self._lock    = threading.Lock()
+        self._entries = None
+        self._dirty   = 0
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r") as f:
+                    self._entries = json.load(f)
+            except Exception:
+                self._entries = {}
+
+    def get(self, ticker):
+        """Return (etf, sector) if indexed and not expired, else None."""
+        with self._lock:
+            self._ensure_loaded()
+            e = self._entries.get(ticker)
+        if not e or time.time() - e.get("ts", 0) > self.ttl:
+            return None
+        return (e.get("etf"), e.get("sector", ""))
+
+    def put(self, ticker, etf, sector, source="yfinance"):
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[ticker] = {"etf": etf, "sector": sector,
+                                     "src": source, "ts": time.time()}
+            self._dirty += 1
+            flush = self._dirty >= 25
+        if flush:
+            self.save()
+
+    def seed(self, ticker, etf, sector):
+        """In-memory entry, never persisted — for processes handed lookups by the parent."""
+        with self._lock:
+            self._ensure_loaded()
+            self._entries[ticker] = {"etf": etf, "sector": sector, "src": "seed",
+                                     "ts": time.time()}
+
+    def save(self):
+        """Atomically write the index if anything changed. Best-effort."""
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = 0
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def seed_from_tradingview(self, meta):
+        """
+        Fill missing/expired entries from fetch_tradingview_tickers meta rows.
+        Only unambiguous sectors (TV_SECTOR_TO_YF) are seeded.
+        Returns number of entries added.
+        """
+        added = 0
+        for m in meta or []:
+            t = m.get("ticker")
+            sector = TV_SECTOR_TO_YF.get(m.get("sector") or "")
+            if not t or not sector or self.get(t) is not None:
+                continue
+            self.put(t, YF_SECTOR_ETF.get(sector), sector, source="tradingview")
+            added += 1
+        self.save()
+        return added
+
+    def _fetch(self, ticker):
+        """yfinance .info lookup — caches the result, returns None on failure."""
+        try:
+            yf_rate_limiter.wait()
+            info = yf.Ticker(ticker).info
+            sector = info.get("sector", "")
+            etf = YF_SECTOR_ETF.get(sector, None)
+            self.put(ticker, etf, sector)
+            return (etf, sector)
+        except Exception:
+            return None
+
+    def lookup(self, ticker):
+        """Indexed value, or a single .info fetch on a miss. (None, "") on failure."""
+        hit = self.get(ticker)
+        if hit is not None:
+            return hit
+        return self._fetch(ticker) or (None, "")
+
+    def refresh(self, tickers, workers=8):
+        """Fetch every missing/expired ticker concurrently, then persist once."""
+        misses = [t for t in dict.fromkeys(tickers) if self.get(t) is None]
+        if misses:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                list(pool.map(self._fetch, misses))
+            self.save()
+        return len(misses)
+
+
+sector_index = SectorIndex()
@@ -0,0 +1,201 @@
+import itertools
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+from backtest import KNOWN_SETUPS, get_yf_data_asof
+from scan_engine import (
+    _weekly_verdict, weekly_reductions, check_daily, check_base_breakout, score_setup,
+    score_base_breakout,
+)
+
+# ── Parameter Sweep ───────────────────────────────────────────────────────────
+# Runs the Known Setup Validator over many threshold combinations at once.
+# Every setup's as-of bars (10y weekly, 2y daily — the run_single_backtest
+# windows) are loaded once up front; combinations are then scored in worker
+# processes that receive the frames a single time via the pool initializer.
+# Each worker memoizes check results by the parameters that actually feed
+# them — a retest setup ignores bb_*, check_daily only sees d_* — and the
+# retest window reductions (weekly_reductions) are threshold-free, so each
+# retest combination only re-runs the scalar _weekly_verdict.
+# Outcomes use the validator's own rules (base score, no sector bonus):
+#   caught      score ≥ 60           trap_rejected    trap scoring ≤ 55
+#   close       55 ≤ score < 60      trap_borderline  trap scoring 56–65
+#   missed      score < 55           false_positive   trap scoring > 65
+#   no_data     history too short / unavailable as of the setup date
+
+SWEEP_KEYS = {
+    "retest":        ("w_dist_200sma_lo", "w_dist_200sma_hi", "w_prior_run",
+                      "w_correction", "w_vol_mult"),
+    "base_breakout": ("bb_base_years", "bb_range_pct", "bb_atr_max",
+                      "bb_vol_mult", "bb_sma_lo", "bb_sma_hi"),
+}
+DAILY_KEYS = ("d_atr_pct_min", "d_atr_pct_max", "d_above_50sma")
+OUTCOMES   = ("caught", "close", "missed", "trap_rejected", "trap_borderline",
+              "false_positive", "no_data")
+
+# Spawning a worker costs ~1s (fresh interpreter + pandas import); smaller
+# sweeps finish sooner in-process.
+MIN_POOL_COMBOS = 500
+
+
+def _mode(setup):
+    return "retest" if setup.get("mode", "retest") == "retest" else "base_breakout"
+
+
+def load_cases(setups=KNOWN_SETUPS, mode=None):
+    """As-of weekly / daily frames for each setup (optionally one mode only)."""
+    cases = []
+    for s in setups:
+        if mode and _mode(s) != mode:
+            continue
+        as_of = datetime.strptime(s["date"], "%Y-%m-%d")
+        df_w  = get_yf_data_asof(s["ticker"], as_of, lookback_years=10, freq="1wk")
+        df_d  = get_yf_data_asof(s["ticker"], as_of, lookback_years=2, freq="1d")
+        if df_w is None or len(df_w) < 52 or df_d is None or len(df_d) < 55:
+            df_w = df_d = None
+        cases.append({"label": s["label"], "ticker": s["ticker"], "mode": _mode(s),
+                      "is_trap": s.get("is_trap", False), "weekly": df_w, "daily": df_d})
+    return cases
+
+
+# ── Combination generators ────────────────────────────────────────────────────
+
+def param_grid(spec):
+    """{key: [values]} → every combination (list of dicts)."""
+    keys = list(spec)
+    return [dict(zip(keys, vals)) for vals in itertools.product(*(spec[k] for k in keys))]
+
+
+def param_sample(spec, n, seed=0):
+    """Up to n distinct random combinations drawn from {key: [values]}."""
+    total = 1
+    for k in spec:
+        total *= len(spec[k])
+    if n >= total:
+        return param_grid(spec)
+    rng  = random.Random(seed)
+    seen = set()
+    out  = []
+    while len(out) < n:
+        combo = tuple(rng.choice(spec[k]) for k in spec)
+        if combo not in seen:
+            seen.add(combo)
+            out.append(dict(zip(spec, combo)))
+    return out
+
+
+# ── Worker side ───────────────────────────────────────────────────────────────
+
+_cases = None
+_memo  = {}
+
+
+def _init_worker(cases):
+    global _cases, _memo
+    _cases = cases
+    _memo  = {}
+
+
+def _memoized(key, fn):
+    if key not in _memo:
+        _memo[key] = fn()
+    return _memo[key]
+
+
+def _classify(sc, is_trap):
+    if is_trap:
+        return "trap_rejected" if sc <= 55 else ("trap_borderline" if sc <= 65 else "false_positive")
+    return "caught" if sc >= 60 else ("close" if sc >= 55 else "missed")
+
+
+def evaluate_combo(params):
+    """Score every loaded case under params. Returns (counts, scores)."""
+    p      = params
+    counts = dict.fromkeys(OUTCOMES, 0)
+    scores = []
+    dkey   = tuple(p[k] for k in DAILY_KEYS)
+    for i, c in enumerate(_cases):
+        if c["weekly"] is None:
+            counts["no_data"] += 1
+            scores.append(None)
+            continue
+        mode = c["mode"]
+        wkey = tuple(p[k] for k in SWEEP_KEYS[mode])
+        if mode == "retest":
+            red = _memoized(("r", i), lambda: weekly_reductions(c["weekly"]))
+            w = _memoized(("w", i, wkey), lambda: _weekly_verdict(
+                *red, p["w_dist_200sma_lo"], p["w_dist_200sma_hi"], p["w_prior_run"],
+                p["w_correction"], p["w_vol_mult"], None))
+        else:
+            w = _memoized(("b", i, wkey), lambda: check_base_breakout(
+                c["weekly"], p["bb_base_years"], p["bb_range_pct"], p["bb_atr_max"],
+                p["bb_vol_mult"], p["bb_sma_lo"], p["bb_sma_hi"]))
+        d = _memoized(("d", i, dkey), lambda: check_daily(
+            c["daily"], p["d_atr_pct_min"], p["d_atr_pct_max"], p["d_above_50sma"]))
+        sc = _memoized(("s", i, wkey, dkey), lambda: (
+            score_setup(w[1], d[1]) if mode == "retest" else score_base_breakout(w[1], d[1])))
+        counts[_classify(sc, c["is_trap"])] += 1
+        scores.append(sc)
+    return counts, scores
+
+
+def _evaluate_chunk(chunk):
+    return [evaluate_combo(p) for p in chunk]
+
+
+# ── Driver ────────────────────────────────────────────────────────────────────
+
+def run_sweep(combos, base_params, cases=None, mode=None, workers=None, progress=None):
+    """
+    Validate every combination. combos: list of partial param dicts (from
+    param_grid / param_sample) layered over base_params (the sidebar values —
+    must hold every SWEEP_KEYS / DAILY_KEYS key). cases: from load_cases(),
+    loaded here if None. workers: processes (default CPU count, or in-process
+    below MIN_POOL_COMBOS combinations; 1 = in-process).
+    progress(done, total) after each finished chunk.
+    Returns a DataFrame, one row per combination — the swept values, outcome
+    counts, "robust" (caught + trap_rejected) and per-setup scores — best first.
+    """
+    if cases is None:
+        cases = load_cases(mode=mode)
+    full    = [dict(base_params, **c) for c in combos]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(full) >= MIN_POOL_COMBOS else 1
+    workers = max(1, min(workers, len(full)))
+    size    = max(1, len(full) // (workers * 4))
+    chunks  = [full[i:i + size] for i in range(0, len(full), size)]
+    results = []
+    if workers == 1:
+        _init_worker(cases)
+        for ch in chunks:
+            results += _evaluate_chunk(ch)
+            if progress:
+                progress(len(results), len(full))
+    else:
+        # spawn, not fork — the caller may be a threaded Streamlit server
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init_worker,
+                                 initargs=(cases,)) as pool:
+            for out in pool.map(_evaluate_chunk, chunks):
+                results += out
+                if progress:
+                    progress(len(results), len(full))
+
+    swept = list(dict.fromkeys(k for c in combos for k in c))
+    rows  = []
+    for combo, (counts, scores) in zip(full, results):
+        row = {k: combo[k] for k in swept}
+        row.update(counts)
+        row["robust"] = counts["caught"] + counts["trap_rejected"]
+        row.update({c["label"]: sc for c, sc in zip(cases, scores)})
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    return df.sort_values(["robust", "false_positive", "close"],
+                          ascending=[False, True, False], kind="stable").reset_index(drop=True)
@@ -0,0 +1,354 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows — rebuilds there are only serialised within a process
+    fcntl = None
+
+import numpy as np
+
+from market_calendar import is_fresh
+from market_data import (
+    Bars, CACHE_DIR, BAR_STORE_DIR, _yf_cache, _read_store_meta, _store_covers, as_bars,
+    load_stored_bars, period_cutoff,
+)
+
+# ── Universe Price Matrix ─────────────────────────────────────────────────────
+# A cold process (container restart, new Streamlit server) otherwise starts a
+# scan by parsing one Parquet file per ticker. build_price_matrix() packs a
+# universe's bars for one frequency into a few aligned .npy files:
+#   {MATRIX_DIR}/1wk.json                     index: tickers, period, built, files
+#   {MATRIX_DIR}/1wk/dates.<id>.npy           (D,)      datetime64[ns] — union of bar dates
+#   {MATRIX_DIR}/1wk/prices.<id>.npy          (4, T, D) float32 — open, high, low, close
+#   {MATRIX_DIR}/1wk/volume.<id>.npy          (T, D)    int64, -1 = missing
+#   {MATRIX_DIR}/1wk/present.<id>.npy         (T, D)    bool — ticker has a bar that date
+#   {MATRIX_DIR}/1wk/spans.<id>.npy           (T, 2)    int64 — first / one-past-last column
+#   {MATRIX_DIR}/1wk/stamps.<id>.npy          (T,)      float64 — when the bars were last refreshed
+# open_price_matrix() maps them read-only with np.load(mmap_mode="r"), so
+# opening costs a JSON read whatever the universe size, and PriceMatrix.bars()
+# returns Bars over views of the mapped rows — pages are read on first touch.
+# A rebuild writes files under a new <id> and swaps the index atomically;
+# processes still mapping the old files keep them until they let go.
+# Rebuilds of one frequency are serialised across processes by an flock on
+# {MATRIX_DIR}/1wk.lock (two sessions finishing scans, or the CLI next to
+# the app), and each removes only the files of the build its index swap
+# replaced.
+# warm_cache() drops a matrix's bars straight into _yf_cache for tickers whose
+# stamp is within MATRIX_MAX_AGE or that the trading calendar says are still
+# current (market_calendar.is_fresh — e.g. any weekend rerun of Friday's
+# evening build); other rows are left to the normal bar-store / Yahoo refresh.
+# Stamps follow the bars, not the build: bars a scan fetched this process are
+# stamped at build time, bar-store bars with their sidecar's "updated", and
+# bars warm_cache itself supplied (or a rebuild reused from the previous
+# matrix) keep their original stamp. rebuild_after_scan() merges the scanned
+# tickers into the matrix's existing rows rather than replacing them.
+
+MATRIX_DIR     = os.path.join(CACHE_DIR, "matrix")
+MATRIX_VERSION = 1
+MATRIX_MAX_AGE = float(os.environ.get("SCANNER_MATRIX_MAX_AGE", 3600))
+
+_PRICE_ROWS = ("open", "high", "low", "close")
+
+
+def _index_path(freq, path):
+    return os.path.join(path, f"{freq}.json")
+
+
+_warmed = {}   # _yf_cache key → (Bars, stamp) for entries warm_cache supplied
+# Pruned as entries leave the cache, so evicted bars (and the old build's
+# mmaps behind them) aren't kept alive here
+_yf_cache.on_drop(lambda key: _warmed.pop(key, None))
+
+
+def _source_bars(ticker, freq, period, matrix=None):
+    """
+    (bars trimmed to period, refresh stamp) — in-memory bars if this process
+    loaded them, else the current matrix's row unless the bar store has
+    newer bars, else the bar store. (None, 0) if there are none.
+    """
+    key = f"{ticker}_{freq}"
+    b   = _yf_cache.peek(key)
+    if b is not None:
+        w = _warmed.get(key)
+        stamp = w[1] if w is not None and w[0] is b else time.time()
+    else:
+        stamp = (_read_store_meta(ticker, freq) or {}).get("updated", 0)
+        if matrix is not None and ticker in matrix and matrix.stamp(ticker) >= stamp:
+            b, stamp = matrix.bars(ticker), matrix.stamp(ticker)   # mapped rows — no Parquet parse
+        else:
+            b = as_bars(load_stored_bars(ticker, freq))
+    if b is None or len(b) == 0:
+        return None, 0
+    b = as_bars(b)
+    cutoff = period_cutoff(period)
+    if cutoff is not None:
+        b = b.iloc[int(np.searchsorted(b.date, cutoff.to_datetime64())):]
+    return (b, stamp) if len(b) else (None, 0)
+
+
+_build_locks = {}   # (path, freq) → threading.Lock — flock alone doesn't cover Windows
+_build_guard = threading.Lock()
+
+
+@contextmanager
+def _build_lock(freq, path):
+    with _build_guard:
+        local = _build_locks.setdefault((path, freq), threading.Lock())
+    with local:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, f"{freq}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _index_id(freq, path):
+    try:
+        with open(_index_path(freq, path)) as f:
+            return json.load(f).get("id")
+    except Exception:
+        return None
+
+
+def build_price_matrix(freq, tickers=None, period="max", path=MATRIX_DIR, merge=False):
+    """
+    Pack bars for tickers (default: every ticker in the bar store for freq)
+    into the matrix for freq. period: what the packed bars cover — warm_cache
+    only serves requests for that period or shorter. merge: keep every
+    ticker the current matrix already packs as well (its rows are reused
+    unless fresher bars are in memory or the bar store). Returns the number
+    of tickers packed (0 = nothing written).
+    """
+    if tickers is None:
+        try:
+            tickers = sorted(f[:-len(".parquet")] for f in os.listdir(os.path.join(BAR_STORE_DIR, freq))
+                             if f.endswith(".parquet"))
+        except OSError:
+            tickers = []
+    with _build_lock(freq, path):
+        # Read under the lock so overlapping merges each see the other's tickers
+        current = open_price_matrix(freq, path)
+        if current is not None and not current.covers(period):
+            current = None
+        names = list(tickers)
+        if merge and current is not None:
+            names = current.tickers + names
+        series = {}
+        for t in dict.fromkeys(names):
+            b, stamp = _source_bars(t, freq, period, current)
+            if b is not None:
+                series[t] = (b, stamp)
+        if not series:
+            return 0
+        return _write_matrix(series, freq, period, path)
+
+
+def _write_matrix(series, freq, period, path):
+    """Pack series ({ticker: (Bars, stamp)}) and swap the index. Caller holds _build_lock."""
+    names = list(series)
+    dates = np.unique(np.concatenate([series[t][0].date for t in names]))
+    T, D  = len(names), len(dates)
+    build_id = uuid.uuid4().hex[:8]
+    folder   = os.path.join(path, freq)
+    os.makedirs(folder, exist_ok=True)
+
+    def _out(name, dtype, shape, fill):
+        a = np.lib.format.open_memmap(os.path.join(folder, f"{name}.{build_id}.npy"),
+                                      mode="w+", dtype=dtype, shape=shape)
+        a[...] = fill
+        return a
+
+    prices  = _out("prices", np.float32, (4, T, D), np.nan)
+    volume  = _out("volume", np.int64, (T, D), -1)
+    present = _out("present", np.bool_, (T, D), False)
+    spans   = _out("spans", np.int64, (T, 2), 0)
+    stamps  = _out("stamps", np.float64, (T,), 0)
+    for i, t in enumerate(names):
+        b, stamps[i] = series[t]
+        pos = np.searchsorted(dates, b.date)
+        for r, field in enumerate(_PRICE_ROWS):
+            prices[r, i, pos] = getattr(b, field)
+        v = np.asarray(b.volume, dtype=np.float64)
+        volume[i, pos]  = np.where(np.isnan(v), -1, v).astype(np.int64)
+        present[i, pos] = True
+        spans[i]        = (pos[0], pos[-1] + 1)
+    for a in (prices, volume, present, spans, stamps):
+        a.flush()
+    del prices, volume, present, spans, stamps
+    np.save(os.path.join(folder, f"dates.{build_id}.npy"), dates)
+
+    index = {
+        "v":       MATRIX_VERSION,
+        "freq":    freq,
+        "period":  period,
+        "built":   time.time(),
+        "id":      build_id,
+        "tickers": names,
+        "dates":   D,
+    }
+    ipath    = _index_path(freq, path)
+    tmp      = f"{ipath}.{os.getpid()}.tmp"
+    previous = _index_id(freq, path)
+    with open(tmp, "w") as f:
+        json.dump(index, f)
+    os.replace(tmp, ipath)
+
+    # The build this swap replaced — mapped copies stay valid until their
+    # readers close
+    for f in os.listdir(folder):
+        if f.endswith(".npy") and previous and f.split(".")[-2] == previous:
+            try:
+                os.remove(os.path.join(folder, f))
+            except OSError:
+                pass
+    return T
+
+
+class PriceMatrix:
+    """Read side of one frequency's matrix. Cheap to open; rows are mapped views."""
+    def __init__(self, index, folder):
+        bid          = index["id"]
+        self.freq    = index["freq"]
+        self.period  = index["period"]
+        self.built   = index["built"]
+        self.tickers = index["tickers"]
+        self._row    = {t: i for i, t in enumerate(self.tickers)}
+        load = lambda name: np.load(os.path.join(folder, f"{name}.{bid}.npy"), mmap_mode="r")
+        self.dates   = load("dates")
+        self.prices  = load("prices")
+        self.volume  = load("volume")
+        self.present = load("present")
+        self.spans   = load("spans")
+        self.stamps  = load("stamps")
+
+    def __contains__(self, ticker):
+        return ticker in self._row
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def covers(self, period):
+        return _store_covers({"period": self.period}, period)
+
+    def stamp(self, ticker):
+        """When ticker's bars were refreshed (0 if not packed)."""
+        i = self._row.get(ticker)
+        return 0.0 if i is None else float(self.stamps[i])
+
+    def age(self, ticker):
+        """Seconds since ticker's bars were refreshed (inf if not packed)."""
+        i = self._row.get(ticker)
+        return float("inf") if i is None else time.time() - float(self.stamps[i])
+
+    def bars(self, ticker, period=None):
+        """Bars for ticker (trimmed to period), or None if not packed."""
+        i = self._row.get(ticker)
+        if i is None:
+            return None
+        lo, hi = (int(x) for x in self.spans[i])
+        cutoff = period_cutoff(period)
+        if cutoff is not None:
+            lo = max(lo, int(np.searchsorted(self.dates, cutoff.to_datetime64())))
+        if lo >= hi:
+            return None
+        sel = slice(lo, hi)
+        has = self.present[i, sel]
+        if not has.all():
+            # Dates other tickers trade on but this one doesn't — gather (copies)
+            sel = np.flatnonzero(has) + lo
+        v = self.volume[i, sel]
+        if (v < 0).any():
+            v = np.where(v < 0, np.nan, v)
+        return Bars._wrap([self.dates[sel], *(self.prices[r, i, sel] for r in range(4)), v])
+
+
+def open_price_matrix(freq, path=MATRIX_DIR, attempts=3):
+    """Map freq's matrix. None if there is none (or it is unreadable)."""
+    for _ in range(attempts):
+        try:
+            with open(_index_path(freq, path)) as f:
+                index = json.load(f)
+            if index.get("v") != MATRIX_VERSION:
+                return None
+            return PriceMatrix(index, os.path.join(path, freq))
+        except FileNotFoundError:
+            continue   # a rebuild swapped the index and removed these files — re-read it
+        except Exception:
+            return None
+    return None
+
+
+_open_lock     = threading.Lock()
+_open_matrices = {}   # (path, freq) → (index mtime, PriceMatrix or None)
+
+
+def get_price_matrix(freq, path=MATRIX_DIR):
+    """Process-wide open matrix for freq, re-mapped when a rebuild lands."""
+    try:
+        mtime = os.path.getmtime(_index_path(freq, path))
+    except OSError:
+        return None
+    with _open_lock:
+        hit = _open_matrices.get((path, freq))
+        if hit is None or hit[0] != mtime:
+            hit = (mtime, open_price_matrix(freq, path))
+            _open_matrices[(path, freq)] = hit
+        return hit[1]
+
+
+def warm_cache(tickers, freq, period, max_age=MATRIX_MAX_AGE, path=MATRIX_DIR):
+    """
+    Put the matrix's bars for tickers into _yf_cache where they were
+    refreshed within max_age or are still current by the trading calendar
+    (entries already cached are left alone).
+    Returns how many were added.
+    """
+    m = get_price_matrix(freq, path)
+    if m is None or not m.covers(period):
+        return 0
+    added = 0
+    for t in tickers:
+        key = f"{t}_{freq}"
+        if key in _yf_cache or (m.age(t) > max_age and not is_fresh(m.stamp(t))):
+            continue
+        b = m.bars(t, period)
+        if b is not None:
+            _warmed[key]   = (b, m.stamp(t))   # before the store — on_drop may prune it at once
+            _yf_cache[key] = b
+            added += 1
+    return added
+
+
+def rebuild_after_scan(tickers):
+    """
+    Repack the weekly and daily matrices on a daemon thread — the rows they
+    already hold plus a finished scan's universe, so a small watchlist scan
+    doesn't shrink an all-US matrix. Scanned bars come from _yf_cache, the
+    rest from the mapped rows, so it is mostly memory copies. Best-effort.
+    """
+    def _run():
+        for freq, period in (("1wk", "max"), ("1d", "1y")):
+            try:
+                build_price_matrix(freq, list(tickers), period, merge=True)
+            except Exception:
+                pass
+    threading.Thread(target=_run, name="price-matrix", daemon=True).start()
+
+
+if __name__ == "__main__":
+    # Build step: python price_matrix.py [1wk 1d] — packs the whole bar store
+    import sys
+    for freq in sys.argv[1:] or ["1wk", "1d"]:
+        t0 = time.perf_counter()
+        n  = build_price_matrix(freq, period="max" if freq == "1wk" else "1y")
+        print(f"{freq}: {n} tickers packed in {time.perf_counter() - t0:.1f}s → {MATRIX_DIR}")
@@ -0,0 +1,175 @@
+"""
+Headless scan — the Scanner tab's pipeline without Streamlit, for cron jobs
+and off-peak precomputation.
+
+    python scan_cli.py UNIVERSE [--mode retest|base] [--config thresholds.json]
+                       [--out results.csv|.parquet|.json] [--min-score 60] [--all]
+                       [--workers 8] [--processes 0] [--fetch threaded|serial|cached]
+                       [--weekly batch|serial] [--rate 8] [--journal [PATH]]
+
+UNIVERSE: text file of tickers (one per line or comma separated, # comments)
+or a CSV with a ticker / symbol column; "-" reads stdin.
+--config: JSON of threshold overrides — the _scan_params keys (w_*, bb_*,
+d_*, min_price); anything not given keeps the sidebar default for --mode.
+Runs the scan_pipeline stages (prefilter → fetch → weekly → daily →
+structure → sector → score; --fetch / --weekly pick stage variants,
+--processes swaps in ScanExecutor's worker processes) and writes the hits at
+or above --min-score (every scored ticker with --all). .json keeps
+the nested hit dicts; .csv / .parquet flatten wr / dr / rr into "wr.<key>"
+columns. --journal writes a completed scan journal (default: the app's
+JOURNAL_PATH), which the UI restores on its next session as the last scan.
+Prints a timing summary with per-stage seconds; exit status 1 if nothing
+could be scored.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+from market_data import sector_relative_returns, yf_rate_limiter
+from scan_journal import JOURNAL_PATH, ScanJournal
+from scan_pipeline import CallbackSink, CollectSink, JournalSink, build_pipeline, write_results
+
+# Sidebar defaults per mode (app.py)
+RETEST_DEFAULTS = {
+    "is_retest": True, "min_price": 5,
+    "w_dist_200sma_lo": 60, "w_dist_200sma_hi": 80, "w_prior_run": 300,
+    "w_correction": 35, "w_vol_mult": 1.2,
+    "bb_base_years": 2, "bb_range_pct": 60, "bb_atr_max": 4.0,
+    "bb_vol_mult": 1.5, "bb_sma_lo": 10, "bb_sma_hi": 40,
+    "d_atr_pct_min": 3.0, "d_atr_pct_max": 12.0, "d_above_50sma": 10,
+}
+BASE_DEFAULTS = dict(RETEST_DEFAULTS, **{
+    "is_retest": False, "bb_vol_mult": 2.0,
+    "d_atr_pct_min": 2.0, "d_atr_pct_max": 8.0, "d_above_50sma": 20,
+})
+
+
+# ── Inputs ────────────────────────────────────────────────────────────────────
+
+def load_universe(path):
+    """Ticker list from a text / CSV file ("-" = stdin), upper-cased, de-duplicated."""
+    text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8").read()
+    lines = [ln.split("#", 1)[0].strip() for ln in text.splitlines()]
+    lines = [ln for ln in lines if ln]
+    if lines:
+        head = [c.strip().lower() for c in lines[0].split(",")]
+        col  = next((head.index(k) for k in ("ticker", "symbol") if k in head), None)
+        if col is not None:
+            rows = csv.reader(io.StringIO("\n".join(lines[1:])))
+            return list(dict.fromkeys(r[col].strip().upper() for r in rows
+                                      if len(r) > col and r[col].strip()))
+    tickers = [t.strip().upper() for ln in lines for t in ln.split(",")]
+    return list(dict.fromkeys(t for t in tickers if t))
+
+
+def load_params(mode, config=None):
+    """Sidebar defaults for mode with the JSON config's overrides applied."""
+    params = dict(RETEST_DEFAULTS if mode == "retest" else BASE_DEFAULTS)
+    if config:
+        with open(config, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = sorted(set(overrides) - set(params) - {"is_retest"})
+        if unknown:
+            raise SystemExit(f"unknown threshold keys in {config}: {', '.join(unknown)}")
+        overrides.pop("is_retest", None)   # --mode decides
+        params.update(overrides)
+    return params
+
+
+# ── Scan ──────────────────────────────────────────────────────────────────────
+
+def run_scan(universe, params, sector_returns, min_score=60, keep_all=False,
+             workers=8, processes=0, journal=None, progress=None, fetch="threaded",
+             weekly="batch"):
+    """
+    Score every ticker through scan_pipeline. Returns (hits, counts, timings) —
+    hits sorted best first; counts: scanned, scored, hits, no_data,
+    below_price, skipped; timings: ScanPipeline.timings().
+    journal: optional ScanJournal (already started) fed the same records
+    the Scanner tab writes, and completed when the scan finishes.
+    progress(i, total, ticker) after each ticker.
+    """
+    pipeline = build_pipeline(params, sector_returns, workers=workers, processes=processes,
+                              fetch=fetch, weekly=weekly)
+    collect  = CollectSink(min_score, params["min_price"], keep_all)
+    sinks    = [collect]
+    if journal:
+        sinks.append(JournalSink(journal, min_score, params["min_price"]))
+    if progress:
+        sinks.append(CallbackSink(lambda rec: progress(rec["i"], len(universe), rec["ticker"])))
+    pipeline.drain(universe, sinks)
+    return collect.sorted_hits(), collect.counts, pipeline.timings()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("universe", help="ticker file (text or CSV), - for stdin")
+    ap.add_argument("--mode",      choices=("retest", "base"), default="retest")
+    ap.add_argument("--config",    help="JSON threshold overrides")
+    ap.add_argument("--out",       default="scan_results.csv", help=".csv / .parquet / .json")
+    ap.add_argument("--min-score", type=float, default=60, help="raw score cut-off (Min score to display)")
+    ap.add_argument("--all",       action="store_true", help="write every scored ticker")
+    ap.add_argument("--workers",   type=int, default=8, help="fetch / evaluate threads")
+    ap.add_argument("--processes", type=int, default=0, help="worker processes for the checks")
+    ap.add_argument("--fetch",     choices=("threaded", "serial", "cached"), default="threaded",
+                    help="fetch stage (cached = no network: memory / price matrix / bar store)")
+    ap.add_argument("--weekly",    choices=("batch", "serial"), default="batch",
+                    help="weekly check stage (batch: less CPU, results arrive per chunk)")
+    ap.add_argument("--rate",      type=float, default=8, help="max Yahoo requests / sec")
+    ap.add_argument("--journal",   nargs="?", const=JOURNAL_PATH, default=None,
+                    help=f"also write a scan journal the UI restores (default {JOURNAL_PATH})")
+    ap.add_argument("--quiet",     action="store_true")
+    a = ap.parse_args(argv)
+
+    t_start  = time.perf_counter()
+    universe = load_universe(a.universe)
+    params   = load_params(a.mode, a.config)
+    if not universe:
+        raise SystemExit("empty universe")
+    yf_rate_limiter.set_rate(a.rate)
+
+    t0 = time.perf_counter()
+    sector_returns = sector_relative_returns(26)
+    t_sector = time.perf_counter() - t0
+
+    journal = None
+    if a.journal:
+        journal = ScanJournal(a.journal)
+        journal.start(universe=universe, total=len(universe), sector_returns=sector_returns,
+                      watchlist={}, mode=a.mode, scan_ts=datetime.now().strftime("%Y-%m-%d %H:%M"),
+                      params=params, min_display=a.min_score)
+
+    def progress(i, total, ticker):
+        if not a.quiet and ((i + 1) % 50 == 0 or i + 1 == total):
+            el = time.perf_counter() - t0
+            print(f"  {i + 1}/{total}  {el:7.1f}s  {(i + 1) / el:6.1f} tickers/s", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    hits, counts, timings = run_scan(universe, params, sector_returns, a.min_score, a.all,
+                                     a.workers, a.processes, journal, progress, a.fetch, a.weekly)
+    t_scan = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    write_results(hits, a.out)
+    t_write = time.perf_counter() - t0
+
+    total = time.perf_counter() - t_start
+    print(f"{a.mode} scan: {counts['scanned']} tickers · {counts['scored']} scored · "
+          f"{counts['hits']} ≥ {a.min_score:g} · {counts['no_data']} no data · "
+          f"{counts['below_price']} below ${params['min_price']} · {counts['skipped']} skipped")
+    print(f"  sector returns {t_sector:7.2f}s")
+    print(f"  scan           {t_scan:7.2f}s  "
+          f"({counts['scanned'] / t_scan if t_scan else 0:.1f} tickers/s)")
+    for name, items, secs in timings:
+        print(f"    {name:12s} {secs:7.2f}s  {items:6d} items")
+    print(f"  write          {t_write:7.2f}s  → {a.out} ({len(hits)} rows)")
+    print(f"  total          {total:7.2f}s")
+    return 0 if counts["scored"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1278 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from market_data import as_bars, get_yf_data, get_yf_data_batch, sector_index, YF_BATCH_SIZE
+from indicators import calc_sma, calc_ema, calc_atr_pct, weekly_indicators
+from price_matrix import warm_cache
+
+# ── Scan Engine ───────────────────────────────────────────────────────────────
+# The per-ticker pipeline: weekly fetch → check_weekly / check_base_breakout →
+# daily fetch → check_daily → check_recovery_structure → score_sector → score.
+# Nothing in here touches st.* — worker threads have no Streamlit script
+# context, so the UI (app.py) only ever consumes the plain result dicts.
+
+# ── Sector lookup ─────────────────────────────────────────────────────────────
+
+def get_stock_sector_etf(ticker):
+    """Map a stock to its sector ETF via the persistent sector index (yfinance info on a miss)."""
+    return sector_index.lookup(ticker)
+
+def score_sector(ticker, sector_returns):
+    """
+    Return (bonus_pts, sector_name, relative_return).
+    +10 pts if sector >+15% vs SPY over 26W
+    +5  pts if sector +5% to +15%
+     0  pts if sector -5% to +5%
+    -5  pts if sector underperforming
+    """
+    etf, sector_name = get_stock_sector_etf(ticker)
+    if etf is None or etf not in sector_returns:
+        return 0, sector_name or "Unknown", None
+    rel = sector_returns[etf]
+    if rel >= 15:
+        pts = 10
+    elif rel >= 5:
+        pts = 5
+    elif rel >= -5:
+        pts = 0
+    else:
+        pts = -5
+    return pts, sector_name, rel
+
+# Sector-aware prior run thresholds
+# Cyclical/commodity sectors have full cycles at 100-150%
+# Growth sectors need 300%+ to signal a genuine institutional run
+SECTOR_RUN_THRESHOLDS = {
+    "Energy":             150,
+    "Materials":          150,
+    "Industrials":        200,
+    "Utilities":          120,
+    "Real Estate":        120,
+    "Financials":         200,
+    "Consumer Staples":   150,
+    "Consumer Discretionary": 250,
+    "Health Care":        250,
+    "Communication Services": 300,
+    "Technology":         300,
+    "Unknown":            300,  # conservative default
+}
+
+def get_sector_run_threshold(ticker):
+    """Return the min prior run % for this stock's sector."""
+    _, sector = get_stock_sector_etf(ticker)
+    return SECTOR_RUN_THRESHOLDS.get(sector, 300)
+
+# Known ADR tickers — common foreign names trading as ADRs on US exchanges
+# Used to switch from absolute volume floor to relative volume check
+_KNOWN_ADRS = {
+    "BHP", "RIO", "VALE", "SID", "PBR", "CX", "BABA", "JD", "NIO", "XPEV",
+    "LI", "BIDU", "TME", "BILI", "IQ", "WB", "GRAB", "SE", "SHOP", "ASML",
+    "TSM", "UMC", "SNY", "AZN", "NVS", "RHHBY", "BAYRY", "SAP", "SIEGY",
+    "TM", "HMC", "SONY", "SAN", "BBVA", "IBN", "HDB", "INFY", "WIT",
+    "BP", "SHEL", "TOT", "E", "ENI", "EQNR", "STO",
+}
+
+def is_adr(ticker):
+    return ticker.upper() in _KNOWN_ADRS
+
+
+# ── Indicators & Checks ───────────────────────────────────────────────────────
+
+def check_weekly(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult, ticker=None,
+                 ind=None):
+    """
+    Weekly retest criteria.
+    ticker: if provided, uses sector-aware run threshold (commodities need less
+    prior run than tech to be considered a genuine institutional cycle).
+    ind: optional indicators.weekly_indicators() view — SMA200 tail and ATH/ATL
+    come from the persisted state instead of a pass over the full history.
+    Computes the raw window reductions (weekly_reductions); _weekly_verdict
+    turns them into the wr dict (shared with check_weekly_batch).
+    """
+    if len(df_w) < 52:
+        return False, {"error": "short"}
+    return _weekly_verdict(
+        *weekly_reductions(df_w, ticker=ticker, ind=ind), w_dist_200sma_lo, w_dist_200sma_hi,
+        w_prior_run, w_correction, w_vol_mult, ticker)
+
+
+def weekly_reductions(df_w, ticker=None, ind=None):
+    """
+    Threshold-free half of check_weekly (df_w must have ≥52 rows): the
+    window reductions, in _weekly_verdict's positional order. Callers that
+    try many thresholds on one frame (param_sweep) compute this once.
+    """
+    closes = df_w["close"]; vols = df_w["volume"]
+
+    if ind is not None:
+        sma200_series = pd.Series(ind["sma200"])   # last 9 values only
+    else:
+        sma200_series = calc_sma(closes, min(200, len(closes) - 1))
+    sma200 = sma200_series.iloc[-1]
+    cur    = closes.iloc[-1]
+
+    # ── ATH: full history ending 8 weeks ago ─────────────────────────────────
+    # Uses ALL available history (not just 4yr) so long-cycle stocks like LITE
+    # (IPO 2013, ATH $391 in 2021) get their real ATH captured.
+    # Ends 8 weeks ago to avoid counting the current rally as the ATH.
+    if ind is not None:
+        ath, atl = ind["ath"], ind["atl"]
+    else:
+        win_end   = max(0, len(closes) - 8)
+        ath_w     = closes.iloc[:win_end]
+        ath       = ath_w.max() if len(ath_w) > 0 else closes.iloc[0]
+        atl       = ath_w.min() if len(ath_w) > 0 else closes.iloc[0]
+
+    # ── Volume: best of 4W rolling OR peak single week in last 12W ────────────
+    # Catches both sustained accumulation AND a single explosive volume week.
+    avg_vol_20w = vols.rolling(20).mean().iloc[-1]
+    avg_vol_4w  = vols.rolling(4).mean().iloc[-1]
+    peak_12w    = vols.iloc[-12:].max() if len(vols) >= 12 else vols.max()
+
+    # ── FIX 5: ADR relative volume ───────────────────────────────────────────
+    # ADRs have structurally lower absolute share volume than domestic names.
+    # For ADRs, measure vol vs own 52W history rather than absolute level.
+    # This prevents BHP/ASML/TSM being filtered for "low volume" unfairly.
+    adr_flag = is_adr(ticker) if ticker else False
+    if adr_flag and avg_vol_20w > 0:
+        # Vol rank: where does recent 4W sit in its own 52W distribution?
+        vol_52w = vols.iloc[-52:] if len(vols) >= 52 else vols
+        vol_pct_rank = (avg_vol_4w > vol_52w).mean() * 100  # percentile
+    else:
+        vol_pct_rank = None
+
+    # ── FIX 3: Multi-year volume high ──────────────────────────────────────────
+    # Is the recent volume surge the highest in 3 years (156 weeks)?
+    # This is a different magnitude of signal to a ratio — it means institutions
+    # entered at a scale not seen since the last major cycle.
+    vol_lookback = min(156, len(vols) - 1)
+    hist_vol_max = vols.iloc[-vol_lookback:-1].max() if vol_lookback > 1 else 0
+
+    # ── FIX 2: Undercut and reclaim of 200W SMA ──────────────────────────────
+    # Look back 8 weeks for any week where:
+    #   weekly low < 200W SMA AND weekly close > 200W SMA
+    # This is the capitulation wick pattern — stronger than a clean touch.
+    # The false breakdown flushes weak holders and traps short sellers.
+    lows_w  = df_w["low"]
+    undercut_reclaim_weeks_ago = None
+    lookback_uc = min(8, len(closes) - 1)
+    for _i in range(1, lookback_uc + 1):
+        _sma = sma200_series.iloc[-_i] if len(closes) >= _i else sma200
+        _lo  = lows_w.iloc[-_i]
+        _cl  = closes.iloc[-_i]
+        if _lo < _sma and _cl > _sma:
+            undercut_reclaim_weeks_ago = _i
+            break
+
+    # ── 200W SMA points for the slope grade ──────────────────────────────────
+    if len(closes) >= 10:
+        sma_now = sma200_series.iloc[-1]
+        sma_5w  = sma200_series.iloc[-5]
+        sma_10w = sma200_series.iloc[-9]   # start of prior 5W window
+    else:
+        sma_now = sma_5w = sma_10w = None
+
+    # ── FIX 4: Resistance window 26W to 52W ago (roughly 6-12 months back) ────
+    prior_resistance = None
+    if len(closes) >= 52:
+        res_window = closes.iloc[-52:-26]
+        if len(res_window) > 0:
+            prior_resistance = res_window.max()
+
+    return (cur, sma200, ath, atl, avg_vol_20w, avg_vol_4w, peak_12w, vol_pct_rank,
+            hist_vol_max, undercut_reclaim_weeks_ago, sma_now, sma_5w, sma_10w,
+            prior_resistance)
+
+
+def _weekly_verdict(cur, sma200, ath, atl, avg_vol_20w, avg_vol_4w, peak_12w, vol_pct_rank,
+                    hist_vol_max, undercut_reclaim_weeks_ago, sma_now, sma_5w, sma_10w,
+                    prior_resistance, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run,
+                    w_correction, w_vol_mult, ticker):
+    """
+    Scalar half of check_weekly: window reductions in → (passed, wr) out.
+    vol_pct_rank is None unless the ticker is an ADR with volume history;
+    sma_now/5w/10w are None when the SMA series is shorter than 10 bars.
+    """
+    res = {}
+    dist = (cur - sma200) / sma200 * 100
+    run  = (ath - atl) / atl * 100  if atl > 0 else 0
+    corr = (ath - cur) / ath * 100  if ath > cur else 0  # 0 if price > ATH (breakout)
+
+    # Sector-aware run threshold — commodity/cyclical cycles are smaller than tech
+    if ticker:
+        sector_run_min = get_sector_run_threshold(ticker)
+        effective_run_min = min(w_prior_run, sector_run_min)
+    else:
+        effective_run_min = w_prior_run
+
+    vr_rolling  = avg_vol_4w  / avg_vol_20w if avg_vol_20w > 0 else 0
+    vr_peak     = peak_12w    / avg_vol_20w if avg_vol_20w > 0 else 0
+    vr          = max(vr_rolling, vr_peak)
+
+    adr_flag = vol_pct_rank is not None
+    if adr_flag:
+        # Override vr with percentile-based equivalent if ADR
+        # 80th percentile → treat as 1.5× (good), 95th → 2.5× (strong)
+        if vol_pct_rank >= 95:
+            vr = max(vr, 2.5)
+        elif vol_pct_rank >= 80:
+            vr = max(vr, 1.5)
+        elif vol_pct_rank >= 60:
+            vr = max(vr, 1.2)
+
+    recent_peak  = peak_12w
+    multiyear_vol_high = recent_peak >= hist_vol_max * 0.95  # within 5% of 3yr high
+    vol_rank_pct = (recent_peak / hist_vol_max * 100) if hist_vol_max > 0 else 0
+
+    undercut_reclaim = undercut_reclaim_weeks_ago is not None
+
+    # ── 200W SMA Slope — graded, normalised, with deceleration check ────────────
+    # Raw slope is dollar-denominated and not comparable across price levels.
+    # Normalised slope = (sma[-1] - sma[-5]) / sma[-5] * 100  (% change over 5W)
+    # Acceleration = difference in 5W slope between two consecutive 5W windows.
+    # Positive acceleration = slope is improving (less negative or more positive).
+    if sma_now is not None:
+        slope_now = (sma_now  - sma_5w)  / sma_5w  * 100 if sma_5w  > 0 else 0
+        slope_5w  = (sma_5w   - sma_10w) / sma_10w * 100 if sma_10w > 0 else 0
+        slope_accel = slope_now - slope_5w   # positive = flattening/turning
+    else:
+        slope_now   = 0.0
+        slope_5w    = 0.0
+        slope_accel = 0.0
+
+    # Slope grade:
+    #   "rising"      slope_now > +0.10%
+    #   "flattening"  slope_now between -0.10% and +0.10% OR accel > 0.05 while declining
+    #   "declining"   slope_now < -0.10% and still deteriorating
+    if slope_now >= 0.10:
+        slope_grade = "rising"
+    elif slope_now >= -0.10 or (slope_now < -0.10 and slope_accel >= 0.05):
+        slope_grade = "flattening"
+    else:
+        slope_grade = "declining"
+
+    pass_dist = (-w_dist_200sma_lo <= dist <= w_dist_200sma_hi)
+
+    res.update({
+        "dist_200sma_pct":        round(dist, 2),
+        "sma200":                 round(sma200, 2),
+        "current_close":          round(cur, 2),
+        "prior_run_pct":          round(run, 1),
+        "correction_from_ath_pct":round(corr, 1),
+        "vol_ratio":              round(vr, 2),
+        "sma200_slope_pct":       round(slope_now, 3),
+        "sma200_slope_accel":     round(slope_accel, 3),
+        "sma200_slope_grade":     slope_grade,
+        # keep legacy key for base breakout compat
+        "sma200_slope":           round(slope_now, 3),
+        "pass_200sma_proximity":  pass_dist,
+        "pass_prior_run":         run >= effective_run_min,
+        "sector_run_min":         effective_run_min,
+        "pass_correction":        corr >= w_correction,
+        "pass_volume_surge":      vr >= w_vol_mult,
+        "pass_sma200_slope":      slope_grade != "declining",
+        "undercut_reclaim":       undercut_reclaim,
+        "undercut_reclaim_wks":   undercut_reclaim_weeks_ago,
+        "multiyear_vol_high":     multiyear_vol_high,
+        "vol_rank_pct":           round(vol_rank_pct, 0),
+        "adr_flag":               adr_flag,
+        "adr_vol_pct_rank":       round(vol_pct_rank, 0) if vol_pct_rank is not None else None,
+    })
+    # ── FIX 4: Resistance flip to support ──────────────────────────────────────
+    # Find the highest weekly close in a 3-month window that ended 6+ months ago.
+    # If current price is sitting within 3% above that level, it flipped to support.
+    res_flip = False
+    res_flip_level = None
+    if prior_resistance is not None:
+        # Current price within 0–3% above that resistance level
+        dist_from_res = (cur - prior_resistance) / prior_resistance * 100
+        if 0 <= dist_from_res <= 3.0:
+            res_flip = True
+            res_flip_level = round(prior_resistance, 2)
+
+    res["resistance_flip"]       = res_flip
+    res["resistance_flip_level"] = res_flip_level
+
+    passed = all([res["pass_200sma_proximity"], res["pass_prior_run"],
+                  res["pass_correction"], res["pass_volume_surge"]])
+    return passed, res
+
+# ── Cross-sectional weekly kernel ─────────────────────────────────────────────
+# Same metrics as check_weekly, but for a whole universe at once: every
+# ticker's weekly bars are right-aligned into (weeks × tickers) arrays, NaN-
+# padded on the left, and each window reduction becomes one column-wise NumPy
+# op. Only the scalar verdict runs per ticker (shared _weekly_verdict), so the
+# wr dicts match check_weekly up to float rounding in the rolling sums.
+
+_WK_SMA  = 200
+_WK_ROWS = _WK_SMA + 9    # rows needed for the SMA at offsets -1 … -9
+_WK_VOLS = 156
+
+def check_weekly_batch(frames, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult):
+    """
+    Vectorized check_weekly over {ticker: df_w}. Returns {ticker: (passed, wr)}.
+    Tickers are always passed through as check_weekly's ticker= argument
+    (sector-aware run threshold + ADR volume rank). Frames with gaps (NaN
+    close/low/volume) fall back to the per-ticker path.
+    """
+    out   = {}
+    names = []
+    cols  = []
+    for t, df in frames.items():
+        if df is None or len(df) < 52:
+            out[t] = (False, {"error": "short"})
+            continue
+        c = df["close"].to_numpy(dtype=float)
+        l = df["low"].to_numpy(dtype=float)
+        v = df["volume"].to_numpy(dtype=float)
+        if np.isnan(c).any() or np.isnan(l).any() or np.isnan(v).any():
+            out[t] = check_weekly(df, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run,
+                                  w_correction, w_vol_mult, ticker=t)
+        else:
+            names.append(t); cols.append((c, l, v))
+    if not names:
+        return out
+
+    N = len(names)
+    n = np.array([len(c) for c, _, _ in cols])
+    T = max(int(n.max()), _WK_ROWS)
+    C = np.full((T, N), np.nan); L = np.full((T, N), np.nan); V = np.full((T, N), np.nan)
+    for j, (c, l, v) in enumerate(cols):
+        C[T - n[j]:, j] = c
+        L[T - n[j]:, j] = l
+        V[T - n[j]:, j] = v
+
+    # ── 200W SMA at offsets k = 1 … 9 (window shrinks to n-1 for short names) ─
+    w   = np.minimum(_WK_SMA, n - 1)
+    tail = np.nan_to_num(C[-_WK_ROWS:])
+    cs  = np.vstack([np.zeros((1, N)), np.cumsum(tail, axis=0)])
+    idx = np.arange(N)
+    sma = np.full((10, N), np.nan)                 # sma[k] = SMA series at iloc[-k]
+    for k in range(1, 10):
+        end   = _WK_ROWS - k + 1                   # exclusive, into cs
+        total = cs[end, idx] - cs[end - w, idx]
+        sma[k] = np.where(n - k >= w - 1, total / w, np.nan)
+
+    cur = C[-1]
+
+    # ── ATH / ATL over history ending 8 weeks ago ────────────────────────────
+    ath = np.nanmax(C[:-8], axis=0)
+    atl = np.nanmin(C[:-8], axis=0)
+
+    # ── Volume windows ───────────────────────────────────────────────────────
+    avg20  = V[-20:].mean(axis=0)
+    avg4   = V[-4:].mean(axis=0)
+    peak12 = V[-12:].max(axis=0)
+    rank52 = (avg4 > V[-52:]).mean(axis=0) * 100
+    lookback = np.minimum(_WK_VOLS, n - 1)
+    hist = V[-_WK_VOLS:-1]
+    rows = np.arange(_WK_VOLS - 1)[:, None]
+    hist_max = np.where(rows >= (_WK_VOLS - lookback)[None, :], hist, np.nan)
+    hist_max = np.nanmax(hist_max, axis=0)
+
+    # ── Undercut & reclaim: first week back (1 … 8) wicking through the SMA ──
+    uc = np.zeros((8, N), dtype=bool)
+    for k in range(1, 9):
+        with np.errstate(invalid="ignore"):
+            uc[k - 1] = (L[-k] < sma[k]) & (C[-k] > sma[k])
+    uc_any   = uc.any(axis=0)
+    uc_weeks = uc.argmax(axis=0) + 1
+
+    resist = C[-52:-26].max(axis=0)
+
+    for j, t in enumerate(names):
+        vol_pct_rank = rank52[j] if (is_adr(t) and avg20[j] > 0) else None
+        out[t] = _weekly_verdict(
+            cur[j], sma[1, j], ath[j], atl[j], avg20[j], avg4[j], peak12[j], vol_pct_rank,
+            hist_max[j], int(uc_weeks[j]) if uc_any[j] else None,
+            sma[1, j], sma[5, j], sma[9, j], resist[j],
+            w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction, w_vol_mult, t)
+    return out
+
+def check_daily(df_d, d_atr_pct_min, d_atr_pct_max, d_above_50sma):
+    """
+    Daily checks + two-stage ATR-exhaustion signal.
+
+    Stage 1 — Alert (yellow dot):
+        Did price reach ≤ −10× ATR from the rising 50D SMA at any point
+        in the last 60 days? If yes, yellow_dot_fired = True.
+        This is context only — no points awarded.
+
+    Stage 2 — Response (what happened after the dot):
+        "ma_reclaim"  +8pts  — price crossed back above rising 10D EMA,
+                                volume expanding, EMA slope turning up
+        "basing"      +8pts  — ATR contracting, price coiling in <3% range,
+                                volume drying up (base forming, not yet broken)
+        "breakout"   +12pts  — price breaks above 5-day range top with vol surge
+        "watching"     0pts  — dot fired but no actionable response yet
+        None                 — dot never fired, signal irrelevant
+    """
+    res = {}
+    if len(df_d) < 55:
+        return False, {"error": "short"}
+
+    # Everything below works off these arrays — one conversion per column,
+    # no per-element .iloc. The rolling/EWM series still come from pandas so
+    # the values are bit-identical to the old Series-based version.
+    c   = df_d["close"].to_numpy(dtype=float)
+    h   = df_d["high"].to_numpy(dtype=float)
+    l   = df_d["low"].to_numpy(dtype=float)
+    v   = df_d["volume"].to_numpy(dtype=float)
+    n   = len(c)
+    cur = c[-1]
+
+    sma50_a = calc_sma(df_d["close"], 50).to_numpy()
+    ema10_a = calc_ema(df_d["close"], 10).to_numpy()
+    ema20_a = calc_ema(df_d["close"], 20).to_numpy()
+    avg_vol_20d = df_d["volume"].rolling(20).mean().iloc[-1]   # shared by stages A / C
+
+    # True range once — feeds the 14D ATR and the basing-stage windows.
+    # fmax skips the NaN prev-close on bar 0, same as pandas' max(axis=1).
+    prev = np.concatenate(([np.nan], c[:-1]))
+    tr   = np.fmax.reduce([h - l, np.abs(h - prev), np.abs(l - prev)])
+
+    def _atr_pct(lo, hi):
+        """calc_atr_pct(df_d.iloc[lo:hi]) — the slice's first bar has no prev close."""
+        seg = tr[lo:hi].copy()
+        seg[0] = h[lo] - l[lo] if lo > -n else seg[0]
+        atr_val = np.median(seg[-14:]) if len(seg) >= 14 else np.median(seg)
+        return float(atr_val / c[hi - 1 if hi else -1] * 100)
+
+    sma50 = sma50_a[-1]
+    ema10 = ema10_a[-1]
+    ema20 = ema20_a[-1]
+    atr   = _atr_pct(-n, None)
+    p50   = (cur - sma50) / sma50 * 100
+    ema_sp = (ema10 - ema20) / ema20 * 100
+    hi     = h[-1]
+    lo     = l[-1]
+    rng_pos = (cur - lo) / (hi - lo) if hi != lo else 0.5
+
+    # ── 50D SMA slope ─────────────────────────────────────────────────────────
+    sma50_slope = (sma50_a[-1] - sma50_a[-20]) / sma50_a[-20] * 100 \
+                  if n >= 20 and sma50_a[-20] > 0 else 0
+    sma50_rising = sma50_slope > 0
+
+    # ── Current ATR multiple from 50D ─────────────────────────────────────────
+    atr_abs = atr / 100 * cur  # ATR in dollar terms
+    atr_mult_from_50d = (cur - sma50) / atr_abs if atr_abs > 0 else 0
+
+    # ══════════════════════════════════════════════════════════════════════════
+    # STAGE 1 — Yellow dot: did ≤ −10× ATR fire in last 60 days?
+    # ══════════════════════════════════════════════════════════════════════════
+    # Current ATR is the proxy for every day (stable enough over 60D). Days
+    # are laid out newest-first so argmax on the mask is the most recent dot.
+    yellow_dot_fired  = False
+    yellow_dot_day    = None   # how many days ago the most recent dot fired
+    lookback_d        = min(60, n - 1)
+
+    if atr_abs > 0:
+        day_mult = (c[:-lookback_d - 1:-1] - sma50_a[:-lookback_d - 1:-1]) / atr_abs
+        dots = day_mult <= -10.0   # NaN SMA (warm-up) compares False
+        if dots.any():
+            yellow_dot_fired = True
+            yellow_dot_day   = int(dots.argmax()) + 1
+
+    # ══════════════════════════════════════════════════════════════════════════
+    # STAGE 2 — Response detection (only if dot fired)
+    # ══════════════════════════════════════════════════════════════════════════
+    post_dot_stage = None
+    post_dot_pts   = 0
+
+    if yellow_dot_fired:
+        # ── A) Base Breakout ─────────────────────────────────────────────────
+        # Price breaks above the 5-day range top (measured from just before
+        # today) with a volume surge — strongest signal, highest pts
+        range_5d_high = h[-6:-1].max()
+        broke_out     = cur > range_5d_high * 1.005   # 0.5% buffer
+        vol_surge     = v[-1] > avg_vol_20d * 1.5
+        if broke_out and vol_surge and sma50_rising:
+            post_dot_stage = "breakout"
+            post_dot_pts   = 12
+
+        # ── B) MA Reclaim ────────────────────────────────────────────────────
+        # Price has crossed back above the rising 10D EMA after having been
+        # below it.
+        if post_dot_stage is None:
+            # Was below EMA10 yesterday, above today
+            was_below = c[-2] < ema10_a[-2]
+            now_above = cur >= ema10_a[-1]
+            ema10_slope_5d = (ema10_a[-1] - ema10_a[-5]) / ema10_a[-5] * 100 \
+                             if ema10_a[-5] > 0 else 0
+            ema10_turning  = ema10_slope_5d >= 0   # flattening or rising
+            if was_below and now_above and ema10_turning and sma50_rising:
+                post_dot_stage = "ma_reclaim"
+                post_dot_pts   = 8
+
+        # ── C) Basing ────────────────────────────────────────────────────────
+        # ATR contracting + price coiling in narrow range + volume drying up
+        # Means institutions are absorbing supply quietly after the selloff
+        if post_dot_stage is None:
+            atr_5d  = _atr_pct(-5, None)
+            atr_10d = _atr_pct(-15, -5)
+            range_5d_hi = h[-5:].max()
+            range_5d_lo = l[-5:].min()
+            range_5d_pct = (range_5d_hi - range_5d_lo) / range_5d_lo * 100 \
+                           if range_5d_lo > 0 else 999
+            avg_vol_5d   = v[-5:].mean()
+            atr_contracting = atr_5d < atr_10d * 0.80   # 20%+ contraction
+            coiling         = range_5d_pct < 4.0         # price in <4% range
+            vol_drying      = avg_vol_5d < avg_vol_20d * 0.8
+            if atr_contracting and coiling and sma50_rising:
+                post_dot_stage = "basing"
+                post_dot_pts   = 10 if vol_drying else 8   # extra if vol also dry
+
+        # ── D) Watching ──────────────────────────────────────────────────────
+        # Dot fired but no clear response pattern yet — on radar, not actionable
+        if post_dot_stage is None:
+            post_dot_stage = "watching"
+            post_dot_pts   = 0
+
+    res.update({
+        "atr_pct":            round(atr, 2),
+        "pct_above_50sma":    round(p50, 2),
+        "ema10_vs_ema20_pct": round(ema_sp, 2),
+        "candle_range_position": round(rng_pos, 2),
+        "atr_mult_from_50d":  round(atr_mult_from_50d, 2),
+        "sma50_rising":       sma50_rising,
+        "yellow_dot_fired":   yellow_dot_fired,
+        "yellow_dot_day":     yellow_dot_day,
+        "post_dot_stage":     post_dot_stage,
+        "post_dot_pts":       post_dot_pts,
+        "pass_atr":           d_atr_pct_min <= atr <= d_atr_pct_max,
+        "pass_50sma":         -40 <= p50 <= d_above_50sma,
+        "pass_ema_cross":     ema_sp > -5,
+        "pass_candle_position": rng_pos >= 0.4,
+        # Legacy key — True if currently AT the dot level (for retest mode compat)
+        "pass_atr_mult":      yellow_dot_fired and post_dot_stage != "watching",
+    })
+    return res["pass_atr"] and res["pass_50sma"], res
+
+def check_recovery_structure(df_w, ind=None):
+    """
+    Detects which recovery structure (if any) is present after the bottom.
+    Returns a dict with:
+      - structure:    "ma_stack" | "bounce_ema" | "first_pullback" | "none"
+      - structure_pts: 0–15 (bonus points)
+      - structure_label: human-readable label for the badge
+      - sub-fields for the card metric strip
+    
+    Three patterns detected:
+    
+    1. MA STACK — EMAs aligned in bull order above 200W SMA
+       10W EMA > 20W EMA > 50W SMA, all above 200W SMA
+       Full stack = 15pts, partial (2 of 3 in order) = 8pts
+    
+    2. BOUNCE OFF RISING EMA — price pulling back to rising 10W/20W EMA
+       Price within 5% below the EMA, EMA slope positive over 8W,
+       price higher than 12 weeks ago (uptrend intact)
+       = 10pts
+    
+    3. FIRST PULLBACK — ran to local high, now consolidating or pulling back
+       Local high 4–16W ago was 10%+ above current price,
+       price near 20W or 50W EMA (within 8%),
+       weekly ATR contracting (last 4W avg ATR < prior 8W avg ATR)
+       = 10pts
+
+    ind: optional indicators.weekly_indicators() view — EMA/SMA tails and the
+    12W true range come from the persisted state instead of full history.
+    """
+    res = {
+        "structure": "none",
+        "structure_pts": 0,
+        "structure_label": "No structure",
+        "ma_stack_full": False,
+        "ma_stack_partial": False,
+        "bounce_ema": False,
+        "first_pullback": False,
+        "ema10w": None,
+        "ema20w": None,
+        "sma50w": None,
+        "local_high_pct": None,
+        "atr_contracting": False,
+    }
+
+    if len(df_w) < 52:
+        return res
+
+    closes = df_w["close"]
+    highs  = df_w["high"]
+    lows   = df_w["low"]
+    cur    = closes.iloc[-1]
+
+    # ── Compute MAs ───────────────────────────────────────────────────────────
+    if ind is not None:
+        ema10w_s = pd.Series(ind["ema10"])   # last 8 values only
+        ema20w_s = pd.Series(ind["ema20"])
+        sma50w   = ind["sma50"]
+        sma200   = ind["sma200"][-1]
+    else:
+        ema10w_s = calc_ema(closes, 10)
+        ema20w_s = calc_ema(closes, 20)
+        sma50w   = calc_sma(closes, min(50, len(closes)-1)).iloc[-1]
+        sma200   = calc_sma(closes, min(200, len(closes)-1)).iloc[-1]
+
+    ema10w  = ema10w_s.iloc[-1]
+    ema20w  = ema20w_s.iloc[-1]
+
+    res["ema10w"] = round(ema10w, 2)
+    res["ema20w"] = round(ema20w, 2)
+    res["sma50w"] = round(sma50w, 2)
+
+    # ── Structure 1: MA Stack ─────────────────────────────────────────────────
+    above_200  = sma50w > sma200   # 50W above 200W — base requirement
+    ema_stack  = ema10w > ema20w   # 10W EMA above 20W EMA
+    sma_stack  = ema20w > sma50w   # 20W EMA above 50W SMA
+    price_top  = cur > ema10w      # price leading the stack
+
+    stack_score = sum([above_200, ema_stack, sma_stack, price_top])
+    full_stack    = stack_score >= 4
+    partial_stack = stack_score == 3
+
+    res["ma_stack_full"]    = full_stack
+    res["ma_stack_partial"] = partial_stack
+
+    if full_stack:
+        res["structure"]     = "ma_stack"
+        res["structure_pts"] = 15
+        res["structure_label"] = "MA Stack"
+        return res
+    if partial_stack:
+        res["structure"]     = "ma_stack"
+        res["structure_pts"] = 8
+        res["structure_label"] = "Partial Stack"
+        # Don't return — still check other structures to label correctly
+
+    # ── Structure 2: Bounce off rising EMA ───────────────────────────────────
+    # Price pulling back to 10W or 20W EMA with positive slope
+    dist_ema10 = (cur - ema10w) / ema10w * 100  # negative = below EMA
+    dist_ema20 = (cur - ema20w) / ema20w * 100
+
+    # EMA slopes: positive over last 8 weeks
+    ema10_slope = ema10w_s.iloc[-1] - ema10w_s.iloc[-8] if len(ema10w_s) >= 8 else 0
+    ema20_slope = ema20w_s.iloc[-1] - ema20w_s.iloc[-8] if len(ema20w_s) >= 8 else 0
+
+    # Price trend: higher than 12 weeks ago
+    price_12w_ago   = closes.iloc[-12] if len(closes) >= 12 else closes.iloc[0]
+    uptrend_intact  = cur > price_12w_ago
+
+    touching_ema10 = -5.0 <= dist_ema10 <= 2.0 and ema10_slope > 0
+    touching_ema20 = -5.0 <= dist_ema20 <= 2.0 and ema20_slope > 0
+
+    if (touching_ema10 or touching_ema20) and uptrend_intact and res["structure_pts"] == 0:
+        res["structure"]      = "bounce_ema"
+        res["structure_pts"]  = 10
+        res["structure_label"]= "EMA Bounce"
+        res["bounce_ema"]     = True
+
+    # ── Structure 3: First Pullback ───────────────────────────────────────────
+    # Local high 4–16W ago was 10%+ above current; price near 20W/50W EMA;
+    # ATR contracting (last 4W < prior 8W)
+    lookback = min(16, len(closes) - 1)
+    local_high = closes.iloc[-lookback:-1].max() if lookback > 1 else cur
+    local_high_pct = (local_high - cur) / cur * 100 if cur > 0 else 0
+
+    dist_to_ema20 = abs((cur - ema20w) / ema20w * 100)
+    dist_to_sma50 = abs((cur - sma50w) / sma50w * 100)
+    near_ma = dist_to_ema20 <= 8 or dist_to_sma50 <= 8
+
+    # ATR contraction: compare last 4W vs prior 8W
+    if ind is not None:
+        tr_series = pd.Series(ind["tr"])     # last 12 values only
+    elif len(highs) >= 12:
+        tr_series = pd.concat([
+            highs - lows,
+            (highs - closes.shift(1)).abs(),
+            (lows  - closes.shift(1)).abs()
+        ], axis=1).max(axis=1)
+    if len(highs) >= 12:
+        atr_4w  = tr_series.iloc[-4:].mean()
+        atr_8w  = tr_series.iloc[-12:-4].mean()
+        atr_contracting = atr_4w < atr_8w * 0.85  # 15% contraction
+    else:
+        atr_contracting = False
+
+    res["local_high_pct"]  = round(local_high_pct, 1)
+    res["atr_contracting"] = atr_contracting
+
+    if local_high_pct >= 10 and near_ma and res["structure_pts"] == 0:
+        res["structure"]      = "first_pullback"
+        res["structure_pts"]  = 10 if atr_contracting else 7
+        res["structure_label"]= "First Pullback" + (" + Compression" if atr_contracting else "")
+        res["first_pullback"] = True
+
+    return res
+
+def check_base_breakout(df_w, bb_base_years, bb_range_pct, bb_atr_max,
+                         bb_vol_mult, bb_sma_lo, bb_sma_hi):
+    """
+    Base Breakout Mode criteria:
+    - Multi-year tight sideways consolidation (low ATR, narrow range)
+    - Price near / breaking above 200W SMA
+    - Volume surge on breakout week
+    - Long base duration
+    """
+    res = {}
+    if len(df_w) < 52:
+        return False, {"error": "short"}
+
+    closes = df_w["close"]
+    vols   = df_w["volume"]
+    cur    = closes.iloc[-1]
+
+    # 200W SMA (use available history)
+    sma200_series = calc_sma(closes, min(200, len(closes) - 1))
+    sma200 = sma200_series.iloc[-1]
+    dist   = (cur - sma200) / sma200 * 100
+
+    # Base window = last bb_base_years * 52 weeks
+    base_weeks = int(bb_base_years * 52)
+    base_window = closes.iloc[-(base_weeks + 1):-1] if len(closes) > base_weeks else closes.iloc[:-1]
+
+    if len(base_window) < 26:
+        return False, {"error": "insufficient base history"}
+
+    base_high = base_window.max()
+    base_low  = base_window.min()
+    base_range_pct = (base_high - base_low) / base_low * 100 if base_low > 0 else 999
+
+    # Weekly ATR% during base (avg ATR over base window)
+    if len(df_w) >= base_weeks + 1:
+        base_df = df_w.iloc[-(base_weeks + 1):-1].copy()
+    else:
+        base_df = df_w.iloc[:-1].copy()
+    base_atr = calc_atr_pct(base_df) if len(base_df) >= 14 else 999
+
+    # Volume surge — current 4W avg vs 20W avg
+    avg_vol_4w  = vols.rolling(4).mean().iloc[-1]
+    avg_vol_20w = vols.rolling(20).mean().iloc[-1]
+    vr = avg_vol_4w / avg_vol_20w if avg_vol_20w > 0 else 0
+
+    # Base duration — how many consecutive weeks price stayed within base range
+    # Count weeks from end going backwards where close stayed within base_low*0.9 to base_high*1.1
+    duration_weeks = 0
+    for i in range(len(closes) - 2, max(0, len(closes) - base_weeks * 2) - 1, -1):
+        if base_low * 0.85 <= closes.iloc[i] <= base_high * 1.15:
+            duration_weeks += 1
+        else:
+            break
+    duration_years = round(duration_weeks / 52, 1)
+
+    slope = sma200_series.iloc[-1] - sma200_series.iloc[-5] if len(sma200_series) >= 5 else 0
+
+    # ── Sub-type detection ────────────────────────────────────────────────────
+    # Growth stock base (PLTR style):
+    #   - 200W SMA well below price (price never retested it, SMA still rising)
+    #   - MAs beginning to stack in bull order
+    #   - Base tighter on shorter timeframe (18mo vs 3yr)
+    # Commodity cycle base (KGC style):
+    #   - Price near 200W SMA (just breaking above)
+    #   - Longer multi-year base
+    #   - Lower ATR expected during base
+    ema10w = calc_ema(closes, 10).iloc[-1]  if len(closes) >= 10  else cur
+    ema20w = calc_ema(closes, 20).iloc[-1]  if len(closes) >= 20  else cur
+    sma50w = calc_sma(closes, min(50, len(closes)-1)).iloc[-1]
+    ma_stack = (cur > ema10w > ema20w > sma50w > sma200)
+    ma_partial = sum([cur > ema10w, ema10w > ema20w, ema20w > sma50w, sma50w > sma200]) >= 3
+    # Growth: price >50% above 200W SMA, MAs stacking, base was 12-30 months
+    is_growth_base = dist > 50 and (ma_stack or ma_partial) and duration_weeks <= 130
+    # Commodity: price within 40% of 200W SMA, longer base typical
+    is_commodity_base = dist <= 60
+    sub_type = "growth" if is_growth_base else "commodity"
+
+    pass_sma      = (-bb_sma_lo <= dist <= bb_sma_hi)
+    pass_range    = base_range_pct <= bb_range_pct
+    pass_atr_base = base_atr <= bb_atr_max
+    pass_vol      = vr >= bb_vol_mult
+    pass_duration = duration_weeks >= (bb_base_years * 52 * 0.5)  # at least half the target duration
+
+    res.update({
+        "dist_200sma_pct":    round(dist, 2),
+        "sma200":             round(sma200, 2),
+        "current_close":      round(cur, 2),
+        "base_range_pct":     round(base_range_pct, 1),
+        "base_atr_pct":       round(base_atr, 2),
+        "base_duration_yrs":  duration_years,
+        "vol_ratio":          round(vr, 2),
+        "sma200_slope":       round(slope, 2),
+        "pass_200sma_proximity": pass_sma,
+        "pass_base_range":    pass_range,
+        "pass_base_atr":      pass_atr_base,
+        "pass_volume_surge":  pass_vol,
+        "pass_base_duration": pass_duration,
+        "pass_sma200_slope":  slope >= -0.05,
+        "sub_type":           sub_type,
+        "ma_stack":           ma_stack,
+        "ma_partial":         ma_partial,
+        "ema10w":             round(ema10w, 2),
+        "ema20w":             round(ema20w, 2),
+        "sma50w":             round(sma50w, 2),
+        # Compat fields for shared badge renderer
+        "pass_prior_run":     True,
+        "correction_from_ath_pct": 0,
+        "prior_run_pct":      0,
+    })
+    # ── Sub-type detection: Growth Stock Base vs Commodity Cycle ────────────────
+    # Growth base: shorter history OK, higher ATR acceptable, MA stack forming,
+    #   stock recently broke out of base (dist from 200W SMA elevated),
+    #   typically tech/AI/healthcare sector
+    # Commodity cycle: longer base, lower ATR, 200W SMA acts as floor,
+    #   vol surge at breakout is primary signal
+    #
+    # Heuristic: if base_atr > 3% OR dist > 50% above 200W SMA → growth profile
+    if base_atr > 3.0 or dist > 50:
+        base_subtype = "growth"
+        # Growth: relax base duration (min 12 months), tighter vol requirement
+        pass_duration_growth = duration_weeks >= 52
+    else:
+        base_subtype = "commodity"
+        pass_duration_growth = pass_duration
+
+    res["base_subtype"]        = base_subtype
+    res["pass_duration_typed"] = pass_duration_growth
+
+    passed = all([pass_sma, pass_range, pass_atr_base, pass_vol,
+                  pass_duration_growth if base_subtype == "growth" else pass_duration])
+    return passed, res
+
+def score_base_breakout(br, dr):
+    """
+    Base Breakout scoring — sub-typed for Growth vs Commodity.
+    Growth base: shorter duration OK, higher ATR acceptable, MA stack forming.
+    Commodity cycle: longer base, lower ATR, 200W SMA proximity critical.
+    ATR-multiple-from-50D bonus: rewards precise pullback entry (PLTR signal).
+    """
+    pts = 0
+    subtype = br.get("base_subtype", "commodity")
+
+    if subtype == "growth":
+        # Growth: base range + vol + MA stack more important than duration
+        if br.get("pass_200sma_proximity"): pts += 15   # less critical — can be well above
+        if br.get("pass_base_range"):       pts += 20
+        if br.get("pass_base_atr"):         pts += 15   # relaxed — growth is volatile
+        if br.get("pass_volume_surge"):     pts += 25   # most important for growth breakouts
+        if br.get("pass_duration_typed"):   pts += 10
+        if br.get("pass_sma200_slope"):     pts += 5
+        if dr.get("pass_atr"):              pts += 5
+        if dr.get("pass_50sma"):            pts += 5    # MA stack alignment
+        # ATR-exhaustion response bonus — points come from Stage 2, not Stage 1
+        # Stage 1 (dot firing) = alert only, no pts
+        # Stage 2 (response):  breakout=12, basing=8-10, ma_reclaim=8, watching=0
+        pts += dr.get("post_dot_pts", 0)
+        if dr.get("pass_ema_cross"):        pts += 3
+        if dr.get("pass_candle_position"):  pts += 2
+        # partial: -13 for the 15 not awarded on proximity
+    else:
+        # Commodity: proximity + duration + vol all equally critical
+        if br.get("pass_200sma_proximity"): pts += 25
+        if br.get("pass_base_range"):       pts += 20
+        if br.get("pass_base_atr"):         pts += 20
+        if br.get("pass_volume_surge"):     pts += 20
+        if br.get("pass_base_duration"):    pts += 10
+        if br.get("pass_sma200_slope"):     pts += 5
+        if dr.get("pass_atr"):              pts += 5
+        if dr.get("pass_50sma"):            pts += 5
+        if dr.get("pass_ema_cross"):        pts += 3
+        if dr.get("pass_candle_position"):  pts += 2
+
+    return pts
+
+def score_setup(wr, dr):
+    """
+    Proportional scoring — rewards extremity, not just binary pass/fail.
+    Total: 100 points possible.
+
+    Prior run  (25pts): scales from 0 at 100% run to 25 at 1000%+
+    Correction (20pts): scales from 0 at 30% to 20 at 80%+
+    Volume     (20pts): scales from 0 at 1x to 20 at 3x+
+    200W SMA   (15pts): 15 if within window, partial credit for close misses
+    SMA slope  (0-8pts): graded — rising=8, flattening=5, declining=0
+    Daily ATR  ( 5pts): binary — in range
+    50D SMA    ( 5pts): binary — not too extended
+    EMA cross  ( 3pts): binary — EMA10 > EMA20
+    Candle pos ( 2pts): binary — closing in upper half of range
+    """
+    pts = 0
+
+    # Prior run — proportional 0–25pts (scales up to 1000%)
+    run = wr.get("prior_run_pct", 0)
+    pts += min(25, max(0, (run - 100) / 900 * 25))
+
+    # Correction — proportional 0–20pts (20% = 0pts, 80% = 20pts)
+    corr = wr.get("correction_from_ath_pct", 0)
+    pts += min(20, max(0, (corr - 20) / 60 * 20))
+
+    # Volume surge — proportional 0–20pts (1x = 0pts, 3x+ = 20pts)
+    vr = wr.get("vol_ratio", 0)
+    pts += min(20, max(0, (vr - 1.0) / 2.0 * 20))
+
+    # 200W SMA proximity — 15pts if inside window, 5pts if within 10% outside
+    dist = wr.get("dist_200sma_pct", 999)
+    if wr.get("pass_200sma_proximity"):
+        pts += 15
+    elif abs(dist) <= 10:
+        pts += 5  # partial credit for near misses
+
+    # 200W SMA slope — graded 0/3/5/8pts
+    slope_grade = wr.get("sma200_slope_grade", "declining")
+    slope_accel = wr.get("sma200_slope_accel", 0)
+    if slope_grade == "rising":
+        pts += 8    # cleanest signal — SMA actively rising
+    elif slope_grade == "flattening":
+        pts += 5    # floor forming — acceptable for early-stage setups
+    else:
+        pts += 0    # still declining — penalise, PYPL/ENPH style trap
+
+    # Binary daily criteria
+    if dr.get("pass_atr"):              pts += 5
+    if dr.get("pass_50sma"):            pts += 5
+    if dr.get("pass_ema_cross"):        pts += 3
+    if dr.get("pass_candle_position"):  pts += 2
+
+    # Fix 4 bonus: resistance flip to support (+5pts)
+    if wr.get("resistance_flip"):
+        pts += 5
+
+    # Fix 2 bonus: undercut and reclaim of 200W SMA (+8pts)
+    # Most powerful when recent (within 4W) — decays to 4pts for older signals
+    if wr.get("undercut_reclaim"):
+        wks = wr.get("undercut_reclaim_wks", 8)
+        pts += 8 if wks <= 4 else 4
+
+    # Fix 3 bonus: multi-year volume high (+6pts)
+    # Institutional participation at a scale not seen since last cycle
+    if wr.get("multiyear_vol_high"):
+        pts += 6
+
+    return round(pts)
+
+
+# ── Per-ticker evaluation ─────────────────────────────────────────────────────
+
+def prepare_ticker(ticker, params, get_bars=get_yf_data):
+    """
+    I/O half of evaluate_ticker: weekly / daily fetches, the price floor and
+    the persisted weekly indicator state. Returns evaluate_ticker's
+    "no_data" / "below_price" results, or
+      {"status": "ready", "weekly": df_w, "daily": df_d or None, "ind": ind}
+    get_bars: get_yf_data's signature — swapped for an offline source when
+    profiling.
+    """
+    p = params
+    is_retest = p["is_retest"]
+
+    df_w = get_bars(ticker, period="max", freq="1wk")
+    if df_w is None or len(df_w) < 100:
+        return {"status": "no_data"}
+
+    # ── Price filter backstop ─────────────────────────────────────────────────
+    _cur_price = df_w["close"].iloc[-1]
+    if _cur_price < p["min_price"]:
+        return {"status": "below_price", "price": _cur_price}
+
+    # Persisted SMA/EMA/TR state, advanced by the bars appended since last scan
+    ind = None
+    if is_retest:
+        try:
+            ind = weekly_indicators(ticker, df_w)
+        except Exception:
+            ind = None   # full-history path
+
+    df_d = get_bars(ticker, period="1y", freq="1d")
+    return {"status": "ready", "weekly": df_w, "daily": df_d, "ind": ind}
+
+
+def weekly_step(ticker, df_w, params, weekly=None, ind=None):
+    """(w_pass, wr) — check_weekly (or the precomputed weekly) in Retest Mode, check_base_breakout otherwise."""
+    p = params
+    if p["is_retest"] and weekly is not None:
+        return weekly
+    if p["is_retest"]:
+        return check_weekly(df_w, p["w_dist_200sma_lo"], p["w_dist_200sma_hi"], p["w_prior_run"],
+                            p["w_correction"], p["w_vol_mult"], ticker=ticker, ind=ind)
+    return check_base_breakout(df_w, p["bb_base_years"], p["bb_range_pct"], p["bb_atr_max"],
+                               p["bb_vol_mult"], p["bb_sma_lo"], p["bb_sma_hi"])
+
+
+def daily_step(df_d, params):
+    """(d_pass, dr) — (False, {}) without 55 daily bars."""
+    p = params
+    if df_d is None or len(df_d) < 55:
+        return False, {}
+    return check_daily(df_d, p["d_atr_pct_min"], p["d_atr_pct_max"], p["d_above_50sma"])
+
+
+def structure_step(df_w, params, ind=None):
+    """Recovery structure (Retest Mode only) — the N/A structure otherwise."""
+    if params["is_retest"]:
+        return check_recovery_structure(df_w, ind=ind)
+    return {
+        "structure": "none", "structure_pts": 0, "structure_label": "N/A",
+        "ema10w": None, "ema20w": None, "sma50w": None,
+        "local_high_pct": None, "atr_contracting": False
+    }
+
+
+def assemble_hit(ticker, params, weekly, daily, rr, sector):
+    """
+    Score one ticker from its step results — weekly / daily: (pass, result)
+    tuples, rr: structure_step(), sector: the score_sector() tuple.
+    Returns the {"status": "scored", "hit": {...}} result.
+    """
+    is_retest  = params["is_retest"]
+    w_pass, wr = weekly
+    d_pass, dr = daily
+
+    # Stash daily ATR-mult into wr so card renderer can display it
+    if not is_retest and dr:
+        wr["atr_mult_from_50d"] = dr.get("atr_mult_from_50d")
+    sc = score_setup(wr, dr) if is_retest else score_base_breakout(wr, dr)
+
+    # ── Recovery structure bonus (Retest Mode only) ───────────────────────────
+    sc = max(0, sc + rr["structure_pts"])
+
+    # ── Sector momentum bonus ─────────────────────────────────────────────────
+    sector_pts, sector_name, sector_rel = sector
+    sc = max(0, sc + sector_pts)
+
+    base_sc  = score_setup(wr, dr) if is_retest else score_base_breakout(wr, dr)
+    bonus_sc = sc - base_sc
+    norm_sc  = round(min(100, sc / 1.25))
+    return {"status": "scored",
+            "hit": {"ticker": ticker, "score": sc, "norm_score": norm_sc,
+                    "base_score": base_sc, "bonus_score": bonus_sc,
+                    "wr": wr, "dr": dr,
+                    "w_pass": w_pass, "d_pass": d_pass,
+                    "sector": sector_name, "sector_rel": sector_rel,
+                    "sector_pts": sector_pts, "rr": rr}}
+
+
+def score_ticker(ticker, df_w, df_d, params, sector, weekly=None, ind=None):
+    """
+    CPU half of evaluate_ticker: every check and score on already-fetched
+    bars. sector: the score_sector() tuple. weekly / ind as evaluate_ticker /
+    prepare_ticker. Returns the {"status": "scored", "hit": {...}} result.
+    """
+    return assemble_hit(ticker, params,
+                        weekly_step(ticker, df_w, params, weekly=weekly, ind=ind),
+                        daily_step(df_d, params),
+                        structure_step(df_w, params, ind=ind),
+                        sector)
+
+
+def evaluate_ticker(ticker, params, sector_returns, weekly=None):
+    """
+    Run the full per-ticker pipeline exactly as the serial scan loop did —
+    prepare_ticker then score_ticker.
+    params: sidebar thresholds — is_retest, min_price, w_*, bb_*, d_* keys.
+    weekly: optional precomputed (w_pass, wr) from check_weekly_batch — used
+    in place of check_weekly in Retest Mode.
+    Returns one of:
+      {"status": "no_data"}                      — missing / <100 weekly bars
+      {"status": "below_price", "price": close}  — under the min price floor
+      {"status": "scored", "hit": {...}}         — full hit dict (same keys the
+                                                   UI stores); caller applies
+                                                   min_display
+    """
+    prep = prepare_ticker(ticker, params)
+    if prep["status"] != "ready":
+        return prep
+    return score_ticker(ticker, prep["weekly"], prep["daily"], params,
+                        score_sector(ticker, sector_returns), weekly=weekly, ind=prep["ind"])
+
+
+# ── Process-pool backend ──────────────────────────────────────────────────────
+# With bars cached locally a scan is CPU-bound in the pandas checks, which
+# threads run one at a time under the GIL. ScanExecutor(processes=N) keeps
+# fetching on its threads and hands score_ticker to N worker processes.
+# Bars cross the process boundary as market_data.Bars — a handful of
+# contiguous NumPy buffers pickle much cheaper than a DataFrame — and the
+# checks take them as-is. Sector lookups are resolved in the parent and
+# shipped along, so workers never touch the network.
+
+_worker_params = None
+
+
+def _init_scan_worker(params):
+    global _worker_params
+    _worker_params = params
+
+
+def _score_remote(ticker, weekly_bars, daily_bars, sector_entry, sector, ind):
+    # check_weekly's sector-aware run threshold reads the index
+    sector_index.seed(ticker, *sector_entry)
+    return score_ticker(ticker, weekly_bars, daily_bars, _worker_params, sector, ind=ind)
+
+
+# ── Concurrent executor ───────────────────────────────────────────────────────
+
+def prefetch_bars(chunk, min_price):
+    """
+    Batched weekly + daily downloads for a chunk of tickers, ahead of their
+    per-ticker prepare_ticker calls (which then hit _yf_cache).
+    Returns ({ticker: weekly Bars}, [tickers that got daily bars]).
+    """
+    # A fresh price matrix (cold process, recent scan) fills the cache
+    # without touching the bar store or Yahoo
+    warm_cache(chunk, "1wk", "max")
+    weekly = get_yf_data_batch(chunk, period="max", freq="1wk")
+    # Daily bars only for names that can clear the weekly gates
+    daily = [t for t, df in weekly.items()
+             if len(df) >= 100 and df["close"].iloc[-1] >= min_price]
+    warm_cache(daily, "1d", "1y")
+    get_yf_data_batch(daily, period="1y", freq="1d")
+    # Sector lookups for the whole chunk up front — normally all index hits
+    sector_index.refresh(daily)
+    return weekly, daily
+
+
+def chunked(items, size):
+    """Lists of up to size consecutive items from any iterable."""
+    buf = []
+    for x in items:
+        buf.append(x)
+        if len(buf) == size:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def ordered_lookahead(pool, items, task, prefetch, window, chunk_size, wanted=None):
+    """
+    Generator of (item, task result) in items order — task(item, prefetch
+    future) runs on pool, at most `window` items ahead of the consumer
+    (memory stays flat); items wanted() rejects pass through with None.
+    prefetch(wanted items) runs once per chunk_size items. Each chunk's
+    prefetch is submitted before its own tasks → FIFO guarantees it starts
+    first, so tasks waiting on it cannot deadlock; and together with the
+    previous chunk's first task, independent of the window, so the next
+    download overlaps evaluation of the whole current chunk (at most two
+    chunks prefetched). The caller owns pool and shuts it down.
+    """
+    chunks  = chunked(items, chunk_size)
+    ahead   = deque()   # (chunk, prefetch future) queued but not yet started on
+    waiting = deque()   # (item, prefetch future) of the current chunk, not yet submitted
+    queue   = deque()   # (item, task future or None) in items order
+
+    def _next_chunk():
+        chunk = next(chunks, None)
+        if chunk is not None:
+            todo = [x for x in chunk if wanted is None or wanted(x)]
+            ahead.append((chunk, pool.submit(prefetch, todo) if todo else None))
+
+    while True:
+        while len(queue) < window:
+            if not waiting:
+                if not ahead:
+                    _next_chunk()
+                if not ahead:
+                    break
+                chunk, pf = ahead.popleft()
+                waiting.extend((x, pf) for x in chunk)
+                _next_chunk()
+            x, pf = waiting.popleft()
+            fut = pool.submit(task, x, pf) if wanted is None or wanted(x) else None
+            queue.append((x, fut))
+        if not queue:
+            return
+        x, fut = queue.popleft()
+        yield x, None if fut is None else fut.result()
+
+
+class ScanExecutor:
+    """
+    Runs evaluate_ticker over a universe in a bounded thread pool.
+    run() is a generator yielding (index, ticker, result) strictly in universe
+    order, so the caller (the Streamlit script thread) can update progress,
+    logs and the live-hits panel exactly as the serial loop did.
+
+    Each chunk of chunk_size tickers gets one batched weekly + daily prefetch;
+    ordered_lookahead schedules it so the next download overlaps evaluation
+    of the whole current chunk. Network calls are throttled by
+    market_data.yf_rate_limiter. workers=1 runs everything inline.
+    In Retest Mode the prefetch also scores the chunk's weekly gates in one
+    check_weekly_batch call; tasks pick their (w_pass, wr) out of it.
+    processes > 0 moves the checks and scoring (score_ticker) onto that many
+    worker processes — see the process-pool backend above; threads then only
+    fetch, and the weekly gates are scored per ticker in the workers.
+    """
+    def __init__(self, params, sector_returns, workers=8, chunk_size=YF_BATCH_SIZE, processes=0):
+        self.params         = params
+        self.sector_returns = sector_returns
+        self.workers        = max(1, int(workers))
+        self.chunk_size     = chunk_size
+        self.processes      = max(0, int(processes))
+        self._procs         = None
+
+    def _prefetch(self, chunk):
+        weekly, daily = prefetch_bars(chunk, self.params["min_price"])
+        if not self.params["is_retest"] or self._procs is not None:
+            return {}
+        p = self.params
+        return check_weekly_batch({t: weekly[t] for t in daily}, p["w_dist_200sma_lo"],
+                                  p["w_dist_200sma_hi"], p["w_prior_run"],
+                                  p["w_correction"], p["w_vol_mult"])
+
+    def _evaluate(self, ticker, prefetch_future):
+        weekly = {}
+        if prefetch_future is not None:
+            try:
+                weekly = prefetch_future.result()
+            except Exception:
+                pass   # get_yf_data falls back to single-ticker requests
+        if self._procs is None:
+            return evaluate_ticker(ticker, self.params, self.sector_returns,
+                                   weekly=weekly.get(ticker))
+        prep = prepare_ticker(ticker, self.params)
+        if prep["status"] != "ready":
+            return prep
+        # Returns the worker's future — run() waits on it in universe order
+        return self._procs.submit(_score_remote, ticker, as_bars(prep["weekly"]),
+                                  as_bars(prep["daily"]), sector_index.lookup(ticker),
+                                  score_sector(ticker, self.sector_returns), prep["ind"])
+
+    def run(self, tickers, start=0):
+        """start: skip tickers[:start] (resumed scan) — indices stay absolute."""
+        tickers = list(tickers)
+        cs = self.chunk_size
+        if self.workers == 1 and not self.processes:
+            weekly = {}
+            for i in range(start, len(tickers)):
+                t = tickers[i]
+                if (i - start) % cs == 0:
+                    try:
+                        weekly = self._prefetch(tickers[i:i + cs])
+                    except Exception:
+                        weekly = {}
+                yield i, t, evaluate_ticker(t, self.params, self.sector_returns,
+                                            weekly=weekly.get(t))
+            return
+
+        pool    = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan")
+        if self.processes:
+            # spawn, not fork — the caller may be a threaded Streamlit server
+            self._procs = ProcessPoolExecutor(self.processes,
+                                              mp_context=multiprocessing.get_context("spawn"),
+                                              initializer=_init_scan_worker,
+                                              initargs=(self.params,))
+        window = max(self.workers, self.processes) * 4
+        done   = False
+        try:
+            results = ordered_lookahead(pool, tickers[start:], self._evaluate, self._prefetch,
+                                        window, cs)
+            for i, (t, res) in enumerate(results, start):
+                if isinstance(res, Future):
+                    res = res.result()
+                yield i, t, res
+            done = True
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+            if self._procs is not None:
+                # Finished runs reap their workers; an abandoned run (scan
+                # stopped mid-way) must not block the caller on them
+                self._procs.shutdown(wait=done, cancel_futures=True)
@@ -0,0 +1,238 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# ── Scan Journal ──────────────────────────────────────────────────────────────
+# Append-only JSONL record of a scan in progress — survives websocket drops on
+# Streamlit Cloud. One header line when the scan starts, then one small line
+# per evaluated ticker (hit / miss / skip, with its log line and, for hits,
+# the JSON-safe hit dict). Nothing already written is ever re-serialised, so
+# persisting a scan is O(tickers) instead of O(hits²). complete() compacts
+# the file atomically to header + hits + last logs + a complete marker.
+# replay_journal() rebuilds the dict the restore block consumes from either form.
+# An interrupted scan is resumed by appending to the same journal (resume()),
+# starting at the first ticker with no tick record.
+
+JOURNAL_PATH = os.environ.get("SCANNER_JOURNAL_PATH", "/tmp/scanner_state.jsonl")
+JOURNAL_VERSION = 1
+LOG_TAIL = 200   # log lines kept on replay / compaction
+
+
+def _json_safe(d):
+    """Scalar fields only. NumPy scalars (np.bool_ pass flags) are unwrapped
+    rather than dropped, so restored / resumed hits keep their badges."""
+    out = {}
+    for k, v in (d or {}).items():
+        if isinstance(v, (int, float, str, bool, type(None))):
+            out[k] = v
+        elif type(v).__module__ == "numpy" and hasattr(v, "item") and getattr(v, "ndim", 1) == 0:
+            out[k] = v.item()
+    return out
+
+
+def serialise_hit(h):
+    """JSON-safe copy of a hit — wr/dr/rr filtered to scalar fields."""
+    return {
+        "ticker":      h["ticker"],
+        "score":       h["score"],
+        "norm_score":  h.get("norm_score", 0),
+        "base_score":  h.get("base_score", 0),
+        "bonus_score": h.get("bonus_score", 0),
+        "w_pass":      h["w_pass"],
+        "d_pass":      h["d_pass"],
+        "sector":      h.get("sector", ""),
+        "sector_rel":  h.get("sector_rel"),
+        "sector_pts":  h.get("sector_pts", 0),
+        "wr":          _json_safe(h["wr"]),
+        "dr":          _json_safe(h["dr"]),
+        "rr":          _json_safe(h.get("rr", {})),
+    }
+
+
+def _dumps(rec):
+    # np.float64 subclasses float so json handles it; np.bool_ does not —
+    # coerce anything else numpy-ish rather than lose the whole record
+    return json.dumps(rec, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+
+class ScanJournal:
+    """
+    Writer for one scan. start() truncates and writes the header; record()
+    appends one line per ticker; complete() compacts. All writes are
+    best-effort — persistence never interrupts the scan.
+    """
+    def __init__(self, path=JOURNAL_PATH):
+        self.path    = path
+        self._f      = None
+        self._lock   = threading.Lock()
+        self._header = None
+        self._hits   = []
+        self._logs   = deque(maxlen=LOG_TAIL)
+        self.scanned = 0
+        self.skipped = 0
+
+    def _append(self, rec):
+        try:
+            if self._f is None:
+                self._f = open(self.path, "a", encoding="utf-8")
+            self._f.write(_dumps(rec) + "\n")
+            self._f.flush()
+        except Exception:
+            pass
+
+    def start(self, **meta):
+        """Begin a new journal. meta: universe, total, sector_returns, watchlist, mode, scan_ts …"""
+        with self._lock:
+            self.close()
+            try:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            except Exception:
+                pass
+            self._header = {"type": "header", "v": JOURNAL_VERSION,
+                            "started": time.time(), **meta}
+            self._append(self._header)
+
+    def resume(self, saved):
+        """
+        Continue an interrupted journal in place. saved: replay_journal()
+        output — its hits / logs / counters seed the writer so complete()
+        compacts the whole scan, not just the resumed tail.
+        """
+        with self._lock:
+            self.close()
+            self._header = dict(saved["header"])
+            self._hits   = list(saved["hits"])
+            self._logs   = deque(saved["logs"], maxlen=LOG_TAIL)
+            self.scanned = saved["scanned"]
+            self.skipped = saved["skipped"]
+            self._append({"type": "resume", "at": self.scanned, "ts": time.time()})
+
+    def record(self, index, ticker, status, log=None, hit=None, skipped=None):
+        """
+        One evaluated ticker. index = tickers processed so far (i + 1).
+        status: "hit" | "miss" | "skip". hit: the full hit dict for hits.
+        """
+        rec = {"type": "tick", "i": index, "ticker": ticker, "status": status}
+        if log is not None:
+            rec["log"] = log
+        if skipped is not None:
+            rec["skipped"] = skipped
+        if hit is not None:
+            rec["hit"] = serialise_hit(hit)
+        with self._lock:
+            self.scanned = index
+            if skipped is not None:
+                self.skipped = skipped
+            if log is not None:
+                self._logs.append(log)
+            if hit is not None:
+                self._hits.append(rec["hit"])
+            self._append(rec)
+
+    def complete(self, **meta_updates):
+        """Mark done and compact: header + hits + log tail + complete marker."""
+        with self._lock:
+            self.close()
+            header = dict(self._header or {"type": "header", "v": JOURNAL_VERSION})
+            header.update(meta_updates)
+            lines = [header]
+            lines += [{"type": "tick", "i": None, "ticker": h["ticker"],
+                       "status": "hit", "hit": h} for h in self._hits]
+            lines.append({"type": "logs", "logs": list(self._logs)})
+            lines.append({"type": "complete", "scanned": self.scanned,
+                          "skipped": self.skipped, "finished": time.time()})
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for rec in lines:
+                        f.write(_dumps(rec) + "\n")
+                os.replace(tmp, self.path)
+            except Exception:
+                pass
+
+    def close(self):
+        if self._f is not None:
+            try:
+                self._f.close()
+            except Exception:
+                pass
+            self._f = None
+
+
+def replay_journal(path=JOURNAL_PATH):
+    """
+    Rebuild scan state from a journal (live or compacted). Returns the dict
+    the restore block expects — hits, logs, scanned, skipped, total,
+    universe, sector_returns, watchlist, mode, scan_ts, complete, plus the
+    raw header under "header" and a resumable flag — or None if there is
+    no usable journal.
+    A torn final line (killed mid-write) is ignored.
+    """
+    try:
+        if not os.path.exists(path):
+            return None
+        header  = None
+        hits    = []
+        logs    = deque(maxlen=LOG_TAIL)
+        scanned = skipped = 0
+        done    = False
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                kind = rec.get("type")
+                if kind == "header":
+                    header, hits, scanned, skipped, done = rec, [], 0, 0, False
+                    logs.clear()
+                elif kind == "tick":
+                    if rec.get("i") is not None:
+                        scanned = rec["i"]
+                    if rec.get("skipped") is not None:
+                        skipped = rec["skipped"]
+                    if rec.get("log") is not None:
+                        logs.append(rec["log"])
+                    if rec.get("hit") is not None:
+                        hits.append(rec["hit"])
+                elif kind == "logs":
+                    logs.clear()
+                    logs.extend(rec.get("logs", []))
+                elif kind == "complete":
+                    done    = True
+                    scanned = rec.get("scanned", scanned)
+                    skipped = rec.get("skipped", skipped)
+        if header is None:
+            return None
+        return {
+            "hits":           hits,
+            "logs":           list(logs),
+            "scanned":        scanned,
+            "skipped":        skipped,
+            "total":          header.get("total", 0),
+            "universe":       header.get("universe", []),
+            "sector_returns": header.get("sector_returns", {}),
+            "watchlist":      header.get("watchlist", {}),
+            "mode":           header.get("mode", "retest"),
+            "scan_ts":        header.get("scan_ts", ""),
+            "complete":       done,
+            "header":         header,
+            # Interrupted with the scan parameters on record → can pick up
+            # at universe[scanned] instead of starting over
+            "resumable":      (not done and "params" in header
+                               and scanned < len(header.get("universe", []))),
+        }
+    except Exception:
+        return None
+
+
+def clear_journal(path=JOURNAL_PATH):
+    """Delete the journal."""
+    try:
+        if os.path.exists(path):
+            os.remove(path)
+    except Exception:
+        pass
@@ -0,0 +1,517 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from market_data import (
+    YF_BATCH_SIZE, _yf_cache, _read_store_meta, _store_covers, _trim_to_period, as_bars,
+    load_stored_bars,
+)
+from price_matrix import warm_cache
+from scan_engine import (
+    ScanExecutor, assemble_hit, check_weekly_batch, chunked, daily_step, ordered_lookahead,
+    prefetch_bars, prepare_ticker, score_sector, structure_step, weekly_step,
+)
+from scan_journal import serialise_hit
+
+# ── Scan Pipeline ─────────────────────────────────────────────────────────────
+# The scan as a chain of generator stages over one record per ticker:
+#   universe → prefilter → fetch → weekly → daily → structure → sector → score → sinks
+# A record is a dict — i (universe index), ticker, status — that each stage
+# fills in: prefilter marks blanks, repeats and rejects "skipped"; fetch
+# sets the rest to "ready", "no_data" or "below_price" and adds
+# the weekly / daily bars and indicator state; weekly, daily, structure and
+# sector add w, d, rr and sector; score swaps all of that for the hit and
+# status "scored" — the same result dicts ScanExecutor yields. Stages only
+# work on records in the status they expect and pass the rest through, so
+# every ticker reaches the sinks, in universe order.
+# Every stage counts the records it worked on and the seconds that took
+# (threaded stages: summed worker time), so ScanPipeline.timings() profiles
+# the scan stage by stage. Stages are swappable — fetch runs "serial",
+# "threaded" or "cached" (memory / price matrix / bar store only, never the
+# network); weekly runs "serial" (per ticker — what interactive sinks need)
+# or "batch" (check_weekly_batch per chunk — scan_cli's throughput default);
+# ExecutorStage replaces fetch → score with ScanExecutor for worker
+# processes. Sinks consume the finished records: CollectSink, JournalSink,
+# GistSink and FileSink here; the Scanner tab's live panel is another sink
+# in app.py.
+
+
+class Stage:
+    """One pipeline step: apply(rec) on each "ready" record, or override run()."""
+    name = "stage"
+
+    def __init__(self):
+        self.items   = 0
+        self.seconds = 0.0
+        self._lock   = threading.Lock()
+
+    def _add(self, seconds, items=1):
+        with self._lock:
+            self.seconds += seconds
+            self.items   += items
+
+    def begin(self, tickers, start):
+        """Called by ScanPipeline.run before records flow — the whole universe and the resume index."""
+
+    def apply(self, rec):
+        raise NotImplementedError
+
+    def run(self, records):
+        for rec in records:
+            if rec["status"] == "ready":
+                t0 = time.perf_counter()
+                self.apply(rec)
+                self._add(time.perf_counter() - t0)
+            yield rec
+
+
+class PrefilterStage(Stage):
+    """
+    Marks blank / repeated tickers and any keep(ticker) rejects "skipped"
+    (with a reason) before anything is fetched — they still reach the sinks,
+    so journal and counts cover every index. A resumed run treats the
+    tickers before start as already seen.
+    """
+    name = "prefilter"
+
+    def __init__(self, keep=None):
+        super().__init__()
+        self.keep  = keep
+        self._seen = set()
+
+    def begin(self, tickers, start):
+        self._seen = set(tickers[:start])
+
+    def run(self, records):
+        seen = self._seen
+        for rec in records:
+            t0 = time.perf_counter()
+            t  = rec["ticker"]
+            if not t:
+                reason = "blank ticker"
+            elif t in seen:
+                reason = "duplicate"
+            elif self.keep is not None and not self.keep(t):
+                reason = "filtered out"
+            else:
+                reason = None
+            seen.add(t)
+            if reason:
+                rec.update(status="skipped", reason=reason)
+            self._add(time.perf_counter() - t0)
+            yield rec
+
+
+def cached_bars(ticker, period="5y", freq="1wk"):
+    """get_yf_data without the network — _yf_cache, then the price matrix, then the bar store."""
+    key = f"{ticker}_{freq}"
+    b   = _yf_cache.peek(key)
+    if b is None and warm_cache([ticker], freq, period, max_age=float("inf")):
+        b = _yf_cache.peek(key)
+    if b is None and _store_covers(_read_store_meta(ticker, freq), period):
+        df = load_stored_bars(ticker, freq)
+        if df is not None:
+            b = as_bars(_trim_to_period(df, period))
+            _yf_cache[key] = b
+    return b
+
+
+class FetchStage(Stage):
+    """
+    Weekly / daily bars, price floor and indicator state (prepare_ticker).
+    mode: "threaded" — chunk batch downloads plus per-ticker work on a
+    bounded thread pool, results kept in order; "serial" — the same inline;
+    "cached" — no network, see cached_bars.
+    """
+    name = "fetch"
+
+    def __init__(self, params, mode="threaded", workers=8, chunk_size=YF_BATCH_SIZE):
+        super().__init__()
+        self.params     = params
+        self.mode       = mode
+        self.workers    = max(1, int(workers))
+        self.chunk_size = chunk_size
+
+    def _prefetch(self, tickers):
+        t0 = time.perf_counter()
+        try:
+            prefetch_bars(tickers, self.params["min_price"])
+        except Exception:
+            pass   # get_yf_data falls back to single-ticker requests
+        self._add(time.perf_counter() - t0, 0)
+
+    def _prepare(self, ticker, prefetch_future=None):
+        if prefetch_future is not None:
+            prefetch_future.result()
+        t0   = time.perf_counter()
+        prep = prepare_ticker(ticker, self.params)
+        self._add(time.perf_counter() - t0)
+        return prep
+
+    def run(self, records):
+        if self.mode == "cached":
+            for rec in records:
+                if rec["status"] == "pending":
+                    t0 = time.perf_counter()
+                    rec.update(prepare_ticker(rec["ticker"], self.params, get_bars=cached_bars))
+                    self._add(time.perf_counter() - t0)
+                yield rec
+        elif self.mode == "serial" or self.workers == 1:
+            for chunk in chunked(records, self.chunk_size):
+                self._prefetch([r["ticker"] for r in chunk if r["status"] == "pending"])
+                for rec in chunk:
+                    if rec["status"] == "pending":
+                        rec.update(self._prepare(rec["ticker"]))
+                    yield rec
+        else:
+            yield from self._threaded(records)
+
+    def _threaded(self, records):
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fetch")
+        try:
+            for rec, prep in ordered_lookahead(
+                    pool, records, lambda r, pf: self._prepare(r["ticker"], pf),
+                    lambda recs: self._prefetch([r["ticker"] for r in recs]),
+                    self.workers * 4, self.chunk_size,
+                    wanted=lambda r: r["status"] == "pending"):
+                if prep is not None:
+                    rec.update(prep)
+                yield rec
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class WeeklyStage(Stage):
+    """
+    Weekly gates. mode "serial" (and Base Breakout Mode) scores per ticker,
+    so records keep streaming one at a time; "batch" scores a chunk's Retest
+    gates in one check_weekly_batch call — identical results and less CPU,
+    but it holds chunk_size fetched records before passing any on, so
+    downstream sinks see them in bursts. Batch suits headless runs only.
+    """
+    name = "weekly"
+
+    def __init__(self, params, mode="serial", chunk_size=YF_BATCH_SIZE):
+        super().__init__()
+        self.params     = params
+        self.mode       = mode
+        self.chunk_size = chunk_size
+
+    def apply(self, rec):
+        rec["w"] = weekly_step(rec["ticker"], rec["weekly"], self.params, ind=rec["ind"])
+
+    def run(self, records):
+        p = self.params
+        if self.mode != "batch" or not p["is_retest"]:
+            yield from super().run(records)
+            return
+        for chunk in chunked(records, self.chunk_size):
+            ready = [r for r in chunk if r["status"] == "ready"]
+            if ready:
+                t0  = time.perf_counter()
+                out = check_weekly_batch({r["ticker"]: r["weekly"] for r in ready},
+                                         p["w_dist_200sma_lo"], p["w_dist_200sma_hi"], p["w_prior_run"],
+                                         p["w_correction"], p["w_vol_mult"])
+                for r in ready:
+                    r["w"] = out[r["ticker"]]
+                self._add(time.perf_counter() - t0, len(ready))
+            yield from chunk
+
+
+class DailyStage(Stage):
+    name = "daily"
+
+    def __init__(self, params):
+        super().__init__()
+        self.params = params
+
+    def apply(self, rec):
+        rec["d"] = daily_step(rec["daily"], self.params)
+
+
+class StructureStage(Stage):
+    name = "structure"
+
+    def __init__(self, params):
+        super().__init__()
+        self.params = params
+
+    def apply(self, rec):
+        rec["rr"] = structure_step(rec["weekly"], self.params, ind=rec["ind"])
+
+
+class SectorStage(Stage):
+    name = "sector"
+
+    def __init__(self, sector_returns):
+        super().__init__()
+        self.sector_returns = sector_returns
+
+    def apply(self, rec):
+        rec["sector"] = score_sector(rec["ticker"], self.sector_returns)
+
+
+class ScoreStage(Stage):
+    """Builds the hit and drops the bars — records leave as ScanExecutor results."""
+    name = "score"
+
+    def __init__(self, params):
+        super().__init__()
+        self.params = params
+
+    def apply(self, rec):
+        res = assemble_hit(rec["ticker"], self.params, rec.pop("w"), rec.pop("d"),
+                           rec.pop("rr"), rec.pop("sector"))
+        for k in ("weekly", "daily", "ind"):
+            rec.pop(k, None)
+        rec.update(res)
+
+
+class ExecutorStage(Stage):
+    """fetch → score in one stage on ScanExecutor (threads + optional worker processes)."""
+    name = "executor"
+
+    def __init__(self, params, sector_returns, workers=8, processes=0, chunk_size=YF_BATCH_SIZE):
+        super().__init__()
+        self.executor = ScanExecutor(params, sector_returns, workers=workers,
+                                     chunk_size=chunk_size, processes=processes)
+
+    def run(self, records):
+        records = list(records)
+        todo    = [r for r in records if r["status"] == "pending"]
+        results = self.executor.run([r["ticker"] for r in todo])
+        try:
+            for rec in records:
+                if rec["status"] == "pending":
+                    t0 = time.perf_counter()
+                    _, _, res = next(results)
+                    self._add(time.perf_counter() - t0)
+                    rec.update(res)
+                yield rec
+        finally:
+            results.close()
+
+
+# ── Pipeline ──────────────────────────────────────────────────────────────────
+
+class ScanPipeline:
+    def __init__(self, stages):
+        self.stages = list(stages)
+        self.sinks  = []
+
+    def run(self, tickers, start=0):
+        """Generator of finished records for tickers[start:] — indices stay absolute."""
+        tickers = list(tickers)
+        records = ({"i": i, "ticker": tickers[i], "status": "pending"}
+                   for i in range(start, len(tickers)))
+        for stage in self.stages:
+            stage.begin(tickers, start)
+            records = stage.run(records)
+        return records
+
+    def drain(self, tickers, sinks, start=0):
+        """
+        Feed every finished record to each sink, then close them —
+        close(completed=False) if the run was cut short.
+        """
+        self.sinks = list(sinks)
+        stream     = self.run(tickers, start)
+        completed  = False
+        try:
+            for rec in stream:
+                for s in self.sinks:
+                    t0 = time.perf_counter()
+                    s.write(rec)
+                    s.seconds += time.perf_counter() - t0
+                    s.items   += 1
+            completed = True
+        finally:
+            stream.close()   # shuts down stage thread pools / worker processes
+            for s in self.sinks:
+                s.close(completed)
+
+    def timings(self):
+        """[(name, items, seconds)] for every stage, then every sink of the last drain()."""
+        return [(s.name, s.items, s.seconds) for s in self.stages + self.sinks]
+
+
+def build_pipeline(params, sector_returns, workers=8, processes=0, fetch="threaded",
+                   weekly="serial", keep=None):
+    """
+    The standard scan. processes > 0 runs fetch → score on ScanExecutor's
+    worker processes (fetch / weekly modes then don't apply).
+    """
+    stages = [PrefilterStage(keep)]
+    if processes:
+        return ScanPipeline(stages + [ExecutorStage(params, sector_returns, workers, processes)])
+    return ScanPipeline(stages + [
+        FetchStage(params, fetch, workers),
+        WeeklyStage(params, weekly),
+        DailyStage(params),
+        StructureStage(params),
+        SectorStage(sector_returns),
+        ScoreStage(params),
+    ])
+
+
+# ── Sinks ─────────────────────────────────────────────────────────────────────
+
+def outcome(rec, min_score, min_price):
+    """("skip" | "hit" | "miss", log line) for a finished record — the Scanner tab's wording."""
+    t = rec["ticker"]
+    if rec["status"] == "skipped":
+        return "skip", f"⚠ {t or '(blank)'} — {rec['reason']}, skipped"
+    if rec["status"] == "no_data":
+        return "skip", f"⚠ {t} — no data"
+    if rec["status"] == "below_price":
+        return "skip", f"✗ {t} — price ${rec['price']:.2f} below ${min_price} floor"
+    h = rec["hit"]
+    if h["score"] >= min_score:
+        flag = "✅" if (h["w_pass"] and h["d_pass"]) else ("◑" if h["w_pass"] else "○")
+        return "hit", f"{flag} {t} — {h['norm_score']}/100 (raw {h['score']})"
+    return "miss", f"✗ {t} — {h['norm_score']}/100 (raw {h['score']})"
+
+
+class Sink:
+    name = "sink"
+
+    def __init__(self):
+        self.items   = 0
+        self.seconds = 0.0
+
+    def write(self, rec):
+        raise NotImplementedError
+
+    def close(self, completed):
+        pass
+
+
+class CollectSink(Sink):
+    """
+    Hits (every scored ticker with keep_all) and counts: scanned, scored,
+    hits, no_data, below_price, skipped (prefilter).
+    """
+    name = "collect"
+
+    def __init__(self, min_score, min_price, keep_all=False, hits=None):
+        super().__init__()
+        self.min_score = min_score
+        self.min_price = min_price
+        self.keep_all  = keep_all
+        self.hits      = list(hits or [])
+        self.counts    = {"scanned": 0, "scored": 0, "hits": 0, "no_data": 0, "below_price": 0,
+                          "skipped": 0}
+
+    def write(self, rec):
+        self.counts["scanned"] += 1
+        if rec["status"] != "scored":
+            self.counts[rec["status"]] += 1
+            return
+        self.counts["scored"] += 1
+        is_hit = rec["hit"]["score"] >= self.min_score
+        self.counts["hits"] += is_hit
+        if is_hit or self.keep_all:
+            self.hits.append(rec["hit"])
+
+    def sorted_hits(self):
+        return sorted(self.hits, key=lambda h: h["norm_score"], reverse=True)
+
+
+class JournalSink(Sink):
+    """Appends every record to a started / resumed ScanJournal; completes it when the run finishes."""
+    name = "journal"
+
+    def __init__(self, journal, min_score, min_price, skipped=0, **complete_meta):
+        super().__init__()
+        self.journal       = journal
+        self.min_score     = min_score
+        self.min_price     = min_price
+        self.skipped       = skipped
+        self.complete_meta = complete_meta
+
+    def write(self, rec):
+        kind, log = outcome(rec, self.min_score, self.min_price)
+        self.skipped += kind == "skip"
+        self.journal.record(rec["i"] + 1, rec["ticker"], kind, log,
+                            hit=rec["hit"] if kind == "hit" else None, skipped=self.skipped)
+
+    def close(self, completed):
+        if completed:
+            self.journal.complete(**self.complete_meta)
+
+
+class GistSink(Sink):
+    """Gist checkpoint every `every` hits, plus a final one when the run finishes."""
+    name = "gist"
+
+    def __init__(self, writer, scan_ts, mode, min_score, hits=None, every=5):
+        super().__init__()
+        self.writer    = writer
+        self.scan_ts   = scan_ts
+        self.mode      = mode
+        self.min_score = min_score
+        self.hits      = list(hits or [])
+        self.every     = every
+
+    def write(self, rec):
+        if rec["status"] == "scored" and rec["hit"]["score"] >= self.min_score:
+            self.hits.append(rec["hit"])
+            if len(self.hits) % self.every == 0:
+                self.writer.submit(self.hits, self.scan_ts, self.mode)
+
+    def close(self, completed):
+        if completed:
+            self.writer.submit(self.hits, self.scan_ts, self.mode)
+            self.writer.close(timeout=15)
+
+
+def flatten_hit(h):
+    """One flat row: top-level fields plus wr.* / dr.* / rr.* scalars."""
+    s   = serialise_hit(h)
+    row = {k: v for k, v in s.items() if k not in ("wr", "dr", "rr")}
+    for part in ("wr", "dr", "rr"):
+        row.update({f"{part}.{k}": v for k, v in s[part].items()})
+    return row
+
+
+def write_results(hits, path):
+    """Write by extension: .json (nested hit dicts), .parquet or .csv (flat)."""
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            # np.bool_ pass flags → bool, as the journal does
+            json.dump([serialise_hit(h) for h in hits], f,
+                      default=lambda o: o.item() if hasattr(o, "item") else str(o))
+        return
+    df = pd.DataFrame([flatten_hit(h) for h in hits])
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+class FileSink(CollectSink):
+    """CollectSink that writes its hits (best first) to path when the run finishes — see write_results."""
+    name = "file"
+
+    def __init__(self, path, min_score, min_price, keep_all=False):
+        super().__init__(min_score, min_price, keep_all)
+        self.path = path
+
+    def close(self, completed):
+        if completed:
+            write_results(self.sorted_hits(), self.path)
+
+
+class CallbackSink(Sink):
+    """fn(rec) for every record — progress bars and the like."""
+    name = "callback"
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+
+    def write(self, rec):
+        self.fn(rec)
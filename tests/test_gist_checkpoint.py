@@ -0,0 +1,161 @@
+import json
+import random
+
+import pytest
+
+from gist_checkpoint import (
+    CHECKPOINT_FILENAME, DeltaCheckpointBuilder, build_checkpoint_files, checkpoint_hit,
+    chunk_filename, decode_checkpoint,
+)
+
+SCAN_TS = "2026-10-16 21:30"
+SECTORS = ["Technology", "Energy", "Healthcare", "Gold Miners"]
+GRADES  = ["A", "B", "C"]
+
+
+def _hit(rng, i):
+    rr = {"structure_label": rng.choice(["Higher lows", "Base", "Undercut"])} if rng.random() < 0.7 else {}
+    return {
+        "ticker":     f"T{i:04d}",
+        "score":      rng.randint(40, 125),
+        "norm_score": rng.randint(30, 100),
+        "sector":     rng.choice(SECTORS),
+        "sector_rel": rng.choice([None, round(rng.uniform(-20, 20), 1)]),
+        "w_pass":     rng.random() < 0.5,
+        "d_pass":     rng.random() < 0.5,
+        "wr": {"current_close": round(rng.uniform(5, 900), 2),
+               "sma200_slope_grade": rng.choice(GRADES), "prior_run": rng.uniform(0, 900),
+               "closes": [1.0, 2.0]},   # non-scalar — dropped by checkpoint_hit
+        "dr": {"atr_pct": round(rng.uniform(1, 12), 2)},
+        "rr": rr,
+    }
+
+
+def _patch(gist, files):
+    """Apply a Gist PATCH "files" payload: None deletes, else (over)writes."""
+    for name, f in files.items():
+        if f is None:
+            gist.pop(name, None)
+        else:
+            gist[name] = {"content": f["content"]}
+
+
+def _decoded(gist):
+    cp = decode_checkpoint(gist)
+    return None if cp is None else cp["hits"]
+
+
+def _expected(hits):
+    return [checkpoint_hit(h) for h in hits]
+
+
+@pytest.mark.parametrize("seed", range(8))
+def test_random_ack_sequences_round_trip(seed):
+    rng   = random.Random(seed)
+    build = DeltaCheckpointBuilder(max_chunks=10, min_compact=5)
+    gist  = {}
+    hits  = []
+    for step in range(120):
+        hits += [_hit(rng, len(hits) + k) for k in range(rng.randint(0, 4))]
+        files = build(hits, SCAN_TS, "retest")
+        if files is None:
+            continue
+        outcome = rng.random()
+        if outcome < 0.2:
+            continue                    # upload failed — not applied, not acked
+        _patch(gist, files)
+        if outcome < 0.3:
+            continue                    # landed, but the response timed out
+        build.ack()
+        # Whatever is on the gist is an exact prefix of the scan's hits
+        got = _decoded(gist)
+        assert got == _expected(hits[:len(got)])
+        assert len(got) >= build.acked_n
+    # Final flush — retry until everything is acked
+    while (files := build(hits, SCAN_TS, "retest")) is not None:
+        _patch(gist, files)
+        build.ack()
+    assert _decoded(gist) == _expected(hits)
+    assert len(gist) <= 1 + build.max_chunks   # compaction deletes old chunks
+
+
+def _upload(build, gist, hits, scan_ts=SCAN_TS):
+    files = build(hits, scan_ts, "retest")
+    _patch(gist, files)
+    build.ack()
+    return files
+
+
+def test_stale_generation_chunks_are_ignored():
+    rng   = random.Random(1)
+    build = DeltaCheckpointBuilder()
+    gist  = {}
+    old   = [_hit(rng, i) for i in range(6)]
+    _upload(build, gist, old[:2], "2026-10-15 21:30")
+    _upload(build, gist, old[:4], "2026-10-15 21:30")
+    _upload(build, gist, old, "2026-10-15 21:30")
+    assert chunk_filename(1) in gist
+
+    # A new scan starts over with a snapshot; the old scan's chunks stay on
+    # the gist but belong to another generation
+    new = [_hit(rng, 100 + i) for i in range(3)]
+    files = _upload(build, gist, new)
+    assert list(files) == [CHECKPOINT_FILENAME]
+    assert _decoded(gist) == _expected(new)
+
+    more = new + [_hit(rng, 200)]
+    _upload(build, gist, more)   # overwrites d000 with this generation's chunk
+    assert _decoded(gist) == _expected(more)
+
+
+def test_gap_in_seq_stops_the_replay():
+    rng   = random.Random(2)
+    build = DeltaCheckpointBuilder()
+    gist  = {}
+    hits  = [_hit(rng, i) for i in range(8)]
+    for n in (2, 4, 6, 8):             # snapshot + chunks 0, 1, 2
+        _upload(build, gist, hits[:n])
+    assert _decoded(gist) == _expected(hits)
+
+    lost = dict(gist)
+    del lost[chunk_filename(1)]
+    assert _decoded(lost) == _expected(hits[:4])
+
+    # A chunk whose start doesn't line up is a gap too
+    shifted = dict(gist)
+    c = json.loads(shifted[chunk_filename(1)]["content"])
+    c["start"] += 1
+    shifted[chunk_filename(1)] = {"content": json.dumps(c)}
+    assert _decoded(shifted) == _expected(hits[:4])
+
+    # An unreadable chunk is skipped like a missing one
+    torn = dict(gist)
+    torn[chunk_filename(0)] = {"content": '{"v": 2, "gen": '}
+    assert _decoded(torn) == _expected(hits[:2])
+
+
+def test_v1_whole_list_checkpoint_still_loads():
+    rng  = random.Random(3)
+    hits = [_hit(rng, i) for i in range(5)]
+    cp   = decode_checkpoint(build_checkpoint_files(hits, SCAN_TS, "base"))
+    assert json.loads(json.dumps(_expected(hits))) == cp["hits"]
+    assert (cp["scan_ts"], cp["mode"], cp["hit_count"]) == (SCAN_TS, "base", 5)
+
+
+def test_truncated_files_are_fetched_by_raw_url():
+    rng   = random.Random(4)
+    build = DeltaCheckpointBuilder()
+    gist  = {}
+    hits  = [_hit(rng, i) for i in range(6)]
+    _upload(build, gist, hits[:3])
+    _upload(build, gist, hits)
+    raw = {name: f["content"] for name, f in gist.items()}
+    truncated = {name: {"content": f["content"][:10], "truncated": True, "raw_url": name}
+                 for name, f in gist.items()}
+    cp = decode_checkpoint(truncated, fetch=raw.__getitem__)
+    assert cp["hits"] == _expected(hits)
+
+
+def test_no_checkpoint():
+    assert decode_checkpoint({}) is None
+    assert decode_checkpoint({CHECKPOINT_FILENAME: {"content": '{"hits": []}'}}) is None
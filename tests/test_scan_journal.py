@@ -0,0 +1,118 @@
+import numpy as np
+
+from scan_journal import ScanJournal, clear_journal, replay_journal
+
+UNIVERSE = ["AAA", "BBB", "CCC", "DDD", "EEE", "FFF"]
+PARAMS   = {"is_retest": True, "min_price": 5}
+
+
+def _hit(ticker, score):
+    return {"ticker": ticker, "score": score, "norm_score": score, "w_pass": np.bool_(True),
+            "d_pass": np.bool_(score >= 80), "sector": "Technology",
+            "wr": {"dist_200sma": np.float64(12.5), "series": [1, 2, 3]},
+            "dr": {"atr_pct": 4.2}, "rr": {}}
+
+
+def _start(path, **meta):
+    j = ScanJournal(str(path))
+    j.start(universe=UNIVERSE, total=len(UNIVERSE), sector_returns={"XLK": 3.1},
+            watchlist={}, mode="retest", scan_ts="2026-10-16 21:30", **meta)
+    return j
+
+
+def _tick(j, i, status, skipped):
+    t = UNIVERSE[i - 1]
+    j.record(i, t, status, f"{status} {t}", hit=_hit(t, 85) if status == "hit" else None,
+             skipped=skipped)
+
+
+def test_interrupted_scan_replays_resumes_and_completes(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    j = _start(path, params=PARAMS)
+    _tick(j, 1, "hit", 0)
+    _tick(j, 2, "miss", 0)
+    _tick(j, 3, "skip", 1)
+    j.close()
+    with open(path, "a", encoding="utf-8") as f:   # killed mid-write
+        f.write('{"type": "tick", "i": 4, "ticker": "DD')
+
+    saved = replay_journal(str(path))
+    assert saved["scanned"] == 3
+    assert saved["skipped"] == 1
+    assert [h["ticker"] for h in saved["hits"]] == ["AAA"]
+    assert saved["logs"] == ["hit AAA", "miss BBB", "skip CCC"]
+    assert saved["resumable"] and not saved["complete"]
+    assert saved["hits"][0]["w_pass"] is True            # np.bool_ unwrapped, not dropped
+    assert saved["hits"][0]["wr"] == {"dist_200sma": 12.5}
+
+    j = ScanJournal(str(path))
+    j.resume(saved)
+    _tick(j, 4, "hit", 1)
+    _tick(j, 5, "miss", 1)
+    live = replay_journal(str(path))
+    assert live["scanned"] == 5 and live["resumable"]
+    assert [h["ticker"] for h in live["hits"]] == ["AAA", "DDD"]
+
+    _tick(j, 6, "skip", 2)
+    j.complete(watchlist={"DDD": {"added": "2026-10-17"}})
+    done = replay_journal(str(path))
+    assert done["complete"] and not done["resumable"]
+    assert (done["scanned"], done["skipped"]) == (6, 2)
+    assert [h["ticker"] for h in done["hits"]] == ["AAA", "DDD"]
+    assert done["logs"][-1] == "skip FFF" and done["logs"][0] == "hit AAA"
+    assert done["watchlist"] == {"DDD": {"added": "2026-10-17"}}
+    assert done["universe"] == UNIVERSE and done["header"]["params"] == PARAMS
+
+
+def test_compacted_journal_keeps_counts_and_is_not_resumable(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    j = _start(path, params=PARAMS)
+    _tick(j, 1, "skip", 1)
+    _tick(j, 2, "hit", 1)
+    j.complete()   # stopped early but marked complete — nothing to pick up
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 4   # header, one hit, logs, complete marker
+
+    saved = replay_journal(str(path))
+    assert (saved["scanned"], saved["skipped"]) == (2, 1)
+    assert [h["ticker"] for h in saved["hits"]] == ["BBB"]
+    assert saved["complete"] and not saved["resumable"]
+
+    # Replaying a compacted journal twice gives the same state
+    assert replay_journal(str(path)) == saved
+
+
+def test_resumable_needs_params_and_unscanned_tickers(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    j = _start(path)   # older journal without params
+    _tick(j, 1, "miss", 0)
+    j.close()
+    assert not replay_journal(str(path))["resumable"]
+
+    j = _start(path, params=PARAMS)
+    for i in range(1, len(UNIVERSE) + 1):
+        _tick(j, i, "miss", 0)
+    j.close()
+    saved = replay_journal(str(path))
+    assert saved["scanned"] == len(UNIVERSE)
+    assert not saved["complete"] and not saved["resumable"]
+
+
+def test_start_truncates_previous_scan(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    j = _start(path, params=PARAMS)
+    _tick(j, 1, "hit", 0)
+    j.close()
+    j = _start(path, params=PARAMS)
+    j.close()
+    saved = replay_journal(str(path))
+    assert saved["scanned"] == 0 and saved["hits"] == []
+
+
+def test_missing_or_headerless_journal(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    assert replay_journal(str(path)) is None
+    path.write_text('{"type": "tick", "i": 1, "ticker": "AAA", "status": "miss"}\n{"type": "he')
+    assert replay_journal(str(path)) is None
+    clear_journal(str(path))
+    assert not path.exists()
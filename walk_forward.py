@@ -0,0 +1,346 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from backtest import backtest_data
+from scan_engine import get_sector_run_threshold, is_adr
+
+# ── Walk-Forward Scanner ──────────────────────────────────────────────────────
+# Weekly retest / base-breakout signals for EVERY historical week of a ticker
+# in one vectorized pass over its full series, instead of one check_weekly /
+# check_base_breakout call per as-of date. Row t answers "would the weekly
+# check have passed if run on date[t]" over the same window the Date Picker
+# Scan uses (run_single_backtest: bars in [date[t] - lookback_years, date[t]];
+# lookback_years=None = all history up to t, like a live period="max" scan).
+#
+# Window reductions map onto whole-series ops: fixed windows are pandas
+# rolling ops, windows that depend on where the lookback starts (ATH/ATL,
+# base high/low, 3y volume high) are sparse-table range max/min queries, and
+# the scalar verdict logic of _weekly_verdict / check_base_breakout is
+# repeated here column-wise. Flags match the per-date checks; metrics agree
+# to float rounding. Daily checks and scoring are not part of the walk — run
+# run_single_backtest on the weeks that fired for the full picture.
+# Rows with any missing OHLCV are dropped before the walk.
+
+_SMA = 200
+_MIN_BARS = 52
+_DAY_NS = 86_400 * 10**9
+
+
+# ── Range queries ─────────────────────────────────────────────────────────────
+
+def _sparse_table(a, op):
+    levels = [a]
+    half = 1
+    while 2 * half <= len(a):
+        prev = levels[-1]
+        levels.append(op(prev[:-half], prev[half:]))
+        half *= 2
+    return levels
+
+
+def _range_query(levels, op, lo, hi):
+    """op over a[lo:hi] for each (lo, hi) pair; NaN where hi <= lo."""
+    span = hi - lo
+    out  = np.full(len(lo), np.nan)
+    ok   = span > 0
+    k    = np.zeros(len(lo), dtype=int)
+    k[ok] = np.floor(np.log2(span[ok])).astype(int)
+    for lvl in np.unique(k[ok]):
+        m   = ok & (k == lvl)
+        tab = levels[lvl]
+        out[m] = op(tab[lo[m]], tab[hi[m] - (1 << lvl)])
+    return out
+
+
+def _window_starts(dates, lookback_years):
+    """Index of the first bar in each week's lookback window."""
+    if lookback_years is None:
+        return np.zeros(len(dates), dtype=np.int64)
+    d = dates.astype("datetime64[ns]").astype(np.int64)
+    start = d - np.int64(365 * lookback_years) * _DAY_NS
+    start -= start % _DAY_NS
+    return np.searchsorted(d, start, "left").astype(np.int64)
+
+
+def _sma_walk(c, t, s, offsets):
+    """
+    check_weekly's calc_sma(closes, min(200, n-1)) at bars t-k (k in offsets)
+    of each week's window [s, t]. Returns (len(offsets), N); NaN where the
+    SMA window would reach back past the window start. 200-bar windows come
+    from the pandas rolling mean, the short-history case (n-1 < 200) from
+    cumulative sums.
+    """
+    N    = len(c)
+    n    = t - s + 1
+    w    = np.maximum(np.minimum(_SMA, n - 1), 1)[None, :]
+    pos  = t[None, :] - np.asarray(offsets)[:, None]
+    roll = pd.Series(c).rolling(_SMA).mean().to_numpy()
+    cs   = np.concatenate([[0.0], np.cumsum(c)])
+    part = (cs[np.clip(pos + 1, 0, N)] - cs[np.clip(pos + 1 - w, 0, N)]) / w
+    out  = np.where(w >= _SMA, roll[np.clip(pos, 0, N - 1)], part)
+    return np.where((pos - w + 1 >= s[None, :]) & (pos >= 0), out, np.nan)
+
+
+# ── Per-ticker walk ───────────────────────────────────────────────────────────
+
+def _arrays(df_w):
+    df = df_w.dropna(subset=["open", "high", "low", "close", "volume"]).reset_index(drop=True)
+    return (df["date"].to_numpy(dtype="datetime64[ns]"), df["open"].to_numpy(dtype=float),
+            df["high"].to_numpy(dtype=float), df["low"].to_numpy(dtype=float),
+            df["close"].to_numpy(dtype=float), df["volume"].to_numpy(dtype=float))
+
+
+def walk_forward_retest(df_w, w_dist_200sma_lo, w_dist_200sma_hi, w_prior_run, w_correction,
+                        w_vol_mult, ticker=None, lookback_years=10):
+    """
+    check_weekly for every week of df_w. Returns a DataFrame, one row per
+    week: date, close, sma200, the wr metrics / pass flags, passed, and
+    new_signal (passed this week but not the week before). Weeks with fewer
+    than 52 bars in their window are passed=False with NaN metrics.
+    """
+    dates, _, _, low, c, v = _arrays(df_w)
+    N  = len(c)
+    t  = np.arange(N)
+    s  = _window_starts(dates, lookback_years)
+    n  = t - s + 1
+    ok = n >= _MIN_BARS
+
+    # ── 200W SMA at the last 9 bars of each window ───────────────────────────
+    smak   = _sma_walk(c, t, s, range(9))                  # smak[k-1] = iloc[-k]
+    sma200 = smak[0]
+
+    # ── ATH / ATL over the window ending 8 weeks ago ─────────────────────────
+    ath = _range_query(_sparse_table(c, np.fmax), np.fmax, s, t - 7)
+    atl = _range_query(_sparse_table(c, np.fmin), np.fmin, s, t - 7)
+
+    # ── Volume windows ───────────────────────────────────────────────────────
+    vs     = pd.Series(v)
+    avg20  = vs.rolling(20).mean().to_numpy()
+    avg4   = vs.rolling(4).mean().to_numpy()
+    peak12 = vs.rolling(12).max().to_numpy()
+    lb     = np.minimum(156, n - 1)
+    hist_max = _range_query(_sparse_table(v, np.fmax), np.fmax, t - lb + 1, t)
+    hist_max = np.where(lb > 1, hist_max, 0.0)
+    vol_rank = None
+    if ticker and is_adr(ticker):
+        vol_rank = np.full(N, np.nan)
+        if N >= 52:
+            win = sliding_window_view(v, 52)                # win[i] = v[i … i+51]
+            vol_rank[51:] = (avg4[51:, None] > win).mean(axis=1) * 100
+        vol_rank = np.where(avg20 > 0, vol_rank, np.nan)
+
+    # ── Undercut & reclaim: first week back (1 … 8) wicking through the SMA ──
+    uc_pos = np.clip(t[None, :] - np.arange(8)[:, None], 0, N - 1)
+    with np.errstate(invalid="ignore"):
+        uc = (low[uc_pos] < smak[:8]) & (c[uc_pos] > smak[:8])
+    uc_any   = uc.any(axis=0)
+    uc_weeks = np.where(uc_any, uc.argmax(axis=0) + 1, np.nan)
+
+    resist = np.full(N, np.nan)
+    resist[51:] = pd.Series(c).rolling(26).max().to_numpy()[25:N - 26]
+
+    # ── Verdict (column-wise _weekly_verdict) ────────────────────────────────
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dist = (c - sma200) / sma200 * 100
+        run  = np.where(atl > 0, (ath - atl) / atl * 100, 0.0)
+        corr = np.where(ath > c, (ath - c) / ath * 100, 0.0)
+        run_min = min(w_prior_run, get_sector_run_threshold(ticker)) if ticker else w_prior_run
+        vr = np.maximum(np.where(avg20 > 0, avg4 / avg20, 0.0),
+                        np.where(avg20 > 0, peak12 / avg20, 0.0))
+        if vol_rank is not None:
+            vr = np.where(vol_rank >= 95, np.maximum(vr, 2.5),
+                 np.where(vol_rank >= 80, np.maximum(vr, 1.5),
+                 np.where(vol_rank >= 60, np.maximum(vr, 1.2), vr)))
+        sma_now, sma_5w, sma_10w = smak[0], smak[4], smak[8]
+        slope_now   = np.where(sma_5w > 0, (sma_now - sma_5w) / sma_5w * 100, 0.0)
+        slope_5w    = np.where(sma_10w > 0, (sma_5w - sma_10w) / sma_10w * 100, 0.0)
+        slope_accel = slope_now - slope_5w
+        grade = np.where(slope_now >= 0.10, "rising",
+                np.where((slope_now >= -0.10) | (slope_accel >= 0.05), "flattening", "declining"))
+        dist_res = (c - resist) / resist * 100
+
+    pass_dist = (dist >= -w_dist_200sma_lo) & (dist <= w_dist_200sma_hi)
+    pass_run  = run >= run_min
+    pass_corr = corr >= w_correction
+    pass_vol  = vr >= w_vol_mult
+    passed    = ok & pass_dist & pass_run & pass_corr & pass_vol
+
+    return _finish({
+        "date":                    dates,
+        "close":                   c,
+        "sma200":                  sma200,
+        "dist_200sma_pct":         dist,
+        "prior_run_pct":           run,
+        "correction_from_ath_pct": corr,
+        "vol_ratio":               vr,
+        "sma200_slope_pct":        slope_now,
+        "sma200_slope_grade":      grade,
+        "pass_200sma_proximity":   pass_dist,
+        "pass_prior_run":          pass_run,
+        "pass_correction":         pass_corr,
+        "pass_volume_surge":       pass_vol,
+        "pass_sma200_slope":       grade != "declining",
+        "undercut_reclaim":        uc_any,
+        "undercut_reclaim_wks":    uc_weeks,
+        "multiyear_vol_high":      peak12 >= hist_max * 0.95,
+        "resistance_flip":         (dist_res >= 0) & (dist_res <= 3.0),
+        "passed":                  passed,
+    }, ok)
+
+
+def walk_forward_base_breakout(df_w, bb_base_years, bb_range_pct, bb_atr_max, bb_vol_mult,
+                               bb_sma_lo, bb_sma_hi, lookback_years=10):
+    """
+    check_base_breakout for every week of df_w. Same row layout as
+    walk_forward_retest with the base-breakout metrics / flags. Weeks with
+    under 52 bars or a base window shorter than 26 weeks are passed=False.
+    """
+    dates, _, high, low, c, v = _arrays(df_w)
+    N  = len(c)
+    t  = np.arange(N)
+    s  = _window_starts(dates, lookback_years)
+    n  = t - s + 1
+    bw = int(bb_base_years * 52)
+
+    smak    = _sma_walk(c, t, s, (0, 4))
+    sma200  = smak[0]
+    slope   = smak[0] - smak[1]
+
+    # ── Base window: the bw weeks before this one (or all of the window) ─────
+    b0      = np.where(n > bw, t - bw, s)
+    base_n  = t - b0
+    ok      = (n >= _MIN_BARS) & (base_n >= 26)
+    base_hi = _range_query(_sparse_table(c, np.fmax), np.fmax, b0, t)
+    base_lo = _range_query(_sparse_table(c, np.fmin), np.fmin, b0, t)
+
+    # Median-TR ATR% of the base (last 14 bars before this week)
+    prev = np.concatenate([[np.nan], c[:-1]])
+    tr   = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+    base_atr = np.full(N, 999.0)
+    if N > 14:
+        med = np.median(sliding_window_view(tr, 14), axis=1)   # med[i] = tr[i … i+13]
+        base_atr[14:] = med[:N - 14] / c[13:N - 1] * 100
+    base_atr = np.where(base_n >= 14, base_atr, 999.0)
+
+    vs    = pd.Series(v)
+    avg4  = vs.rolling(4).mean().to_numpy()
+    avg20 = vs.rolling(20).mean().to_numpy()
+
+    # ── Base duration: consecutive in-band closes walking back from t-1 ──────
+    span   = 2 * bw
+    back   = t[:, None] - 1 - np.arange(span)[None, :]
+    floor  = (s + np.maximum(0, n - span))[:, None]
+    closes = c[np.clip(back, 0, N - 1)]
+    with np.errstate(invalid="ignore"):
+        inband = ((back >= floor) & (closes >= base_lo[:, None] * 0.85)
+                  & (closes <= base_hi[:, None] * 1.15))
+    duration = np.where(inband.all(axis=1), span, np.argmin(inband, axis=1))
+
+    cser   = pd.Series(c)
+    ema10  = cser.ewm(span=10, adjust=False).mean().to_numpy()
+    ema20  = cser.ewm(span=20, adjust=False).mean().to_numpy()
+    sma50  = cser.rolling(50).mean().to_numpy()
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dist = (c - sma200) / sma200 * 100
+        base_range = np.where(base_lo > 0, (base_hi - base_lo) / base_lo * 100, 999.0)
+        vr = np.where(avg20 > 0, avg4 / avg20, 0.0)
+        ma_stack   = (c > ema10) & (ema10 > ema20) & (ema20 > sma50) & (sma50 > sma200)
+        ma_partial = ((c > ema10).astype(int) + (ema10 > ema20) + (ema20 > sma50)
+                      + (sma50 > sma200)) >= 3
+        growth_profile = (base_atr > 3.0) | (dist > 50)
+
+    pass_sma      = (dist >= -bb_sma_lo) & (dist <= bb_sma_hi)
+    pass_range    = base_range <= bb_range_pct
+    pass_atr      = base_atr <= bb_atr_max
+    pass_vol      = vr >= bb_vol_mult
+    pass_duration = duration >= bb_base_years * 52 * 0.5
+    pass_typed    = np.where(growth_profile, duration >= 52, pass_duration)
+    passed = ok & pass_sma & pass_range & pass_atr & pass_vol & pass_typed
+
+    return _finish({
+        "date":                  dates,
+        "close":                 c,
+        "sma200":                sma200,
+        "dist_200sma_pct":       dist,
+        "base_range_pct":        base_range,
+        "base_atr_pct":          base_atr,
+        "base_duration_yrs":     np.round(duration / 52, 1),
+        "vol_ratio":             vr,
+        "sma200_slope":          slope,
+        "pass_200sma_proximity": pass_sma,
+        "pass_base_range":       pass_range,
+        "pass_base_atr":         pass_atr,
+        "pass_volume_surge":     pass_vol,
+        "pass_base_duration":    pass_duration,
+        "pass_sma200_slope":     slope >= -0.05,
+        "ma_stack":              ma_stack,
+        "ma_partial":            ma_partial,
+        "base_subtype":          np.where(growth_profile, "growth", "commodity"),
+        "pass_duration_typed":   pass_typed,
+        "passed":                passed,
+    }, ok)
+
+
+def _finish(cols, ok):
+    """Blank the weeks the per-date check would reject as too short (flags
+    False, metrics NaN), flag new signals, build the frame."""
+    for name, col in cols.items():
+        if name in ("date", "close"):
+            continue
+        if col.dtype == bool:
+            cols[name] = col & ok
+        elif col.dtype.kind == "f":
+            cols[name] = np.where(ok, col, np.nan)
+    passed = cols["passed"]
+    cols["new_signal"] = passed & ~np.concatenate([[False], passed[:-1]])
+    return pd.DataFrame(cols)
+
+
+def walk_forward_ticker(df_w, params, ticker=None, lookback_years=10):
+    """Dispatch on params["is_retest"] (the ScanExecutor / evaluate_ticker params dict)."""
+    p = params
+    if p["is_retest"]:
+        return walk_forward_retest(df_w, p["w_dist_200sma_lo"], p["w_dist_200sma_hi"],
+                                   p["w_prior_run"], p["w_correction"], p["w_vol_mult"],
+                                   ticker=ticker, lookback_years=lookback_years)
+    return walk_forward_base_breakout(df_w, p["bb_base_years"], p["bb_range_pct"], p["bb_atr_max"],
+                                      p["bb_vol_mult"], p["bb_sma_lo"], p["bb_sma_hi"],
+                                      lookback_years=lookback_years)
+
+
+# ── Universe ──────────────────────────────────────────────────────────────────
+
+def walk_forward_scan(tickers, params, since=None, until=None, new_only=False,
+                      lookback_years=10, data=None, progress=None):
+    """
+    Every past firing across a universe. Full weekly history per ticker comes
+    from BacktestData (fetched once, bar-store backed). Returns one row per
+    (ticker, week) that passed — or, with new_only, only the first week of
+    each run of passing weeks — between since and until, sorted by date.
+    progress(i, ticker) is called after each ticker.
+    """
+    data   = data or backtest_data
+    frames = []
+    for i, t in enumerate(tickers):
+        try:
+            df_w = data.history(t, "1wk")
+            if df_w is not None and len(df_w) >= _MIN_BARS:
+                sig = walk_forward_ticker(df_w, params, ticker=t, lookback_years=lookback_years)
+                sig = sig[sig["new_signal"] if new_only else sig["passed"]]
+                if since is not None:
+                    sig = sig[sig["date"] >= pd.Timestamp(since)]
+                if until is not None:
+                    sig = sig[sig["date"] <= pd.Timestamp(until)]
+                if len(sig):
+                    frames.append(sig.assign(ticker=t))
+        except Exception:
+            pass
+        if progress:
+            progress(i, t)
+    if not frames:
+        return pd.DataFrame()
+    out = pd.concat(frames, ignore_index=True)
+    cols = ["ticker"] + [c for c in out.columns if c != "ticker"]
+    return out[cols].sort_values(["date", "ticker"], kind="stable").reset_index(drop=True)